@@ -0,0 +1,128 @@
+from __future__ import annotations
+
+import json
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+ALIASES_NAME = "aliases.json"
+VERSION_SEPARATOR = "__"
+
+# (aliases file, alias) -> (file mtime_ns, physical collection name)
+_resolved: Dict[Tuple[str, str], Tuple[int, str]] = {}
+
+
+def aliases_path(chroma_path: Path) -> Path:
+    return Path(chroma_path) / ALIASES_NAME
+
+
+def version_name(alias: str, run_id: str) -> str:
+    stamp = time.strftime("%Y%m%dT%H%M%S", time.gmtime())
+    return f"{alias}{VERSION_SEPARATOR}{stamp}-{run_id[:6]}"
+
+
+def is_version_of(name: str, alias: str) -> bool:
+    return name.startswith(f"{alias}{VERSION_SEPARATOR}")
+
+
+def was_promoted(chroma_path: Path, alias: str, name: str) -> bool:
+    entry = load_aliases(chroma_path).get(alias) or {"current": None, "history": []}
+    return name == entry["current"] or any(
+        record["collection"] == name for record in entry["history"]
+    )
+
+
+def load_aliases(chroma_path: Path) -> Dict[str, Dict[str, Any]]:
+    path = aliases_path(chroma_path)
+    if not path.exists():
+        return {}
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+
+
+def save_aliases(chroma_path: Path, aliases: Dict[str, Dict[str, Any]]) -> None:
+    """Write-then-rename, so readers see either the old pointer or the new one."""
+    path = aliases_path(chroma_path)
+    tmp_path = path.with_suffix(".tmp")
+    tmp_path.write_text(json.dumps(aliases, ensure_ascii=True, indent=2), encoding="utf-8")
+    os.replace(tmp_path, path)
+
+
+def resolve_alias(chroma_path: Path, alias: str) -> str:
+    """
+    Physical collection currently behind `alias`; the name itself when no alias exists
+    (collections built before blue/green). Cached per process and refreshed only when the
+    aliases file changes, so long-lived readers pick up promotions on the next query.
+    """
+    path = aliases_path(chroma_path)
+    try:
+        mtime = path.stat().st_mtime_ns
+    except FileNotFoundError:
+        return alias
+    key = (str(path), alias)
+    cached = _resolved.get(key)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+    entry = load_aliases(chroma_path).get(alias)
+    physical = entry["current"] if entry else alias
+    _resolved[key] = (mtime, physical)
+    return physical
+
+
+def promote(chroma_path: Path, alias: str, physical: str) -> None:
+    aliases = load_aliases(chroma_path)
+    entry = aliases.setdefault(alias, {"current": None, "history": []})
+    entry["current"] = physical
+    entry["history"].append({"collection": physical, "promoted_at": time.time()})
+    save_aliases(chroma_path, aliases)
+
+
+def rollback(chroma_path: Path, alias: str, existing: List[str]) -> Optional[str]:
+    """
+    Point `alias` at the newest version promoted before the current one that still exists.
+    Rollbacks only move the `current` pointer and leave the promotion history alone, so
+    repeated rollbacks keep stepping further back.
+    """
+    aliases = load_aliases(chroma_path)
+    entry = aliases.get(alias)
+    if not entry:
+        return None
+    current = entry["current"]
+    history = [record["collection"] for record in entry["history"]]
+    # Start below the current version's latest promotion; older files may not list it at all.
+    end = len(history) - history[::-1].index(current) - 1 if current in history else len(history)
+    for name in reversed(history[:end]):
+        if name != current and name in existing:
+            entry["current"] = name
+            save_aliases(chroma_path, aliases)
+            return name
+    return None
+
+
+def expired_versions(
+    chroma_path: Path, alias: str, existing: List[str], keep: int, retention_seconds: float
+) -> List[str]:
+    """
+    Versions of `alias` that may be dropped: never the current one, never the `keep`
+    most recently promoted, and only once they are older than the retention window.
+    Versions that were never promoted (a build still running or interrupted) are left alone.
+    """
+    entry = load_aliases(chroma_path).get(alias) or {"current": None, "history": []}
+    current = entry["current"]
+    promoted_at: Dict[str, float] = {}
+    for record in entry["history"]:
+        promoted_at[record["collection"]] = record["promoted_at"]
+    recent = sorted(promoted_at, key=promoted_at.get, reverse=True)[:keep]
+    cutoff = time.time() - retention_seconds
+    return [
+        name
+        for name in existing
+        if is_version_of(name, alias)
+        and name != current
+        and name in promoted_at
+        and name not in recent
+        and promoted_at[name] < cutoff
+    ]
@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+import json
+import math
+import re
+from dataclasses import dataclass
+from typing import List, Optional, Sequence
+
+from constants import (
+    DEFAULT_BATCH_SIZE,
+    DEFAULT_MAX_BATCH_BYTES,
+    DEFAULT_MAX_BATCH_TOKENS,
+    MAX_INPUT_TOKENS,
+)
+
+# Words, numbers and single punctuation marks. For cl100k-style BPE this slightly
+# over-counts typical English rule text, which is the safe direction for a limit.
+TOKEN_PIECE_RE = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+# JSON envelope around the inputs: {"input": [...], "model": "...", ...}
+REQUEST_OVERHEAD_BYTES = 256
+
+
+@dataclass(frozen=True)
+class BatchLimits:
+    max_items: int = DEFAULT_BATCH_SIZE
+    max_tokens: int = DEFAULT_MAX_BATCH_TOKENS
+    max_bytes: int = DEFAULT_MAX_BATCH_BYTES
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Offline token estimate: the larger of the word/punctuation piece count and
+    UTF-8 bytes / 4 (the usual BPE average), so long identifiers and non-ASCII text
+    are not under-counted.
+    """
+    pieces = len(TOKEN_PIECE_RE.findall(text))
+    by_bytes = math.ceil(len(text.encode("utf-8")) / 4)
+    return max(pieces, by_bytes, 1)
+
+
+def input_bytes(text: str) -> int:
+    # Encoded JSON string plus the separating comma.
+    return len(json.dumps(text, ensure_ascii=False).encode("utf-8")) + 1
+
+
+def plan_batches(
+    texts: Sequence[str],
+    limits: BatchLimits = BatchLimits(),
+    tokens: Optional[Sequence[int]] = None,
+) -> List[List[int]]:
+    """
+    Pack inputs into as few requests as possible without exceeding the per-request
+    item, token and byte limits. Uses first-fit decreasing on estimated tokens; each
+    returned batch lists input positions in ascending order, and batches are ordered by
+    their first position so the plan is deterministic. Pass `tokens` to reuse
+    precomputed estimates (e.g. from the corpus artifact).
+    """
+    if tokens is None:
+        tokens = [estimate_tokens(text) for text in texts]
+    sizes = [input_bytes(text) for text in texts]
+    byte_budget = limits.max_bytes - REQUEST_OVERHEAD_BYTES
+    for position, (count, size) in enumerate(zip(tokens, sizes)):
+        if count > min(MAX_INPUT_TOKENS, limits.max_tokens) or size > byte_budget:
+            raise RuntimeError(
+                f"Input {position} is too large to embed (~{count} tokens, {size} bytes)."
+            )
+
+    order = sorted(range(len(texts)), key=lambda i: (-tokens[i], i))
+    batches: List[List[int]] = []
+    used_tokens: List[int] = []
+    used_bytes: List[int] = []
+    for position in order:
+        for b, batch in enumerate(batches):
+            if (
+                len(batch) < limits.max_items
+                and used_tokens[b] + tokens[position] <= limits.max_tokens
+                and used_bytes[b] + sizes[position] <= byte_budget
+            ):
+                batch.append(position)
+                used_tokens[b] += tokens[position]
+                used_bytes[b] += sizes[position]
+                break
+        else:
+            batches.append([position])
+            used_tokens.append(tokens[position])
+            used_bytes.append(sizes[position])
+
+    for batch in batches:
+        batch.sort()
+    batches.sort(key=lambda batch: batch[0])
+    return batches
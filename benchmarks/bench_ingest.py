@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Ingestion throughput benchmark.
+
+Embeds a synthetic corpus through create_embeddings.embed_and_upsert against an
+embeddings endpoint (normally benchmarks/mock_embedding_server.py) into an
+ephemeral Chroma collection, and compares wall time to the ideal
+ceil(batches / concurrency) round trips.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import math
+import sys
+import time
+from pathlib import Path
+
+import chromadb
+import httpx
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from batch_planner import BatchLimits, plan_batches  # noqa: E402
+from create_embeddings import embed_and_upsert  # noqa: E402
+from embedders import OpenAIEmbedder  # noqa: E402
+
+
+def synthetic_corpus(count: int) -> tuple[list[str], list[str], list[dict]]:
+    ids = [f"bench-{i}" for i in range(count)]
+    docs = [f"SUPPORT.RULE.synthetic_{i % 37}\nRule body number {i}." for i in range(count)]
+    metas = [{"topic": f"topic_{i % 37}", "role": "support", "priority": 40} for i in range(count)]
+    return ids, docs, metas
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the async ingestion pipeline.")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8765/v1")
+    parser.add_argument("--chunks", type=int, default=1000)
+    parser.add_argument("--batch-size", type=int, default=32, help="Max inputs per request.")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--latency", type=float, default=0.3, help="Server latency, for the ideal.")
+    args = parser.parse_args()
+
+    ids, docs, metas = synthetic_corpus(args.chunks)
+    limits = BatchLimits(max_items=args.batch_size)
+    batches = len(plan_batches(docs, limits))
+    stats_url = args.base_url.rstrip("/").rsplit("/v1", 1)[0] + "/stats"
+
+    print(f"chunks={args.chunks} batches={batches} batch_size={args.batch_size}")
+    for concurrency in args.concurrency:
+        client = chromadb.EphemeralClient()
+        name = f"bench_ingest_{concurrency}"
+        collection = client.get_or_create_collection(name=name)
+        embedder = OpenAIEmbedder(
+            "mock", model="mock", base_url=args.base_url, concurrency=concurrency
+        )
+        start = time.perf_counter()
+        asyncio.run(
+            embed_and_upsert(
+                collection,
+                ids,
+                docs,
+                metas,
+                embedder,
+                limits=limits,
+                concurrency=concurrency,
+            )
+        )
+        elapsed = time.perf_counter() - start
+        ideal = math.ceil(batches / concurrency) * args.latency
+        try:
+            peak = httpx.get(stats_url).json().get("peak_in_flight")
+        except httpx.HTTPError:
+            peak = "n/a"
+        print(
+            f"concurrency={concurrency:<3} elapsed={elapsed:.2f}s ideal={ideal:.2f}s "
+            f"overhead={elapsed / ideal:.2f}x count={collection.count()} peak_in_flight={peak}"
+        )
+        client.delete_collection(name)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Chroma vs. in-memory NumPy exact search on synthetic rule corpora.
+
+For each corpus size a random corpus shaped like the real one (a router chunk per topic,
+support chunks spread over the topics, one planner_policy topic) is loaded into a scratch
+Chroma collection and into a NumpyCollection. Each simulated request runs the three stage
+queries retrieval issues (router, topic-gated support, planner_policy); the benchmark
+reports build time, p50/p99 request latency and Chroma's support-stage recall against the
+exact NumPy results.
+"""
+
+from __future__ import annotations
+
+import argparse
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import chromadb  # noqa: E402
+import numpy as np  # noqa: E402
+
+from numpy_store import NumpyCollection  # noqa: E402
+from retrieval import TOP_ROUTER  # noqa: E402
+
+ADD_BATCH = 5000
+
+
+def synthetic_corpus(size: int, dimensions: int, topics: int, seed: int) -> Dict[str, Any]:
+    rng = np.random.default_rng(seed)
+    names = ["planner_policy"] + [f"topic_{n:02d}" for n in range(topics - 1)]
+    routers = min(topics, max(1, size // 10))
+    ids, metadatas = [], []
+    for n in range(size):
+        topic = names[n % topics]
+        role = "router" if n < routers else "support"
+        ids.append(f"chunk-{n:07d}")
+        metadatas.append(
+            {
+                "doc_type": "RULE",
+                "topic": topic,
+                "role": role,
+                "priority": int(n % 3),
+                "view": "summary",
+            }
+        )
+    vectors = rng.standard_normal((size, dimensions)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    documents = [f"{meta['role'].upper()}.{meta['topic']} #{n}" for n, meta in enumerate(metadatas)]
+    return {"ids": ids, "embeddings": vectors, "documents": documents, "metadatas": metadatas}
+
+
+def stage_queries(collection: Any, query: np.ndarray, topics: List[str], top_k: int) -> List[str]:
+    include = ["documents", "metadatas", "distances"]
+    collection.query(
+        query_embeddings=[query],
+        n_results=TOP_ROUTER,
+        include=include,
+        where={"role": {"$eq": "router"}},
+    )
+    support = collection.query(
+        query_embeddings=[query],
+        n_results=min(max(top_k * 10, 80), 200),
+        include=include,
+        where={"$and": [{"role": {"$eq": "support"}}, {"topic": {"$in": topics}}]},
+    )
+    collection.query(
+        query_embeddings=[query],
+        n_results=1,
+        include=include,
+        where={"$and": [{"role": {"$eq": "support"}}, {"topic": {"$eq": "planner_policy"}}]},
+    )
+    return support["ids"][0][:top_k]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Chroma vs. NumPy exact search latency.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 1000, 100000])
+    parser.add_argument("--dimensions", type=int, default=256)
+    parser.add_argument("--topics", type=int, default=12)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=6)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(
+        f"{'chunks':>8} {'backend':>8} {'build_s':>8} {'p50_ms':>8} {'p99_ms':>8} "
+        f"{'matrix_mb':>10}"
+    )
+    for size in args.sizes:
+        corpus = synthetic_corpus(size, args.dimensions, args.topics, args.seed)
+        rng = np.random.default_rng(args.seed + 1)
+        # Queries near random corpus vectors, each gated to 1-2 random topics.
+        picks = rng.integers(0, size, args.requests)
+        queries = corpus["embeddings"][picks] + 0.3 * rng.standard_normal(
+            (args.requests, args.dimensions)
+        ).astype(np.float32)
+        topic_sets = [
+            sorted({corpus["metadatas"][n]["topic"], corpus["metadatas"][(n + 1) % size]["topic"]})
+            for n in picks
+        ]
+
+        with tempfile.TemporaryDirectory() as scratch:
+            start = time.perf_counter()
+            client = chromadb.PersistentClient(path=scratch)
+            chroma = client.create_collection(name="bench_numpy")
+            for offset in range(0, size, ADD_BATCH):
+                window = slice(offset, offset + ADD_BATCH)
+                chroma.add(
+                    ids=corpus["ids"][window],
+                    embeddings=corpus["embeddings"][window],
+                    documents=corpus["documents"][window],
+                    metadatas=corpus["metadatas"][window],
+                )
+            chroma_build = time.perf_counter() - start
+
+            start = time.perf_counter()
+            exact = NumpyCollection(
+                "bench_numpy",
+                corpus["ids"],
+                corpus["embeddings"],
+                corpus["documents"],
+                corpus["metadatas"],
+            )
+            numpy_build = time.perf_counter() - start
+
+            selections: Dict[str, List[List[str]]] = {}
+            for backend, collection, build in (
+                ("chroma", chroma, chroma_build),
+                ("numpy", exact, numpy_build),
+            ):
+                stage_queries(collection, queries[0], topic_sets[0], args.top_k)  # warm up
+                timings, selected = [], []
+                for query, topics in zip(queries, topic_sets):
+                    begin = time.perf_counter()
+                    selected.append(stage_queries(collection, query, topics, args.top_k))
+                    timings.append((time.perf_counter() - begin) * 1000)
+                selections[backend] = selected
+                timings.sort()
+                matrix_mb = f"{exact.vectors.nbytes / 1e6:.2f}" if backend == "numpy" else "-"
+                print(
+                    f"{size:>8} {backend:>8} {build:>8.2f} {statistics.median(timings):>8.3f} "
+                    f"{timings[int(0.99 * (len(timings) - 1))]:>8.3f} {matrix_mb:>10}"
+                )
+            hits = sum(
+                len(set(approx) & set(truth))
+                for approx, truth in zip(selections["chroma"], selections["numpy"])
+            )
+            total = sum(len(truth) for truth in selections["numpy"])
+            recall = hits / max(total, 1)
+            print(
+                f"{size:>8} {'':>8} chroma support top-{args.top_k} recall vs exact: {recall:.3f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
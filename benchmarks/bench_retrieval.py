@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Retrieval mode benchmark.
+
+Builds the real corpus into a scratch Chroma directory (single-vector, and optionally
+with text/example views), then runs the router harness queries through each retrieval
+mode and reports Chroma vector searches per query, single-query p50/p99 latency, the
+time for the whole case list as one retrieve_many() batch, agreement with the staged
+results and the harness pass rate.
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import io
+import json
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "router_test_harness"))
+
+from dotenv import load_dotenv  # noqa: E402
+
+from batch_planner import BatchLimits  # noqa: E402
+from constants import DEFAULT_COLLECTION, DEFAULT_MODEL  # noqa: E402
+from create_embeddings import build_collection  # noqa: E402
+from embedders import EMBEDDER_CHOICES, default_embedder_kind, make_embedder  # noqa: E402
+from retrieval import RETRIEVAL_MODES, open_collection, retrieve, retrieve_many  # noqa: E402
+from router_harness import RunResult, assert_case  # noqa: E402
+
+
+class CountingCollection:
+    """Delegates to a Chroma collection and counts vector searches."""
+
+    def __init__(self, collection: Any) -> None:
+        self.collection = collection
+        self.queries = 0
+
+    def query(self, **kwargs: Any) -> dict:
+        self.queries += 1
+        return self.collection.query(**kwargs)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.collection, name)
+
+
+def percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def main() -> None:
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Compare staged and single-pass retrieval.")
+    parser.add_argument("--embedder", choices=EMBEDDER_CHOICES, default=default_embedder_kind())
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--base-url", default=None)
+    parser.add_argument("--cases", default="router_test_harness/cases.json")
+    parser.add_argument("--repeats", type=int, default=20, help="Timed runs per harness query.")
+    parser.add_argument(
+        "--multi-vector", action="store_true", help="Also build with text and example views."
+    )
+    args = parser.parse_args()
+
+    cases = json.loads(Path(args.cases).read_text(encoding="utf-8"))
+    queries = [case["query"] for case in cases]
+    view_sets = [("summary",)] + ([("summary", "text", "examples")] if args.multi_vector else [])
+    embedder = make_embedder(args.embedder, args.model, args.base_url)
+
+    print(
+        f"{'views':>8} {'mode':>7} {'searches':>9} {'p50_ms':>8} {'p99_ms':>8} "
+        f"{'batch_ms':>9} {'agree':>6} {'passed':>7}"
+    )
+    for views in view_sets:
+        with tempfile.TemporaryDirectory() as scratch:
+            chroma_path = Path(scratch)
+            quiet = io.StringIO()
+            with contextlib.redirect_stdout(quiet), contextlib.redirect_stderr(quiet):
+                build_collection(
+                    DEFAULT_COLLECTION,
+                    embedder,
+                    BatchLimits(),
+                    chroma_path,
+                    preview_dir=None,
+                    blue_green=False,
+                    views=views,
+                )
+            collection = CountingCollection(open_collection(chroma_path, DEFAULT_COLLECTION))
+            # Warm the index and the embedder before timing anything.
+            retrieve_many(queries, collection=collection, embedder=embedder)
+
+            reference = None
+            for mode in RETRIEVAL_MODES:
+                collection.queries = 0
+                timings = []
+                for repeat in range(args.repeats):
+                    for query in queries:
+                        start = time.perf_counter()
+                        retrieve(query, collection=collection, embedder=embedder, mode=mode)
+                        timings.append((time.perf_counter() - start) * 1000)
+                searches = collection.queries / (args.repeats * len(queries))
+
+                start = time.perf_counter()
+                results = retrieve_many(
+                    queries, collection=collection, embedder=embedder, mode=mode
+                )
+                batch_ms = (time.perf_counter() - start) * 1000
+
+                chosen = [[chunk.id for chunk in result.chunks] for result in results]
+                reference = reference or chosen
+                agree = sum(ids == ref for ids, ref in zip(chosen, reference))
+                passed = sum(
+                    assert_case(
+                        case,
+                        RunResult(case["query"], "", result.router_topics, result.support_topics),
+                    )[0]
+                    for case, result in zip(cases, results)
+                )
+                print(
+                    f"{len(views):>8} {mode:>7} {searches:>9.1f} "
+                    f"{statistics.median(timings):>8.2f} "
+                    f"{percentile(timings, 99):>8.2f} {batch_ms:>9.2f} "
+                    f"{agree:>2}/{len(cases):<3} {passed:>3}/{len(cases):<3}"
+                )
+    embedder.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+VectorStore adapter benchmark.
+
+Loads the synthetic corpus from bench_numpy.py into every available adapter through
+VectorStore.upsert and reports build time, p50/p99 latency of the three stage queries
+retrieval issues per request, the resident memory the store added (RSS delta, so
+approximate) and support-stage recall against the exact NumPy results. The snapshot
+backend's build time includes exporting the NumPy store; its memory is what the mapped
+files add once queried.
+"""
+
+from __future__ import annotations
+
+import argparse
+import gc
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import List
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import numpy as np  # noqa: E402
+
+from bench_numpy import stage_queries, synthetic_corpus  # noqa: E402
+from store_conformance import empty_store, reopen_as_snapshot  # noqa: E402
+
+from hnsw_store import HNSW_AVAILABLE  # noqa: E402
+from vector_store import BACKEND_CHOICES  # noqa: E402
+
+ADD_BATCH = 5000
+
+
+def rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm", encoding="ascii") as handle:
+            return int(handle.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Build time, latency and memory per VectorStore.")
+    parser.add_argument(
+        "--backends", nargs="+", choices=BACKEND_CHOICES, default=list(BACKEND_CHOICES)
+    )
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 20000])
+    parser.add_argument("--dimensions", type=int, default=256)
+    parser.add_argument("--topics", type=int, default=12)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=6)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    backends = [b for b in args.backends if b != "hnsw" or HNSW_AVAILABLE]
+    if len(backends) != len(args.backends):
+        print("[bench] hnswlib not installed; skipping the hnsw adapter")
+    # Exact results come first so every other adapter can be scored against them.
+    backends.sort(key=lambda backend: backend != "numpy")
+
+    print(
+        f"{'chunks':>8} {'backend':>8} {'build_s':>8} {'p50_ms':>8} {'p99_ms':>8} "
+        f"{'rss_mb':>8} {'recall':>7}"
+    )
+    for size in args.sizes:
+        corpus = synthetic_corpus(size, args.dimensions, args.topics, args.seed)
+        rng = np.random.default_rng(args.seed + 1)
+        picks = rng.integers(0, size, args.requests)
+        queries = corpus["embeddings"][picks] + 0.3 * rng.standard_normal(
+            (args.requests, args.dimensions)
+        ).astype(np.float32)
+        topic_sets = [
+            sorted({corpus["metadatas"][n]["topic"], corpus["metadatas"][(n + 1) % size]["topic"]})
+            for n in picks
+        ]
+        exact: List[List[str]] = []
+        for backend in backends:
+            with tempfile.TemporaryDirectory() as scratch:
+                gc.collect()
+                before = rss_bytes()
+                start = time.perf_counter()
+                store = empty_store(backend, Path(scratch))
+                # In-memory adapters rebuild on every write, so load them in one upsert.
+                batch = ADD_BATCH if backend == "chroma" else size
+                for offset in range(0, size, batch):
+                    window = slice(offset, offset + batch)
+                    store.upsert(
+                        corpus["ids"][window],
+                        corpus["embeddings"][window],
+                        corpus["documents"][window],
+                        corpus["metadatas"][window],
+                    )
+                if backend == "snapshot":
+                    store = reopen_as_snapshot(Path(scratch))(store)
+                build = time.perf_counter() - start
+                added = max(rss_bytes() - before, 0)
+
+                stage_queries(store, queries[0], topic_sets[0], args.top_k)  # warm up
+                timings, selected = [], []
+                for query, topics in zip(queries, topic_sets):
+                    begin = time.perf_counter()
+                    selected.append(stage_queries(store, query, topics, args.top_k))
+                    timings.append((time.perf_counter() - begin) * 1000)
+                timings.sort()
+                if backend == "numpy":
+                    exact = selected
+                recall = "-"
+                if exact:
+                    hits = sum(len(set(a) & set(b)) for a, b in zip(selected, exact))
+                    recall = f"{hits / max(sum(len(b) for b in exact), 1):.3f}"
+                print(
+                    f"{size:>8} {backend:>8} {build:>8.2f} {statistics.median(timings):>8.3f} "
+                    f"{timings[int(0.99 * (len(timings) - 1))]:>8.3f} {added / 1e6:>8.1f} "
+                    f"{recall:>7}"
+                )
+                del store
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Vector width / precision benchmark.
+
+Builds the real corpus once per (dimensions, storage) setting into a scratch Chroma
+directory and exports a snapshot, then reports the Chroma index size, the bytes the
+snapshot's vector files occupy, median query latency against the snapshot (which
+searches the compact codes) and the router harness pass rate, so the cheapest setting
+that keeps routing accuracy can be picked.
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import io
+import json
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "router_test_harness"))
+
+from dotenv import load_dotenv  # noqa: E402
+
+from batch_planner import BatchLimits  # noqa: E402
+from constants import DEFAULT_COLLECTION, DEFAULT_MODEL  # noqa: E402
+from create_embeddings import build_collection  # noqa: E402
+from embedders import EMBEDDER_CHOICES, default_embedder_kind, make_embedder  # noqa: E402
+from quantization import STORAGE_CHOICES, VectorCodec  # noqa: E402
+from retrieval import open_collection  # noqa: E402
+from router_harness import assert_case, run_in_process  # noqa: E402
+from snapshot import current_snapshot  # noqa: E402
+
+
+def directory_size(path: Path) -> int:
+    return sum(item.stat().st_size for item in path.rglob("*") if item.is_file())
+
+
+def main() -> None:
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Compare stored vector widths and precisions.")
+    parser.add_argument("--embedder", choices=EMBEDDER_CHOICES, default=default_embedder_kind())
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--base-url", default=None)
+    parser.add_argument(
+        "--dimensions",
+        type=int,
+        nargs="+",
+        default=[0, 128, 64],
+        help="Widths to try; 0 keeps the embedder's full width.",
+    )
+    parser.add_argument(
+        "--storage", choices=STORAGE_CHOICES, nargs="+", default=list(STORAGE_CHOICES)
+    )
+    parser.add_argument("--cases", default="router_test_harness/cases.json")
+    parser.add_argument("--repeats", type=int, default=5, help="Timed runs per harness query.")
+    args = parser.parse_args()
+
+    cases = json.loads(Path(args.cases).read_text(encoding="utf-8"))
+    print(
+        f"{'dims':>6} {'storage':>8} {'index_kb':>9} {'vector_kb':>10} "
+        f"{'query_ms':>9} {'passed':>7}"
+    )
+    for dimensions in args.dimensions:
+        for storage in args.storage:
+            codec = VectorCodec(dimensions or None, storage)
+            embedder = make_embedder(
+                args.embedder, args.model, args.base_url, dimensions=codec.dimensions
+            )
+            with tempfile.TemporaryDirectory() as scratch:
+                chroma_path = Path(scratch)
+                quiet = io.StringIO()
+                with contextlib.redirect_stdout(quiet), contextlib.redirect_stderr(quiet):
+                    build_collection(
+                        DEFAULT_COLLECTION,
+                        embedder,
+                        BatchLimits(),
+                        chroma_path,
+                        preview_dir=None,
+                        blue_green=False,
+                        codec=codec,
+                        snapshot=True,
+                    )
+                snapshot_dir = current_snapshot(chroma_path, DEFAULT_COLLECTION)
+                vector_bytes = sum(
+                    path.stat().st_size
+                    for path in snapshot_dir.glob("*.npy")
+                    if path.name in ("vectors.npy", "scales.npy")
+                )
+
+                collection = open_collection(chroma_path, DEFAULT_COLLECTION, backend="snapshot")
+                passed = 0
+                timings = []
+                for case in cases:
+                    for repeat in range(args.repeats):
+                        start = time.perf_counter()
+                        result = run_in_process(case["query"], collection, embedder)
+                        timings.append(time.perf_counter() - start)
+                    ok, _ = assert_case(case, result)
+                    passed += ok
+                index_bytes = directory_size(chroma_path) - directory_size(snapshot_dir.parent)
+            embedder.close()
+            print(
+                f"{dimensions or 'full':>6} {storage:>8} {index_bytes / 1024:>9.1f} "
+                f"{vector_bytes / 1024:>10.2f} {statistics.median(timings) * 1000:>9.2f} "
+                f"{passed:>3}/{len(cases):<3}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the OpenAI /v1/embeddings endpoint.
+
+Returns deterministic vectors (derived from a sha256 of each input) after a fixed
+artificial latency, and tracks peak request concurrency at GET /stats so ingestion
+benchmarks can be run without network access or API spend. It can also inject 429
+(with Retry-After) and 503 responses to exercise the retry/rate-limit client.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import base64
+import hashlib
+import math
+import random
+from array import array
+from typing import Any, Dict, List, Optional, Tuple
+
+import orjson
+
+
+REASONS = {200: "OK", 404: "Not Found", 429: "Too Many Requests", 503: "Service Unavailable"}
+
+
+class MockEmbeddingServer:
+    def __init__(
+        self,
+        latency: float,
+        dimensions: int,
+        throttle_rate: float = 0.0,
+        error_rate: float = 0.0,
+        retry_after: float = 0.0,
+        seed: int = 0,
+    ) -> None:
+        self.latency = latency
+        self.dimensions = dimensions
+        self.throttle_rate = throttle_rate
+        self.error_rate = error_rate
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+        self.throttled = 0
+        self.errors = 0
+        self.requests = 0
+        self.inputs = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+
+    def vector(self, text: str, dimensions: Optional[int] = None) -> List[float]:
+        dimensions = dimensions or self.dimensions
+        values: List[float] = []
+        counter = 0
+        while len(values) < dimensions:
+            digest = hashlib.sha256(f"{counter}:{text}".encode("utf-8")).digest()
+            values.extend((byte - 127.5) / 127.5 for byte in digest)
+            counter += 1
+        values = values[:dimensions]
+        norm = math.sqrt(sum(v * v for v in values)) or 1.0
+        return [v / norm for v in values]
+
+    def encode(self, text: str, as_base64: bool, dimensions: Optional[int] = None) -> Any:
+        vector = self.vector(text, dimensions)
+        if not as_base64:
+            return vector
+        return base64.b64encode(array("f", vector).tobytes()).decode("ascii")
+
+    async def embeddings(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        as_base64 = body.get("encoding_format") == "base64"
+        dimensions = body.get("dimensions")
+        inputs = body.get("input") or []
+        if isinstance(inputs, str):
+            inputs = [inputs]
+        self.requests += 1
+        self.inputs += len(inputs)
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.latency)
+        finally:
+            self.in_flight -= 1
+        return {
+            "object": "list",
+            "model": body.get("model", ""),
+            "data": [
+                {
+                    "object": "embedding",
+                    "index": i,
+                    "embedding": self.encode(text, as_base64, dimensions),
+                }
+                for i, text in enumerate(inputs)
+            ],
+            "usage": {"prompt_tokens": 0, "total_tokens": 0},
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "inputs": self.inputs,
+            "peak_in_flight": self.peak_in_flight,
+            "throttled": self.throttled,
+            "errors": self.errors,
+        }
+
+    def injected_failure(self) -> Tuple[int, Dict[str, str], Dict[str, Any]] | None:
+        roll = self.random.random()
+        if roll < self.throttle_rate:
+            self.throttled += 1
+            headers = {"Retry-After": f"{self.retry_after:g}"} if self.retry_after else {}
+            return 429, headers, {"error": {"message": "Rate limit reached", "type": "requests"}}
+        if roll < self.throttle_rate + self.error_rate:
+            self.errors += 1
+            return 503, {}, {"error": {"message": "The server is overloaded"}}
+        return None
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, _ = request_line.decode("latin-1").split(" ", 2)
+                headers: Dict[str, str] = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get("content-length", "0"))
+                raw = await reader.readexactly(length) if length else b""
+
+                extra: Dict[str, str] = {}
+                if method == "POST" and path.endswith("/embeddings"):
+                    failure = self.injected_failure()
+                    if failure is not None:
+                        await asyncio.sleep(self.latency / 10)
+                        status, extra, payload = failure
+                    else:
+                        status, payload = 200, await self.embeddings(orjson.loads(raw or b"{}"))
+                elif method == "GET" and path == "/stats":
+                    status, payload = 200, self.stats()
+                else:
+                    status, payload = 404, {"error": {"message": f"no route for {path}"}}
+
+                body = orjson.dumps(payload)
+                head = [f"HTTP/1.1 {status} {REASONS.get(status, 'Error')}"]
+                head.append("Content-Type: application/json")
+                head.append(f"Content-Length: {len(body)}")
+                head.extend(f"{name}: {value}" for name, value in extra.items())
+                writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + body)
+                await writer.drain()
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (asyncio.IncompleteReadError, ConnectionResetError):
+            pass
+        finally:
+            writer.close()
+
+
+async def serve(host: str, port: int, app: MockEmbeddingServer) -> None:
+    server = await asyncio.start_server(app.handle, host, port)
+    print(f"mock embeddings listening on http://{host}:{port}/v1/embeddings", flush=True)
+    async with server:
+        await server.serve_forever()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serve fake OpenAI-style embeddings locally.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.3, help="Seconds per request.")
+    parser.add_argument("--dimensions", type=int, default=256)
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Fraction answered 429.")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction answered 503.")
+    parser.add_argument("--retry-after", type=float, default=0.0, help="Retry-After on 429s.")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    app = MockEmbeddingServer(
+        args.latency,
+        args.dimensions,
+        throttle_rate=args.throttle_rate,
+        error_rate=args.error_rate,
+        retry_after=args.retry_after,
+        seed=args.seed,
+    )
+    try:
+        asyncio.run(serve(args.host, args.port, app))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+"""
+VectorStore conformance checks.
+
+Loads the same small synthetic corpus into every available adapter through the protocol
+(upsert/delete), then checks count, get, snapshot and filtered queries against a
+brute-force reference of the current filter semantics: `$eq`, `$in` and `$and` over
+metadata, where a missing key never matches. The read-only snapshot backend is loaded
+through a NumPy store and exported before the read checks. Prints one PASS/FAIL line per check and
+exits non-zero on any failure, like the router harness.
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import tempfile
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import chromadb  # noqa: E402
+import numpy as np  # noqa: E402
+
+from hnsw_store import HNSW_AVAILABLE, HnswCollection  # noqa: E402
+from numpy_store import NumpyCollection  # noqa: E402
+from snapshot import SnapshotCollection, write_snapshot  # noqa: E402
+from vector_store import BACKEND_CHOICES, ChromaStore, VectorStore  # noqa: E402
+
+TOPICS = ("conditions", "notifications_intent", "planner_policy", "filtering")
+
+FILTERS: List[Tuple[str, Optional[Dict[str, Any]]]] = [
+    ("no filter", None),
+    ("$eq", {"role": {"$eq": "router"}}),
+    ("$in", {"topic": {"$in": ["conditions", "filtering"]}}),
+    ("$in unknown value", {"topic": {"$in": ["no_such_topic"]}}),
+    ("$eq int", {"priority": {"$eq": 2}}),
+    ("$eq missing key", {"only_on_some": {"$eq": "yes"}}),
+    (
+        "$and",
+        {
+            "$and": [
+                {"role": {"$eq": "support"}},
+                {"topic": {"$in": ["conditions", "planner_policy"]}},
+            ]
+        },
+    ),
+    (
+        "$and three-way",
+        {
+            "$and": [
+                {"role": {"$eq": "support"}},
+                {"topic": {"$eq": "planner_policy"}},
+                {"priority": {"$in": [0, 1]}},
+            ]
+        },
+    ),
+]
+
+
+def synthetic_records(size: int, dimensions: int, seed: int) -> Dict[str, Any]:
+    rng = np.random.default_rng(seed)
+    metadatas = []
+    for n in range(size):
+        meta = {
+            "doc_type": "RULE",
+            "topic": TOPICS[n % len(TOPICS)],
+            "role": "router" if n % 7 == 0 else "support",
+            "priority": int(n % 3),
+        }
+        if n % 5 == 0:
+            meta["only_on_some"] = "yes"
+        metadatas.append(meta)
+    return {
+        "ids": [f"chunk-{n:05d}" for n in range(size)],
+        "embeddings": rng.standard_normal((size, dimensions)).astype(np.float32),
+        "documents": [f"document {n}" for n in range(size)],
+        "metadatas": metadatas,
+        "queries": rng.standard_normal((4, dimensions)).astype(np.float32),
+    }
+
+
+def reference_matches(meta: Dict[str, Any], where: Optional[Dict[str, Any]]) -> bool:
+    if not where:
+        return True
+    if "$and" in where:
+        return all(reference_matches(meta, clause) for clause in where["$and"])
+    (key, condition), = where.items()
+    (operator, value), = condition.items()
+    if key not in meta:
+        return False
+    return meta[key] == value if operator == "$eq" else meta[key] in value
+
+
+def reference_query(
+    records: Dict[str, Any], query: np.ndarray, where: Optional[Dict[str, Any]], k: int
+) -> List[Tuple[str, float]]:
+    scored = [
+        (doc_id, float(np.sum((vector - query) ** 2)))
+        for doc_id, vector, meta in zip(records["ids"], records["embeddings"], records["metadatas"])
+        if reference_matches(meta, where)
+    ]
+    return sorted(scored, key=lambda hit: hit[1])[:k]
+
+
+def empty_store(backend: str, scratch: Path) -> VectorStore:
+    if backend == "chroma":
+        client = chromadb.PersistentClient(path=str(scratch))
+        return ChromaStore(client.create_collection(name="conformance"))
+    # Snapshots are read-only, so they are filled through a NumPy store and exported.
+    cls = HnswCollection if backend == "hnsw" else NumpyCollection
+    return cls("conformance", [], np.zeros((0, 0), dtype=np.float32), [], [])
+
+
+def reopen_as_snapshot(scratch: Path) -> Callable[[VectorStore], VectorStore]:
+    def reopen(store: VectorStore) -> VectorStore:
+        directory = write_snapshot(store.snapshot(), scratch / "snapshot", "conformance")
+        return SnapshotCollection(directory)
+
+    return reopen
+
+
+def run_checks(
+    store: VectorStore,
+    records: Dict[str, Any],
+    k: int,
+    reopen: Optional[Callable[[VectorStore], VectorStore]] = None,
+) -> List[Tuple[str, bool, str]]:
+    checks: List[Tuple[str, bool, str]] = []
+
+    def check(name: str, test: Callable[[], Tuple[bool, str]]) -> None:
+        try:
+            ok, detail = test()
+        except Exception as exc:  # a crash is a failed check, not a failed run
+            ok, detail = False, f"{type(exc).__name__}: {exc}"
+        checks.append((name, ok, detail))
+
+    size = len(records["ids"])
+    half = size // 2
+    # Load in two upserts, overwrite a few records, then delete some.
+    store.upsert(
+        records["ids"][:half],
+        records["embeddings"][:half],
+        records["documents"][:half],
+        records["metadatas"][:half],
+    )
+    store.upsert(
+        records["ids"][half:],
+        records["embeddings"][half:],
+        records["documents"][half:],
+        records["metadatas"][half:],
+    )
+    check("count after upsert", lambda: (store.count() == size, f"count={store.count()}"))
+
+    overwritten = records["ids"][:3]
+    store.upsert(
+        overwritten,
+        records["embeddings"][:3],
+        [f"rewritten {doc_id}" for doc_id in overwritten],
+        records["metadatas"][:3],
+    )
+
+    def overwrite() -> Tuple[bool, str]:
+        found = store.get(ids=overwritten, include=["documents"])
+        documents = dict(zip(found["ids"], found["documents"]))
+        ok = store.count() == size and all(
+            documents.get(doc_id) == f"rewritten {doc_id}" for doc_id in overwritten
+        )
+        return ok, f"count={store.count()} documents={documents}"
+
+    check("upsert overwrites by id", overwrite)
+
+    deleted = records["ids"][-4:]
+    store.delete(deleted)
+    if reopen is not None:
+        store = reopen(store)
+    keep = [n for n, doc_id in enumerate(records["ids"]) if doc_id not in deleted]
+    remaining = {key: [records[key][n] for n in keep] for key in ("ids", "documents", "metadatas")}
+    remaining["embeddings"] = records["embeddings"][keep]
+    check(
+        "delete removes ids",
+        lambda: (
+            store.count() == len(keep) and not store.get(ids=deleted)["ids"],
+            f"count={store.count()}",
+        ),
+    )
+
+    def get_by_id() -> Tuple[bool, str]:
+        wanted = [remaining["ids"][5], remaining["ids"][1], "chunk-missing"]
+        found = store.get(ids=wanted, include=["metadatas", "embeddings"])
+        by_id = dict(zip(found["ids"], found["metadatas"]))
+        vectors = dict(zip(found["ids"], found["embeddings"]))
+        ok = set(by_id) == set(wanted[:2]) and all(
+            by_id[doc_id] == remaining["metadatas"][remaining["ids"].index(doc_id)]
+            and np.allclose(
+                vectors[doc_id], remaining["embeddings"][remaining["ids"].index(doc_id)]
+            )
+            for doc_id in wanted[:2]
+        )
+        return ok, f"ids={found['ids']}"
+
+    check("get by id", get_by_id)
+
+    for name, where in FILTERS:
+        def get_filtered(where: Optional[Dict[str, Any]] = where) -> Tuple[bool, str]:
+            expected = {
+                doc_id
+                for doc_id, meta in zip(remaining["ids"], remaining["metadatas"])
+                if reference_matches(meta, where)
+            }
+            found = set(store.get(where=where)["ids"])
+            return found == expected, f"got {len(found)} expected {len(expected)}"
+
+        def query_filtered(where: Optional[Dict[str, Any]] = where) -> Tuple[bool, str]:
+            for query in records["queries"]:
+                expected = reference_query(remaining, query, where, k)
+                found = store.query(
+                    query_embeddings=[query], n_results=k, where=where, include=["distances"]
+                )
+                ids, distances = found["ids"][0], found["distances"][0]
+                if ids != [doc_id for doc_id, _ in expected] or not np.allclose(
+                    distances, [distance for _, distance in expected], rtol=1e-3, atol=1e-3
+                ):
+                    return False, f"got {ids[:3]}... expected {[d for d, _ in expected][:3]}..."
+            return True, f"{len(records['queries'])} queries"
+
+        check(f"get where {name}", get_filtered)
+        check(f"query where {name}", query_filtered)
+
+    def batched_query() -> Tuple[bool, str]:
+        found = store.query(query_embeddings=records["queries"], n_results=k, include=["distances"])
+        expected = [
+            [doc_id for doc_id, _ in reference_query(remaining, query, None, k)]
+            for query in records["queries"]
+        ]
+        return found["ids"] == expected, f"rows={len(found['ids'])}"
+
+    check("query with several embeddings", batched_query)
+
+    def snapshot_roundtrip() -> Tuple[bool, str]:
+        snapshot = store.snapshot()
+        copy = NumpyCollection.from_snapshot(snapshot)
+        ok = sorted(snapshot.ids) == sorted(remaining["ids"]) and copy.count() == store.count()
+        return ok, f"ids={len(snapshot.ids)} dims={snapshot.embeddings.shape}"
+
+    check("snapshot round trip", snapshot_roundtrip)
+    return checks
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Check VectorStore adapters against one reference."
+    )
+    parser.add_argument(
+        "--backends", nargs="+", choices=BACKEND_CHOICES, default=list(BACKEND_CHOICES)
+    )
+    parser.add_argument("--size", type=int, default=300)
+    parser.add_argument("--dimensions", type=int, default=32)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    records = synthetic_records(args.size, args.dimensions, args.seed)
+    total = passed = 0
+    for backend in args.backends:
+        if backend == "hnsw" and not HNSW_AVAILABLE:
+            print(f"\n=== SKIP: {backend} (hnswlib not installed) ===")
+            continue
+        with tempfile.TemporaryDirectory() as scratch:
+            reopen = reopen_as_snapshot(Path(scratch)) if backend == "snapshot" else None
+            checks = run_checks(empty_store(backend, Path(scratch)), records, args.top_k, reopen)
+        print(f"\n=== {backend} ===")
+        for name, ok, detail in checks:
+            print(f"[{'PASS' if ok else 'FAIL'}] {name}: {detail}")
+        total += len(checks)
+        passed += sum(ok for _, ok, _ in checks)
+
+    print(f"\nSummary: {passed}/{total} passed.")
+    return 0 if passed == total else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
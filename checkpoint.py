@@ -0,0 +1,130 @@
+from __future__ import annotations
+
+import json
+import os
+import shutil
+import uuid
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+STATE_NAME = "state.json"
+SPILL_NAME = "spill.f32"
+
+
+def checkpoint_dir(chroma_path: Path, collection_name: str) -> Path:
+    return chroma_path / f"{collection_name}.checkpoint"
+
+
+class IngestCheckpoint:
+    """
+    Progress of one ingestion run, persisted after every batch.
+
+    Embeddings are appended to a raw float32 spill file as soon as a batch comes back
+    from the API, and the batch is marked upserted once Chroma has it. A resumed run with
+    the same plan fingerprint skips upserted batches and replays spilled ones without
+    calling the API again.
+    """
+
+    def __init__(self, directory: Path, run_id: str, fingerprint: str) -> None:
+        self.directory = Path(directory)
+        self.run_id = run_id
+        self.fingerprint = fingerprint
+        # batch index -> {"offset": bytes, "rows": n, "dims": d, "upserted": bool}
+        self.batches: Dict[int, Dict[str, Any]] = {}
+        self.spill_bytes = 0
+        # Collection this run writes into (blue/green builds pick a fresh one per run).
+        self.target: Optional[str] = None
+
+    @property
+    def state_path(self) -> Path:
+        return self.directory / STATE_NAME
+
+    @property
+    def spill_path(self) -> Path:
+        return self.directory / SPILL_NAME
+
+    @classmethod
+    def start(cls, directory: Path, fingerprint: str, resume: bool) -> "IngestCheckpoint":
+        """Resume the run stored in `directory` if asked and compatible, else begin a new one."""
+        directory = Path(directory)
+        if resume:
+            existing = cls.load(directory)
+            if existing is not None and existing.fingerprint == fingerprint:
+                return existing
+            if existing is not None:
+                print("[checkpoint] plan changed since the interrupted run; starting over")
+        if directory.exists():
+            shutil.rmtree(directory)
+        directory.mkdir(parents=True)
+        checkpoint = cls(directory, uuid.uuid4().hex[:12], fingerprint)
+        checkpoint.spill_path.touch()
+        checkpoint.save()
+        return checkpoint
+
+    @classmethod
+    def load(cls, directory: Path) -> Optional["IngestCheckpoint"]:
+        state_path = Path(directory) / STATE_NAME
+        if not state_path.exists():
+            return None
+        try:
+            state = json.loads(state_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        checkpoint = cls(directory, state["run_id"], state["fingerprint"])
+        checkpoint.batches = {int(k): v for k, v in state["batches"].items()}
+        checkpoint.spill_bytes = int(state["spill_bytes"])
+        checkpoint.target = state.get("target")
+        # Drop anything appended after the last recorded batch (torn write).
+        with checkpoint.spill_path.open("ab") as spill:
+            spill.truncate(checkpoint.spill_bytes)
+        return checkpoint
+
+    def save(self) -> None:
+        state = {
+            "run_id": self.run_id,
+            "fingerprint": self.fingerprint,
+            "spill_bytes": self.spill_bytes,
+            "target": self.target,
+            "batches": self.batches,
+        }
+        tmp_path = self.state_path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(state, ensure_ascii=True), encoding="utf-8")
+        os.replace(tmp_path, self.state_path)
+
+    def is_upserted(self, batch: int) -> bool:
+        return bool(self.batches.get(batch, {}).get("upserted"))
+
+    def spilled(self, batch: int) -> Optional[np.ndarray]:
+        entry = self.batches.get(batch)
+        if entry is None:
+            return None
+        count = entry["rows"] * entry["dims"]
+        with self.spill_path.open("rb") as spill:
+            spill.seek(entry["offset"])
+            values = np.fromfile(spill, dtype="<f4", count=count)
+        return values.reshape(entry["rows"], entry["dims"])
+
+    def spill(self, batch: int, embeddings: np.ndarray) -> None:
+        embeddings = np.ascontiguousarray(embeddings, dtype="<f4")
+        with self.spill_path.open("ab") as spill:
+            spill.write(embeddings.tobytes())
+            spill.flush()
+            os.fsync(spill.fileno())
+        rows, dims = embeddings.shape
+        self.batches[batch] = {
+            "offset": self.spill_bytes,
+            "rows": rows,
+            "dims": dims,
+            "upserted": False,
+        }
+        self.spill_bytes += embeddings.nbytes
+        self.save()
+
+    def mark_upserted(self, batch: int) -> None:
+        self.batches[batch]["upserted"] = True
+        self.save()
+
+    def finish(self) -> None:
+        shutil.rmtree(self.directory, ignore_errors=True)
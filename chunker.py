@@ -0,0 +1,340 @@
+from __future__ import annotations
+
+import argparse
+import importlib.util
+import pprint
+import re
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+from constants import (
+    DATA_PATH,
+    DEFAULT_CHUNK_MAX_CHARS,
+    DEFAULT_CHUNK_OVERLAP_LINES,
+    GENERATED_DATA_PATH,
+    RAW_PROMPT_PATH,
+)
+from corpus import import_chunk_data
+
+# Registry key -> (doc_type, topic, priority). Sections without an entry are reported and skipped.
+SECTION_TOPICS: Dict[str, Tuple[str, str, int]] = {
+    "core_intro": ("RULE", "planner_policy", 80),
+    "step_neg1_user_mgmt": ("RULE", "user_mgmt", 100),
+    "step0_static_vs_dynamic": ("RULE", "static_records", 100),
+    "data_jmes": ("RULE", "filtering", 85),
+    "data_fltr": ("RULE", "filtering", 85),
+    "data_rcrd_info": ("RULE", "filtering", 85),
+    "action_events_builtin_filtering": ("RULE", "actions_builtin_filtering", 90),
+    "cond_overview": ("RULE", "conditions", 100),
+    "cond_dom": ("RULE", "conditions", 100),
+    "cond_seq": ("RULE", "conditions", 100),
+    "cond_bin": ("RULE", "conditions", 100),
+    "cond_distinction_table": ("RULE", "conditions", 100),
+    "cond_decision_rules": ("RULE", "conditions", 100),
+    "cond_do_not_use": ("RULE", "conditions", 100),
+    "cond_distinction_notes": ("RULE", "conditions", 100),
+    "loops_types": ("RULE", "loops", 70),
+    "loops_interpretation": ("RULE", "loops", 70),
+    "loop_type_identification": ("RULE", "loops", 70),
+    "flow_formatting_rules": ("RULE", "conditions", 100),
+    "flow_formatting_rules_detailed": ("RULE", "conditions", 100),
+    "flow_examples_correct": ("RULE", "conditions", 100),
+    "flow_examples_wrong": ("RULE", "conditions", 100),
+    "flow_applicability_checklist": ("RULE", "conditions", 100),
+    "decision_process_refined": ("RULE", "decision_process", 75),
+    "examples_correct_identification": ("RULE", "decision_process", 75),
+    "formula_detection": ("RULE", "data_ops_rules", 80),
+    "output_constraints": ("RULE", "planner_policy", 80),
+    "triggers_catalog": ("RULE", "triggers", 60),
+    "trigger_methods": ("RULE", "triggers", 60),
+    "planner_policy": ("RULE", "planner_policy", 80),
+    "output_contract": ("RULE", "planner_policy", 80),
+    "examples": ("RULE", "planner_policy", 80),
+}
+
+# Topic -> router summary (intent, signals). Topics without an entry get support chunks only;
+# planner_policy is appended to every query anyway, so it never needs routing.
+TOPIC_ROUTING: Dict[str, Tuple[str, str]] = {
+    "user_mgmt": (
+        "create/update/activate/deactivate users, assign roles, extend responsibilities.",
+        "user, users, permission, access, assign role, grant, revoke, head of, responsibility",
+    ),
+    "static_records": (
+        "record operations on static entities (roles, departments, countries).",
+        "role, roles, department, departments, country, countries",
+    ),
+    "filtering": (
+        "retrieve records or fields from a table (all matching, one record, or specific fields).",
+        "get records where, retrieve all, fetch, show, list, first/last/top N, filter records",
+    ),
+    "actions_builtin_filtering": (
+        "database record CRUD action (create/update/delete/duplicate/restore) on a record.",
+        "create a record, update the record, delete, duplicate, restore, remove the record",
+    ),
+    "conditions": (
+        "conditional branching / decision logic in workflow.",
+        "if/else, when/then, otherwise, unless, first check, if not, else check, and check if",
+    ),
+    "loops": (
+        "repetition / iteration in workflow.",
+        "repeat, times, for each, for every, loop, iterate, from X to Y, while, until, do while",
+    ),
+    "decision_process": (
+        "choosing between retrieval, field extraction and action events for a query.",
+        "which event, get vs filter, field names, number of records, common mistakes",
+    ),
+    "data_ops_rules": (
+        "compute/transform/derive a value or reshape data.",
+        "calculate, compute, sum, total, percentage, formula, concat, uppercase, format date",
+    ),
+    "triggers": (
+        "how the workflow starts (database change, schedule, button, API, webhook, file).",
+        "trigger, when a record is created, every day, scheduled, on click, webhook, upload",
+    ),
+}
+
+STEP_RE = re.compile(r"^(\d+\.\s+\S|STEP\s+-?\w+\b|PATTERN\s+\d+\b)")
+# Short summary of a support chunk: its first lines, up to this many characters.
+SUMMARY_CHARS = 400
+
+
+def load_sections(path: str = RAW_PROMPT_PATH) -> Dict[str, str]:
+    spec = importlib.util.spec_from_file_location("processor_prompt", path)
+    if spec is None or spec.loader is None:
+        raise RuntimeError(f"Unable to load module from {path}")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    if not hasattr(module, "PROMPT_SECTIONS_REGISTRY"):
+        raise RuntimeError(f"{path} is missing PROMPT_SECTIONS_REGISTRY")
+    return dict(module.PROMPT_SECTIONS_REGISTRY)
+
+
+def is_heading(line: str) -> bool:
+    """Numbered steps, STEP/PATTERN markers and unindented `Something:` lines (EXAMPLES: etc.)."""
+    if not line or line[0].isspace() or line.startswith(("-", "→", "↳")):
+        return False
+    return bool(STEP_RE.match(line)) or (line.rstrip().endswith(":") and len(line) <= 100)
+
+
+def text_size(lines: List[str]) -> int:
+    return sum(len(line) + 1 for line in lines)
+
+
+def structural_blocks(lines: List[str]) -> List[List[str]]:
+    """Split a section body into blocks, each starting at a heading."""
+    blocks: List[List[str]] = [[]]
+    for line in lines:
+        if is_heading(line) and any(existing.strip() for existing in blocks[-1]):
+            blocks.append([])
+        blocks[-1].append(line)
+    return [block for block in blocks if any(line.strip() for line in block)]
+
+
+def bullet_groups(lines: List[str]) -> List[List[str]]:
+    """Outermost bullets (or unindented lines) together with their nested lines."""
+    indents = [len(line) - len(line.lstrip()) for line in lines if line.lstrip().startswith("- ")]
+    outer = min(indents, default=0)
+    groups: List[List[str]] = []
+    for line in lines:
+        stripped = line.lstrip()
+        indent = len(line) - len(stripped)
+        starts = bool(stripped) and (indent == 0 or (indent == outer and stripped.startswith("- ")))
+        if starts or not groups:
+            groups.append([])
+        groups[-1].append(line)
+    return groups
+
+
+def pack(groups: List[List[str]], budget: int) -> List[List[str]]:
+    """
+    Greedily pack line groups into parts of at most `budget` chars; oversized groups split
+    by line.
+    """
+    parts: List[List[str]] = []
+    current: List[str] = []
+    for group in groups:
+        if text_size(group) > budget:
+            pieces = [[line] for line in group]
+        else:
+            pieces = [group]
+        for piece in pieces:
+            if current and text_size(current) + text_size(piece) > budget:
+                parts.append(current)
+                current = []
+            current = current + piece
+    if current:
+        parts.append(current)
+    return parts
+
+
+def split_section(
+    text: str,
+    max_chars: int = DEFAULT_CHUNK_MAX_CHARS,
+    overlap_lines: int = DEFAULT_CHUNK_OVERLAP_LINES,
+) -> List[str]:
+    """
+    Split a prompt section on its own structure: heading blocks first (numbered steps,
+    EXAMPLES:/CAPS: headings), then bullet groups inside blocks that are still too long.
+    Every piece repeats the section title, later parts of a split block repeat the block
+    heading, and each piece starts with the last `overlap_lines` lines of the previous one.
+    `max_chars` bounds the new content per piece; the repeated context comes on top.
+    """
+    text = text.strip("\n")
+    if len(text) <= max_chars:
+        return [text]
+    title, *body = text.splitlines()
+    budget = max(max_chars - len(title) - 1, 1)
+
+    parts: List[List[str]] = []
+    for block in structural_blocks(body):
+        if text_size(block) <= budget:
+            parts.append(block)
+            continue
+        heading = block[0] if is_heading(block[0]) else None
+        rest = block[1:] if heading else block
+        for part in pack(bullet_groups(rest), budget - len(heading or "") - 1):
+            parts.append(([heading] if heading else []) + part)
+
+    # Merge neighbouring small blocks back together so pieces stay close to the budget.
+    merged: List[List[str]] = []
+    for part in parts:
+        if merged and text_size(merged[-1]) + text_size(part) <= budget:
+            merged[-1] = merged[-1] + part
+        else:
+            merged.append(part)
+
+    pieces = []
+    previous: List[str] = []
+    for part in merged:
+        overlap = []
+        if overlap_lines:
+            overlap = [line for line in previous if line.strip()][-overlap_lines:]
+        lines = [title, *overlap, *part] if previous else [title, *part]
+        pieces.append("\n".join(lines).strip("\n"))
+        previous = part
+    return pieces
+
+
+def summarize(doc_type: str, topic: str, key: str, part: int, parts: int, piece: str) -> str:
+    excerpt: List[str] = []
+    for line in piece.splitlines():
+        if excerpt and text_size(excerpt) + len(line) > SUMMARY_CHARS:
+            break
+        if line.strip():
+            excerpt.append(line.strip())
+    return "\n".join([f"SUPPORT.{doc_type}.{topic}", f"Section: {key} ({part}/{parts})", *excerpt])
+
+
+def chunk_sections(
+    sections: Dict[str, str],
+    max_chars: int = DEFAULT_CHUNK_MAX_CHARS,
+    overlap_lines: int = DEFAULT_CHUNK_OVERLAP_LINES,
+) -> Tuple[List[Dict[str, Any]], List[str]]:
+    """
+    Turn the section registry into chunk_data records: one router chunk per routed topic
+    (listing the sections it covers) followed by that topic's support chunks.
+    Returns (chunks, unmapped section keys).
+    """
+    support: Dict[str, List[Dict[str, Any]]] = {}
+    titles: Dict[str, List[str]] = {}
+    specs: Dict[str, Tuple[str, int]] = {}
+    unmapped = []
+    for key, text in sections.items():
+        if key not in SECTION_TOPICS:
+            unmapped.append(key)
+            continue
+        doc_type, topic, priority = SECTION_TOPICS[key]
+        specs.setdefault(topic, (doc_type, priority))
+        pieces = split_section(text, max_chars, overlap_lines)
+        titles.setdefault(topic, []).append(pieces[0].splitlines()[0].strip())
+        for n, piece in enumerate(pieces, start=1):
+            support.setdefault(topic, []).append(
+                {
+                    "doc_type": doc_type,
+                    "topic": topic,
+                    "priority": priority,
+                    "role": "support",
+                    "data": summarize(doc_type, topic, key, n, len(pieces), piece),
+                    "text": piece,
+                }
+            )
+
+    chunks: List[Dict[str, Any]] = []
+    for topic, records in support.items():
+        doc_type, priority = specs[topic]
+        if topic in TOPIC_ROUTING:
+            intent, signals = TOPIC_ROUTING[topic]
+            chunks.append(
+                {
+                    "doc_type": doc_type,
+                    "topic": topic,
+                    "priority": priority,
+                    "role": "router",
+                    "data": "\n".join(
+                        [
+                            f"ROUTER.{doc_type}.{topic}",
+                            f"Intent: {intent}",
+                            f"Signals: {signals}",
+                            f"Covers: {'; '.join(titles[topic])}",
+                        ]
+                    ),
+                    "text": "",
+                }
+            )
+        chunks.extend(records)
+    return chunks, unmapped
+
+
+def carry_over(
+    chunks: List[Dict[str, Any]], handwritten: List[Dict[str, Any]]
+) -> List[Dict[str, Any]]:
+    """Hand-written chunks for topics the prompt sections do not cover (e.g. notifications)."""
+    covered = {chunk["topic"] for chunk in chunks}
+    return [dict(chunk) for chunk in handwritten if chunk.get("topic") not in covered]
+
+
+def write_chunk_module(chunks: List[Dict[str, Any]], output: str, source: str) -> None:
+    """Write a rag_chunks_data.py-style module so corpus.py can compile it unchanged."""
+    path = Path(output)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    body = pprint.pformat(chunks, indent=1, width=100, sort_dicts=False)
+    path.write_text(
+        f"# Generated by chunker.py from {Path(source).name}; do not edit by hand.\n\n"
+        f"chunk_data = {body}\n",
+        encoding="utf-8",
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Chunk processor_prompt.py sections for RAG.")
+    parser.add_argument("--prompt", default=RAW_PROMPT_PATH)
+    parser.add_argument("--output", default=GENERATED_DATA_PATH)
+    parser.add_argument("--max-chars", type=int, default=DEFAULT_CHUNK_MAX_CHARS)
+    parser.add_argument("--overlap-lines", type=int, default=DEFAULT_CHUNK_OVERLAP_LINES)
+    parser.add_argument(
+        "--handwritten",
+        default=DATA_PATH,
+        help="Keep chunks from this module for topics no section maps to ('' to skip).",
+    )
+    args = parser.parse_args()
+
+    sections = load_sections(args.prompt)
+    chunks, unmapped = chunk_sections(sections, args.max_chars, args.overlap_lines)
+    if args.handwritten:
+        kept = carry_over(chunks, import_chunk_data(args.handwritten))
+        if kept:
+            topics = ", ".join(sorted({chunk["topic"] for chunk in kept}))
+            print(f"[chunker] kept {len(kept)} hand-written chunks: {topics}")
+        chunks.extend(kept)
+    write_chunk_module(chunks, args.output, args.prompt)
+    routers = sum(1 for chunk in chunks if chunk["role"] == "router")
+    print(
+        f"[chunker] sections={len(sections)} chunks={len(chunks)} router={routers} "
+        f"support={len(chunks) - routers} -> {args.output}"
+    )
+    if unmapped:
+        print(f"[chunker] no topic mapping for: {', '.join(unmapped)}")
+
+
+if __name__ == "__main__":
+    main()
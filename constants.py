@@ -1,4 +1,39 @@
-DATA_PATH ="/Users/mac/Documents/prompt_rag/data/processed/rag_chunks_data.py"
+import os
+
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+DATA_PATH = os.path.join(PROJECT_ROOT, "data", "processed", "rag_chunks_data.py")
+RAW_PROMPT_PATH = os.path.join(PROJECT_ROOT, "data", "raw", "processor_prompt.py")
+GENERATED_DATA_PATH = os.path.join(PROJECT_ROOT, "data", "processed", "rag_chunks_generated.py")
+CORPUS_PATH = os.path.join(PROJECT_ROOT, "data", "processed", "rag_chunks.corpus.jsonl")
 DEFAULT_COLLECTION = "rag_chunks"
 DEFAULT_MODEL = "text-embedding-3-small"
-DEFAULT_BATCH_SIZE = 32
\ No newline at end of file
+# Per-request limits for the embeddings endpoint; batches are packed up to all three.
+DEFAULT_BATCH_SIZE = 2048
+DEFAULT_MAX_BATCH_TOKENS = 100_000
+DEFAULT_MAX_BATCH_BYTES = 2 * 1024 * 1024
+MAX_INPUT_TOKENS = 8191
+DEFAULT_CONCURRENCY = 4
+DEFAULT_EMBEDDER = "openai"
+OPENAI_BASE_URL = "https://api.openai.com/v1"
+DEFAULT_HASH_DIMENSIONS = 256
+DEFAULT_REQUESTS_PER_MINUTE = 3000
+DEFAULT_TOKENS_PER_MINUTE = 1_000_000
+DEFAULT_MAX_RETRIES = 6
+DEFAULT_CACHE_PATH = "data/cache/embeddings.sqlite3"
+DEFAULT_CACHE_MAX_BYTES = 256 * 1024 * 1024
+# In-process query-embedding tier in front of the persistent cache (0 entries disables it).
+DEFAULT_QUERY_CACHE_SIZE = 1024
+DEFAULT_QUERY_CACHE_TTL = 3600.0
+DEFAULT_PREVIEW_DIR = "data/processed"
+
+# Blue/green builds: superseded collection versions kept for rollback.
+DEFAULT_KEEP_VERSIONS = 2
+DEFAULT_RETENTION_HOURS = 24.0
+
+# Structure-aware chunking of processor_prompt.py sections.
+DEFAULT_CHUNK_MAX_CHARS = 1200
+DEFAULT_CHUNK_OVERLAP_LINES = 1
+
+# Resident retrieval server (retrieval_server.py / query_client.py).
+DEFAULT_SERVER_HOST = "127.0.0.1"
+DEFAULT_SERVER_PORT = 8766
@@ -0,0 +1,84 @@
+from __future__ import annotations
+
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, Optional, Sequence
+
+from embedding_cache import LOOKUP_CHUNK
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS content (
+    id TEXT PRIMARY KEY,
+    text TEXT NOT NULL
+);
+"""
+
+
+def content_path(chroma_path: Path, collection_name: str) -> Path:
+    return chroma_path / f"{collection_name}.content.sqlite3"
+
+
+class ContentStore:
+    """
+    Chunk bodies for one physical collection, keyed by chunk id, in a SQLite file next to
+    its manifest. Chroma metadata stays small, so searches never carry rule text; readers
+    fetch bodies for the final selection only. Safe to share between threads.
+    """
+
+    def __init__(self, path: Path, readonly: bool = False) -> None:
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        if readonly:
+            uri = f"{self.path.resolve().as_uri()}?mode=ro"
+            self._conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        else:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(
+                str(self.path), isolation_level=None, check_same_thread=False
+            )
+            self._conn.executescript(SCHEMA)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self) -> "ContentStore":
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
+    def replace(self, bodies: Dict[str, str]) -> None:
+        """Make `bodies` the whole content of the store, in one transaction."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute("DELETE FROM content")
+                self._conn.executemany(
+                    "INSERT INTO content (id, text) VALUES (?, ?)",
+                    [(doc_id, text) for doc_id, text in bodies.items() if text],
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def get_many(self, ids: Sequence[str]) -> Dict[str, str]:
+        found: Dict[str, str] = {}
+        unique_ids = list(dict.fromkeys(ids))
+        for start in range(0, len(unique_ids), LOOKUP_CHUNK):
+            chunk = unique_ids[start : start + LOOKUP_CHUNK]
+            placeholders = ",".join("?" * len(chunk))
+            with self._lock:
+                rows = self._conn.execute(
+                    f"SELECT id, text FROM content WHERE id IN ({placeholders})", chunk
+                ).fetchall()
+            found.update(rows)
+        return found
+
+
+def open_content(chroma_path: Path, collection_name: str) -> Optional[ContentStore]:
+    """Read-only store for `collection_name`, or None for builds that kept text in metadata."""
+    path = content_path(chroma_path, collection_name)
+    return ContentStore(path, readonly=True) if path.exists() else None
@@ -0,0 +1,201 @@
+from __future__ import annotations
+
+import argparse
+import hashlib
+import importlib.util
+import os
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+import orjson
+
+from batch_planner import estimate_tokens
+from constants import CORPUS_PATH, DATA_PATH
+
+FORMAT = "prompt-rag-corpus"
+VERSION = 2
+# Metadata columns stored as indexes into the header vocabulary.
+ENCODED_FIELDS = ("doc_type", "topic", "role")
+
+
+def sha256_text(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def sha256_file(path: Path) -> str:
+    digest = hashlib.sha256()
+    with Path(path).open("rb") as handle:
+        for block in iter(lambda: handle.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def chunk_id(source: str, topic: str, role: str, data_sha256: str) -> str:
+    """
+    Stable id for a chunk: the same (source, topic, role, content) always maps to the
+    same id, wherever the chunk sits in chunk_data.
+    """
+    key = "\0".join((source, topic, role, data_sha256))
+    return f"chunk-{hashlib.sha256(key.encode('utf-8')).hexdigest()[:16]}"
+
+
+def import_chunk_data(path: str) -> List[Dict[str, Any]]:
+    """Execute a rag_chunks_data.py-style module. Only the compiler should need this."""
+    spec = importlib.util.spec_from_file_location("rag_chunks_data", path)
+    if spec is None or spec.loader is None:
+        raise RuntimeError(f"Unable to load module from {path}")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    if not hasattr(module, "chunk_data"):
+        raise RuntimeError("rag_chunks_data.py is missing chunk_data")
+    return list(module.chunk_data)
+
+
+def compile_corpus(source: str = DATA_PATH, output: str = CORPUS_PATH) -> Dict[str, Any]:
+    """
+    Compile chunk definitions into a JSONL artifact: one header line (format, version,
+    source checksum, corpus fingerprint, metadata vocabulary) followed by one line per
+    chunk with its stable id, precomputed hashes, token estimates and integer-encoded
+    metadata.
+    """
+    chunk_data = import_chunk_data(source)
+    vocab: Dict[str, List[str]] = {field: [] for field in ENCODED_FIELDS}
+    lookup: Dict[str, Dict[str, int]] = {field: {} for field in ENCODED_FIELDS}
+
+    def encode(field: str, value: str) -> int:
+        table = lookup[field]
+        if value not in table:
+            table[value] = len(vocab[field])
+            vocab[field].append(value)
+        return table[value]
+
+    records = []
+    fingerprint = hashlib.sha256()
+    source_name = Path(source).name
+    seen: Dict[str, int] = {}
+    for index, item in enumerate(chunk_data):
+        data_text = item.get("data") or ""
+        text = item.get("text") or ""
+        data_sha256 = sha256_text(data_text)
+        doc_id = chunk_id(source_name, item.get("topic", ""), item.get("role", ""), data_sha256)
+        # Exact duplicates share a key; number the repeats in order of appearance.
+        seen[doc_id] = seen.get(doc_id, 0) + 1
+        if seen[doc_id] > 1:
+            doc_id = f"{doc_id}-{seen[doc_id]}"
+        record = {
+            "id": doc_id,
+            "index": index,
+            "doc_type": encode("doc_type", item.get("doc_type", "")),
+            "topic": encode("topic", item.get("topic", "")),
+            "role": encode("role", item.get("role", "")),
+            "priority": item.get("priority", 0),
+            "data": data_text,
+            "text": text,
+            "data_sha256": data_sha256,
+            "text_sha256": sha256_text(text),
+            "data_tokens": estimate_tokens(data_text) if data_text else 0,
+            "text_tokens": estimate_tokens(text) if text else 0,
+        }
+        records.append(record)
+        fingerprint.update(orjson.dumps(record, option=orjson.OPT_SORT_KEYS))
+
+    stat = Path(source).stat()
+    header = {
+        "format": FORMAT,
+        "version": VERSION,
+        "source": source_name,
+        "source_sha256": sha256_file(Path(source)),
+        "source_size": stat.st_size,
+        "source_mtime_ns": stat.st_mtime_ns,
+        "count": len(records),
+        "fingerprint": fingerprint.hexdigest(),
+        "vocab": vocab,
+    }
+    output_path = Path(output)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = output_path.with_suffix(output_path.suffix + ".tmp")
+    with tmp_path.open("wb") as handle:
+        handle.write(orjson.dumps(header) + b"\n")
+        for record in records:
+            handle.write(orjson.dumps(record) + b"\n")
+    os.replace(tmp_path, output_path)
+    return header
+
+
+def default_corpus_path(source: str) -> str:
+    """CORPUS_PATH for the hand-written chunks, `<source>.corpus.jsonl` for anything else."""
+    if Path(source).resolve() == Path(DATA_PATH).resolve():
+        return CORPUS_PATH
+    return str(Path(source).with_suffix(".corpus.jsonl"))
+
+
+def read_header(path: str = CORPUS_PATH) -> Optional[Dict[str, Any]]:
+    artifact = Path(path)
+    if not artifact.exists():
+        return None
+    with artifact.open("rb") as handle:
+        header = orjson.loads(handle.readline())
+    if header.get("format") != FORMAT or header.get("version") != VERSION:
+        return None
+    return header
+
+
+def ensure_corpus(path: str = CORPUS_PATH, source: str = DATA_PATH) -> Dict[str, Any]:
+    """Return the artifact header, recompiling first if it is missing or older than `source`."""
+    header = read_header(path)
+    source_path = Path(source)
+    if header is not None and not source_path.exists():
+        return header
+    if header is not None:
+        stat = source_path.stat()
+        unchanged = (source_path.name, stat.st_size, stat.st_mtime_ns) == (
+            header.get("source"),
+            header.get("source_size"),
+            header.get("source_mtime_ns"),
+        )
+        # Same size and mtime: skip hashing; otherwise the checksum decides.
+        if unchanged or header["source_sha256"] == sha256_file(source_path):
+            return header
+    if not source_path.exists():
+        raise RuntimeError(f"No corpus artifact at {path} and no source at {source}")
+    print(f"[corpus] compiling {source_path.name} -> {path}")
+    return compile_corpus(source, path)
+
+
+def iter_corpus(path: str = CORPUS_PATH) -> Iterator[Dict[str, Any]]:
+    """Stream decoded chunk records (chunk_data-shaped dicts plus precomputed fields)."""
+    with Path(path).open("rb") as handle:
+        header = orjson.loads(handle.readline())
+        if header.get("format") != FORMAT or header.get("version") != VERSION:
+            raise RuntimeError(f"{path} is not a v{VERSION} {FORMAT} artifact")
+        vocab = header["vocab"]
+        for line in handle:
+            record = orjson.loads(line)
+            for field in ENCODED_FIELDS:
+                record[field] = vocab[field][record[field]]
+            yield record
+
+
+def load_corpus(path: str = CORPUS_PATH, source: str = DATA_PATH) -> List[Dict[str, Any]]:
+    ensure_corpus(path, source)
+    return list(iter_corpus(path))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Compile rag_chunks_data.py into a corpus artifact."
+    )
+    parser.add_argument("--source", default=DATA_PATH)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+    args.output = args.output or default_corpus_path(args.source)
+
+    header = compile_corpus(args.source, args.output)
+    print(
+        f"[corpus] wrote {args.output} count={header['count']} "
+        f"fingerprint={header['fingerprint'][:16]}"
+    )
+
+
+if __name__ == "__main__":
+    main()
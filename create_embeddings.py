@@ -1,136 +1,751 @@
 from __future__ import annotations
 
 import argparse
-import importlib.util
+import asyncio
+import hashlib
 import json
 import os
+from collections import deque
 from pathlib import Path
-from typing import Any, Dict, Iterable, List
+from typing import Any, Callable, Deque, Dict, List, Optional, Sequence, Tuple
 from dotenv import load_dotenv
 
 import chromadb
-import httpx
+import numpy as np
 from tqdm import tqdm
 
-from constants import DATA_PATH, DEFAULT_COLLECTION, DEFAULT_MODEL, DEFAULT_BATCH_SIZE
+from aliases import (
+    expired_versions,
+    is_version_of,
+    promote,
+    resolve_alias,
+    rollback,
+    version_name,
+    was_promoted,
+)
+from constants import (
+    CORPUS_PATH,
+    DATA_PATH,
+    GENERATED_DATA_PATH,
+    DEFAULT_BATCH_SIZE,
+    DEFAULT_CACHE_MAX_BYTES,
+    DEFAULT_CACHE_PATH,
+    DEFAULT_COLLECTION,
+    DEFAULT_CONCURRENCY,
+    DEFAULT_KEEP_VERSIONS,
+    DEFAULT_MAX_BATCH_BYTES,
+    DEFAULT_MAX_BATCH_TOKENS,
+    DEFAULT_MODEL,
+    DEFAULT_PREVIEW_DIR,
+    DEFAULT_REQUESTS_PER_MINUTE,
+    DEFAULT_RETENTION_HOURS,
+    DEFAULT_TOKENS_PER_MINUTE,
+)
+from batch_planner import BatchLimits, estimate_tokens, plan_batches
+from checkpoint import IngestCheckpoint, checkpoint_dir
+from content_store import ContentStore, content_path, open_content
+from corpus import default_corpus_path, ensure_corpus, iter_corpus
+from embedders import (
+    EMBEDDER_CHOICES,
+    Embedder,
+    default_embedder_kind,
+    embed_texts_async,
+    make_embedder,
+)
+from embedding_cache import EmbeddingCache, normalize_text, open_cache
+from preview import PreviewWriter
+from multivector import DEFAULT_VIEWS, VIEW_CHOICES, view_records
+from quantization import STORAGE_CHOICES, VectorCodec
+from rate_limit import SHARED_QUOTA
+from snapshot import publish_snapshot
+from vector_store import ChromaStore, manifest_path
 
+# Rows per get/upsert/delete call when moving ids in bulk.
+PAGE_SIZE = 1000
 
-def load_chunk_data(path: str) -> List[Dict[str, Any]]:
-    spec = importlib.util.spec_from_file_location("rag_chunks_data", path)
-    if spec is None or spec.loader is None:
-        raise RuntimeError(f"Unable to load module from {path}")
-    module = importlib.util.module_from_spec(spec)
-    spec.loader.exec_module(module)
-    if not hasattr(module, "chunk_data"):
-        raise RuntimeError("rag_chunks_data.py is missing chunk_data")
-    return list(module.chunk_data)
 
+def content_hash(value: Any) -> str:
+    if not isinstance(value, str):
+        value = json.dumps(value, ensure_ascii=True, sort_keys=True)
+    return hashlib.sha256(value.encode("utf-8")).hexdigest()
 
-def batched(items: List[Any], batch_size: int) -> Iterable[List[Any]]:
-    for i in range(0, len(items), batch_size):
-        yield items[i : i + batch_size]
+
+def corpus_fingerprint(
+    collection_metadata: Optional[Dict[str, Any]], entries: Dict[str, Dict[str, Any]]
+) -> str:
+    """Identity of a built collection's content: same model, codec, views and chunk hashes."""
+    metadata = {
+        key: value for key, value in (collection_metadata or {}).items() if key != "fingerprint"
+    }
+    return content_hash({"metadata": metadata, "entries": entries})
+
+
+def load_manifest(path: Path) -> Dict[str, Dict[str, Any]]:
+    if not path.exists():
+        return {}
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+    return dict(data.get("entries", {}))
+
+
+def save_manifest(
+    path: Path, collection_name: str, entries: Dict[str, Dict[str, Any]]
+) -> None:
+    payload = {"collection": collection_name, "count": len(entries), "entries": entries}
+    tmp_path = path.with_suffix(path.suffix + ".tmp")
+    tmp_path.write_text(json.dumps(payload, ensure_ascii=True, indent=2), encoding="utf-8")
+    os.replace(tmp_path, path)
+
+
+def plan_incremental(
+    ids: List[str],
+    entries: Dict[str, Dict[str, Any]],
+    manifest: Dict[str, Dict[str, Any]],
+) -> Tuple[List[int], List[int], List[str]]:
+    """
+    Diff the current chunks against the last manifest.
+    Returns (positions to re-embed, positions needing a metadata-only update, stale ids).
+    """
+    to_embed: List[int] = []
+    to_update: List[int] = []
+    for position, doc_id in enumerate(ids):
+        previous = manifest.get(doc_id)
+        current = entries[doc_id]
+        if (
+            previous is None
+            or previous.get("model") != current["model"]
+            or previous.get("codec", VectorCodec().name) != current["codec"]
+            or previous.get("data_sha256") != current["data_sha256"]
+        ):
+            to_embed.append(position)
+        elif previous.get("meta_sha256") != current["meta_sha256"]:
+            to_update.append(position)
+    stale_ids = [doc_id for doc_id in manifest if doc_id not in entries]
+    return to_embed, to_update, stale_ids
+
+
+def group_duplicates(documents: List[str]) -> List[List[int]]:
+    """Positions of documents grouped by normalized text, in order of first appearance."""
+    groups: Dict[str, List[int]] = {}
+    for position, document in enumerate(documents):
+        groups.setdefault(normalize_text(document), []).append(position)
+    return list(groups.values())
 
 
-def embed_texts(
-    client: httpx.Client, api_key: str, texts: List[str], model: str
-) -> List[List[float]]:
-    response = client.post(
-        "https://api.openai.com/v1/embeddings",
-        headers={"Authorization": f"Bearer {api_key}"},
-        json={"input": texts, "model": model},
-        timeout=60.0,
+def report_dedup(
+    documents: List[str], groups: List[List[int]], tokens: Optional[List[int]] = None
+) -> None:
+    if len(groups) == len(documents):
+        return
+    saved = [i for group in groups for i in group[1:]]
+    saved_bytes = sum(len(documents[i].encode("utf-8")) for i in saved)
+    saved_tokens = sum(tokens[i] if tokens else estimate_tokens(documents[i]) for i in saved)
+    print(
+        f"[dedup] inputs={len(documents)} unique={len(groups)} "
+        f"saved_bytes={saved_bytes} saved_tokens={saved_tokens}"
     )
-    response.raise_for_status()
-    data = response.json()
-    return [item["embedding"] for item in data["data"]]
+
+
+async def embed_and_upsert(
+    collection: Any,
+    ids: List[str],
+    documents: List[str],
+    metadatas: List[Dict[str, Any]],
+    embedder: Embedder,
+    limits: BatchLimits = BatchLimits(),
+    concurrency: int = DEFAULT_CONCURRENCY,
+    cache: Optional[EmbeddingCache] = None,
+    on_batch: Optional[Callable[[List[str], List[str], List[Dict[str, Any]]], None]] = None,
+    checkpoint: Optional[IngestCheckpoint] = None,
+    tokens: Optional[List[int]] = None,
+    codec: VectorCodec = VectorCodec(),
+) -> None:
+    """
+    Keep up to `concurrency` embedding requests in flight and upsert finished batches
+    strictly in input order. The Chroma upsert of batch i runs in a worker thread while
+    batches i+1.. are still being embedded. `on_batch` is called after each upsert.
+    Documents that normalize to the same text are embedded once and the vector is fanned
+    out to every id sharing it. `codec` truncates/quantizes vectors just before upsert.
+    With a checkpoint, embeddings are spilled to disk as they arrive and batches finished
+    by an earlier run are skipped or replayed from the spill file.
+    """
+    groups = group_duplicates(documents)
+    unique_docs = [documents[group[0]] for group in groups]
+    report_dedup(documents, groups, tokens)
+    batches = []
+    for batch in plan_batches(
+        unique_docs, limits, [tokens[group[0]] for group in groups] if tokens else None
+    ):
+        rows = [i for u in batch for i in groups[u]]
+        # Row r of the upsert takes embedding fan_out[r] of the batch's unique texts.
+        fan_out = np.asarray([k for k, u in enumerate(batch) for _ in groups[u]], dtype=np.intp)
+        batches.append(
+            (
+                [ids[i] for i in rows],
+                [documents[i] for i in rows],
+                [metadatas[i] for i in rows],
+                [unique_docs[u] for u in batch],
+                fan_out,
+            )
+        )
+    if not batches:
+        return
+    todo = [b for b in range(len(batches)) if checkpoint is None or not checkpoint.is_upserted(b)]
+    if on_batch is not None:
+        # Already in Chroma from an interrupted run; only downstream stages need them.
+        for b in sorted(set(range(len(batches))) - set(todo)):
+            on_batch(*batches[b][:3])
+
+    async def load_batch(b: int) -> np.ndarray:
+        if checkpoint is not None:
+            spilled = checkpoint.spilled(b)
+            if spilled is not None:
+                return spilled
+        embeddings = await embed_texts_async(embedder, batches[b][3], cache)
+        if checkpoint is not None:
+            checkpoint.spill(b, embeddings)
+        return embeddings
+
+    concurrency = max(1, concurrency)
+    pending: Deque[asyncio.Task] = deque()
+    next_todo = 0
+
+    def fill_window() -> None:
+        nonlocal next_todo
+        while next_todo < len(todo) and len(pending) < concurrency:
+            pending.append(asyncio.create_task(load_batch(todo[next_todo])))
+            next_todo += 1
+
+    fill_window()
+    try:
+        with tqdm(total=len(todo), desc="Embedding") as progress:
+            for b in todo:
+                batch_ids, batch_docs, batch_meta, batch_unique, fan_out = batches[b]
+                embeddings = codec.encode(await pending.popleft())
+                if len(batch_unique) != len(batch_ids):
+                    embeddings = embeddings[fan_out]
+                fill_window()
+                await asyncio.to_thread(
+                    collection.upsert,
+                    ids=batch_ids,
+                    documents=batch_docs,
+                    metadatas=batch_meta,
+                    embeddings=embeddings,
+                )
+                if checkpoint is not None:
+                    checkpoint.mark_upserted(b)
+                if on_batch is not None:
+                    on_batch(batch_ids, batch_docs, batch_meta)
+                progress.update(1)
+    finally:
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        await embedder.aclose()
 
 
 def build_collection(
-    collection_name: str, model: str, batch_size: int, chroma_path: Path, api_key: str
+    collection_name: str,
+    embedder: Embedder,
+    limits: BatchLimits,
+    chroma_path: Path,
+    incremental: bool = True,
+    cache: Optional[EmbeddingCache] = None,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    preview_dir: Optional[Path] = Path(DEFAULT_PREVIEW_DIR),
+    resume: bool = False,
+    corpus_path: str = CORPUS_PATH,
+    source_path: str = DATA_PATH,
+    blue_green: bool = True,
+    keep_versions: int = DEFAULT_KEEP_VERSIONS,
+    retention_hours: float = DEFAULT_RETENTION_HOURS,
+    codec: VectorCodec = VectorCodec(),
+    views: Sequence[str] = DEFAULT_VIEWS,
+    snapshot: bool = False,
 ) -> None:
-    chunk_data = load_chunk_data(DATA_PATH)
+    """
+    Embed the corpus into Chroma. Blue/green builds write a new `<alias>__<version>`
+    collection, validate it and then repoint the alias, so queries never see a half-built
+    index; in-place builds patch the live collection directly. `views` adds full-text and
+    example vectors next to each chunk's summary vector; `snapshot` also exports the
+    result as a memory-mapped snapshot (see snapshot.py).
+    """
+    header = ensure_corpus(corpus_path, source_path)
     ids: List[str] = []
     documents: List[str] = []
     metadatas: List[Dict[str, Any]] = []
+    data_hashes: List[str] = []
+    data_tokens: List[int] = []
+    # Chunk text goes to the content store, not Chroma metadata, so searches stay small.
+    bodies: Dict[str, str] = {}
 
-    source_name = Path(DATA_PATH).name
-    for index, item in enumerate(chunk_data):
-        data_text = item.get("data") or ""
+    source_name = header["source"]
+    for item in iter_corpus(corpus_path):
+        data_text = item["data"]
         if not data_text:
             continue
-        ids.append(f"chunk-{index}")
-        documents.append(data_text)
-        metadatas.append(
+        bodies[item["id"]] = item.get("text", "")
+        records = view_records(
+            item["id"],
+            data_text,
+            item.get("text", ""),
             {
-                "text": item.get("text", ""),
                 "doc_type": item.get("doc_type", ""),
                 "topic": item.get("topic", ""),
                 "priority": item.get("priority", 0),
                 "role": item.get("role", ""),
-                "index": index,
                 "source": source_name,
-            }
+            },
+            views,
         )
+        for doc_id, document, meta in records:
+            ids.append(doc_id)
+            documents.append(document)
+            metadatas.append(meta)
+            if meta["view"] == "summary":
+                data_hashes.append(item["data_sha256"])
+                data_tokens.append(item["data_tokens"])
+            else:
+                data_hashes.append(content_hash(document))
+                data_tokens.append(estimate_tokens(document))
 
     chroma_path.mkdir(parents=True, exist_ok=True)
     client = chromadb.PersistentClient(path=str(chroma_path))
-    collection = client.get_or_create_collection(name=collection_name)
-
-    with httpx.Client() as http_client:
-        for batch_ids, batch_docs, batch_meta in tqdm(
-            zip(
-                batched(ids, batch_size),
-                batched(documents, batch_size),
-                batched(metadatas, batch_size),
-            ),
-            total=(len(ids) + batch_size - 1) // batch_size,
-            desc="Embedding",
+    existing = [collection.name for collection in client.list_collections()]
+    # With blue/green, `collection_name` is the alias; this is the version serving queries now.
+    live_name = resolve_alias(chroma_path, collection_name)
+    live = ChromaStore(client.get_collection(live_name)) if live_name in existing else None
+
+    entries = {
+        doc_id: {
+            "model": embedder.name,
+            "codec": codec.name,
+            "data_sha256": data_hash,
+            "meta_sha256": content_hash(meta),
+            "text_sha256": content_hash(bodies.get(doc_id, "")),
+        }
+        for doc_id, data_hash, meta in zip(ids, data_hashes, metadatas)
+    }
+    manifest = load_manifest(manifest_path(chroma_path, live_name)) if incremental and live else {}
+    run_dir = checkpoint_dir(chroma_path, collection_name)
+    # An interrupted in-place run leaves extra ids behind, so only trust the count check on
+    # fresh runs.
+    trust_manifest = resume and (run_dir / "state.json").exists()
+    # A manifest that disagrees with the collection (e.g. chroma dir wiped) can't be trusted.
+    if manifest and not trust_manifest and live is not None and live.count() != len(manifest):
+        manifest = {}
+    to_embed, to_update, stale_ids = plan_incremental(ids, entries, manifest)
+
+    collection_metadata = codec.metadata() or {}
+    # Queries route on summary vectors only and fuse the other views per parent chunk.
+    collection_metadata["views"] = ",".join(
+        view for view in VIEW_CHOICES if view == "summary" or view in views
+    )
+    unchanged = (
+        live is not None
+        and bool(manifest)
+        and not (to_embed or to_update or stale_ids)
+        and all(
+            manifest[doc_id].get("text_sha256") == entries[doc_id]["text_sha256"] for doc_id in ids
+        )
+        and (live.metadata or {}).get("views") == collection_metadata["views"]
+    )
+    if unchanged:
+        # Nothing to embed, update or delete: keep serving the live version as it is.
+        print(f"[build] {live_name} is up to date, nothing to do")
+        if snapshot:
+            live.content = open_content(chroma_path, live_name)
+            directory = publish_snapshot(
+                live,
+                chroma_path,
+                collection_name,
+                corpus_fingerprint(collection_metadata, entries),
+                keep_versions,
+            )
+            if live.content is not None:
+                live.content.close()
+            print(f"[build] snapshot {directory}")
+        return
+
+    fingerprint = content_hash(
+        {
+            "model": embedder.name,
+            "codec": codec.name,
+            "limits": [limits.max_items, limits.max_tokens, limits.max_bytes],
+            "embed": [[ids[i], entries[ids[i]]["data_sha256"]] for i in to_embed],
+            "live": live_name if blue_green else None,
+        }
+    )
+    previous = IngestCheckpoint.load(run_dir)
+    checkpoint = IngestCheckpoint.start(run_dir, fingerprint, resume)
+    if previous is not None and previous.run_id != checkpoint.run_id and previous.target:
+        # The discarded run's blue/green version never went live; nothing else would drop it.
+        abandoned = previous.target
+        if (
+            abandoned in existing
+            and is_version_of(abandoned, collection_name)
+            and not was_promoted(chroma_path, collection_name, abandoned)
         ):
-            embeddings = embed_texts(http_client, api_key, batch_docs, model)
-            collection.upsert(
-                ids=batch_ids,
-                documents=batch_docs,
-                metadatas=batch_meta,
-                embeddings=embeddings,
+            drop_version(client, chroma_path, abandoned)
+            print(f"[build] dropped abandoned version {abandoned}")
+    if checkpoint.target is None:
+        checkpoint.target = (
+            version_name(collection_name, checkpoint.run_id) if blue_green else live_name
+        )
+        checkpoint.save()
+    target_name = checkpoint.target
+    done = sum(1 for entry in checkpoint.batches.values() if entry["upserted"])
+    print(
+        f"[build] run={checkpoint.run_id} target={target_name} chunks={len(ids)} "
+        f"embed={len(to_embed)} update={len(to_update)} delete={len(stale_ids)} "
+        f"resumed_batches={done}"
+    )
+
+    target = ChromaStore(
+        client.get_or_create_collection(name=target_name, metadata=collection_metadata),
+        ContentStore(content_path(chroma_path, target_name)),
+    )
+    if VectorCodec.from_metadata(target.metadata) != codec:
+        raise RuntimeError(
+            f"{target_name} stores {VectorCodec.from_metadata(target.metadata).name} vectors; "
+            f"use a blue/green build to switch to {codec.name}."
+        )
+    if (target.metadata or {}).get("views") != collection_metadata["views"]:
+        target.modify(metadata=collection_metadata)
+    embedded = set(to_embed)
+    kept = [i for i in range(len(ids)) if i not in embedded]
+    if blue_green:
+        # Stale chunks are simply not carried over into the new version.
+        if kept and live is not None:
+            copy_embeddings(
+                live,
+                target,
+                [ids[i] for i in kept],
+                [documents[i] for i in kept],
+                [metadatas[i] for i in kept],
+            )
+    else:
+        delete_ids(target, stale_ids)
+        if to_update:
+            # Chroma merges metadata on update; None drops the text and positional index keys
+            # older builds stored.
+            target.update(
+                ids=[ids[i] for i in to_update],
+                metadatas=[{**metadatas[i], "text": None, "index": None} for i in to_update],
             )
 
-    preview_dir = Path("data/processed")
-    preview_dir.mkdir(parents=True, exist_ok=True)
-    jsonl_path = preview_dir / "embedding_preview.jsonl"
-    json_path = preview_dir / "embedding_preview.json"
-
-    preview_records = []
-    with jsonl_path.open("w", encoding="utf-8") as jsonl_file:
-        for doc_id, doc, meta in zip(ids, documents, metadatas):
-            record = {"id": doc_id, "data": doc, "metadata": meta}
-            jsonl_file.write(json.dumps(record, ensure_ascii=True) + "\n")
-            preview_records.append(record)
-
-    summary = {
-        "count": len(preview_records),
-        "collection": collection_name,
-        "model": model,
-        "records": preview_records,
-    }
-    with json_path.open("w", encoding="utf-8") as json_file:
-        json.dump(summary, json_file, ensure_ascii=True, indent=2)
+    preview = (
+        PreviewWriter(preview_dir, collection_name, embedder.name)
+        if preview_dir is not None
+        else None
+    )
+    try:
+        if preview is not None:
+            # Chunks that were not re-embedded go first; embedded batches stream in as they land.
+            preview.write(
+                [ids[i] for i in kept],
+                [documents[i] for i in kept],
+                [metadatas[i] for i in kept],
+            )
+        asyncio.run(
+            embed_and_upsert(
+                target,
+                [ids[i] for i in to_embed],
+                [documents[i] for i in to_embed],
+                [metadatas[i] for i in to_embed],
+                embedder,
+                limits,
+                concurrency=concurrency,
+                cache=cache,
+                on_batch=preview.write if preview is not None else None,
+                checkpoint=checkpoint,
+                tokens=[data_tokens[i] for i in to_embed],
+                codec=codec,
+            )
+        )
+    finally:
+        if preview is not None:
+            preview.close()
+
+    target.content.replace(bodies)
+    build_fingerprint = corpus_fingerprint(collection_metadata, entries)
+    # Readers that cache per collection (e.g. the single-pass metadata index) key on this,
+    # so an in-place rebuild is never mistaken for the collection they loaded.
+    target.modify(metadata={**collection_metadata, "fingerprint": build_fingerprint})
+    if blue_green:
+        validate_collection(target, len(ids))
+    save_manifest(manifest_path(chroma_path, target_name), target_name, entries)
+    if blue_green:
+        promote(chroma_path, collection_name, target_name)
+        print(f"[build] promoted {collection_name} -> {target_name}")
+        drop_expired_versions(client, chroma_path, collection_name, keep_versions, retention_hours)
+    if snapshot:
+        directory = publish_snapshot(
+            target,
+            chroma_path,
+            collection_name,
+            build_fingerprint,
+            keep_versions,
+        )
+        print(f"[build] snapshot {directory}")
+    target.content.close()
+    checkpoint.finish()
+
 
+def copy_embeddings(
+    source: Any,
+    target: Any,
+    ids: List[str],
+    documents: List[str],
+    metadatas: List[Dict[str, Any]],
+    page_size: int = PAGE_SIZE,
+) -> None:
+    """Carry unchanged vectors from the live collection into a new version, with fresh metadata."""
+    for start in range(0, len(ids), page_size):
+        page = ids[start : start + page_size]
+        found = source.get(ids=page, include=["embeddings"])
+        vectors = dict(zip(found["ids"], found["embeddings"]))
+        missing = [doc_id for doc_id in page if doc_id not in vectors]
+        if missing:
+            raise RuntimeError(
+                f"{len(missing)} chunks listed in the manifest are missing from {source.name} "
+                f"(e.g. {missing[0]}); rebuild with --no-incremental."
+            )
+        target.upsert(
+            ids=page,
+            documents=documents[start : start + page_size],
+            metadatas=metadatas[start : start + page_size],
+            embeddings=np.asarray([vectors[doc_id] for doc_id in page], dtype=np.float32),
+        )
+
+
+def delete_ids(collection: Any, ids: List[str], page_size: int = PAGE_SIZE) -> None:
+    for start in range(0, len(ids), page_size):
+        collection.delete(ids=ids[start : start + page_size])
+
+
+def validate_collection(collection: Any, expected: int) -> None:
+    """Refuse to promote a version that is incomplete or cannot find its own vectors."""
+    count = collection.count()
+    if count != expected:
+        raise RuntimeError(
+            f"{collection.name} has {count} chunks, expected {expected}; not promoting."
+        )
+    if not expected:
+        return
+    probe = collection.get(limit=1, include=["embeddings"])
+    results = collection.query(
+        query_embeddings=probe["embeddings"], n_results=1, include=["distances"]
+    )
+    top_id, distance = results["ids"][0][0], results["distances"][0][0]
+    # Identical chunks tie at distance 0, so either signal is good enough.
+    if top_id != probe["ids"][0] and distance > 1e-4:
+        raise RuntimeError(
+            f"{collection.name} smoke query for {probe['ids'][0]} returned {top_id}; not promoting."
+        )
+
+
+def drop_version(client: Any, chroma_path: Path, name: str) -> None:
+    client.delete_collection(name)
+    manifest_path(chroma_path, name).unlink(missing_ok=True)
+    content_path(chroma_path, name).unlink(missing_ok=True)
+
+
+def drop_expired_versions(
+    client: Any, chroma_path: Path, alias: str, keep: int, retention_hours: float
+) -> None:
+    existing = [collection.name for collection in client.list_collections()]
+    for name in expired_versions(chroma_path, alias, existing, keep, retention_hours * 3600):
+        drop_version(client, chroma_path, name)
+        print(f"[build] dropped old version {name}")
 
 def main() -> None:
+    load_dotenv()
     parser = argparse.ArgumentParser(description="Create embeddings and store in ChromaDB.")
     parser.add_argument("--collection", default=DEFAULT_COLLECTION)
     parser.add_argument("--model", default=DEFAULT_MODEL)
-    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument(
+        "--embedder",
+        choices=EMBEDDER_CHOICES,
+        default=default_embedder_kind(),
+        help="Embedding backend (env: EMBEDDER). 'hash' is offline and deterministic.",
+    )
+    parser.add_argument(
+        "--base-url",
+        default=None,
+        help="OpenAI-compatible API base URL (env: OPENAI_BASE_URL).",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=DEFAULT_BATCH_SIZE,
+        help="Maximum inputs per embedding request.",
+    )
+    parser.add_argument(
+        "--max-batch-tokens",
+        type=int,
+        default=DEFAULT_MAX_BATCH_TOKENS,
+        help="Maximum estimated tokens per embedding request.",
+    )
+    parser.add_argument(
+        "--max-batch-bytes",
+        type=int,
+        default=DEFAULT_MAX_BATCH_BYTES,
+        help="Maximum request body size in bytes.",
+    )
     parser.add_argument("--chroma-path", default="data/chroma")
+    parser.add_argument(
+        "--source",
+        default=DATA_PATH,
+        help="Chunk definitions module, e.g. the chunker.py output "
+        f"({Path(GENERATED_DATA_PATH).name}).",
+    )
+    parser.add_argument(
+        "--corpus",
+        default=None,
+        help="Compiled corpus artifact (rebuilt from --source when stale).",
+    )
+    parser.add_argument(
+        "--incremental",
+        action=argparse.BooleanOptionalAction,
+        default=True,
+        help="Only re-embed chunks whose content changed since the last build.",
+    )
+    parser.add_argument("--cache-path", default=DEFAULT_CACHE_PATH)
+    parser.add_argument("--no-cache", action="store_true", help="Bypass the embedding cache.")
+    parser.add_argument(
+        "--cache-max-mb", type=float, default=DEFAULT_CACHE_MAX_BYTES / (1024 * 1024)
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=DEFAULT_CONCURRENCY,
+        help="Maximum number of embedding requests in flight.",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Continue an interrupted build without re-embedding its finished batches.",
+    )
+    parser.add_argument("--preview-dir", default=DEFAULT_PREVIEW_DIR)
+    parser.add_argument(
+        "--preview",
+        action=argparse.BooleanOptionalAction,
+        default=True,
+        help="Write embedding_preview.jsonl/.json next to the build.",
+    )
+    parser.add_argument(
+        "--rpm",
+        type=float,
+        default=DEFAULT_REQUESTS_PER_MINUTE,
+        help="Requests per minute for this process; leave headroom for a running query server.",
+    )
+    parser.add_argument(
+        "--tpm",
+        type=float,
+        default=DEFAULT_TOKENS_PER_MINUTE,
+        help="Tokens per minute for this process; the quota is not shared across processes.",
+    )
+    parser.add_argument(
+        "--dimensions",
+        type=int,
+        default=None,
+        help="Store Matryoshka-truncated vectors of this width (text-embedding-3 models).",
+    )
+    parser.add_argument(
+        "--storage",
+        choices=STORAGE_CHOICES,
+        default="float32",
+        help="Stored vector precision; int8 uses one scale per vector.",
+    )
+    parser.add_argument(
+        "--views",
+        choices=VIEW_CHOICES,
+        nargs="+",
+        default=list(DEFAULT_VIEWS),
+        help="Vectors per chunk: the summary is always indexed; add 'text' and/or 'examples'.",
+    )
+    parser.add_argument(
+        "--blue-green",
+        action=argparse.BooleanOptionalAction,
+        default=True,
+        help="Build into a new collection version and promote it via the alias "
+        "(--no-blue-green patches the live collection in place).",
+    )
+    parser.add_argument(
+        "--keep-versions",
+        type=int,
+        default=DEFAULT_KEEP_VERSIONS,
+        help="Most recently promoted versions that are never garbage-collected.",
+    )
+    parser.add_argument(
+        "--retention-hours",
+        type=float,
+        default=DEFAULT_RETENTION_HOURS,
+        help="Minimum age before a superseded version may be dropped.",
+    )
+    parser.add_argument(
+        "--snapshot",
+        action="store_true",
+        help="Also export a read-only memory-mapped snapshot for the snapshot backend.",
+    )
+    parser.add_argument(
+        "--rollback",
+        action="store_true",
+        help="Point the alias back at the previous version and exit.",
+    )
     args = parser.parse_args()
-
-    load_dotenv()
-    api_key = os.getenv("OPENAI_API_KEY")
-    if not api_key:
-        raise RuntimeError("OPENAI_API_KEY is not set.")
-
     chroma_path = Path(args.chroma_path)
-    build_collection(args.collection, args.model, args.batch_size, chroma_path, api_key)
+    if args.rollback:
+        client = chromadb.PersistentClient(path=str(chroma_path))
+        existing = [collection.name for collection in client.list_collections()]
+        previous = rollback(chroma_path, args.collection, existing)
+        if previous is None:
+            raise RuntimeError(f"No earlier version of {args.collection} to roll back to.")
+        print(f"[build] rolled back {args.collection} -> {previous}")
+        return
+    if args.keep_versions < 1:
+        raise RuntimeError("--keep-versions must be at least 1.")
+    if args.dimensions is not None and args.dimensions < 1:
+        raise RuntimeError("--dimensions must be positive.")
+    SHARED_QUOTA.configure(args.rpm, args.tpm)
+    embedder = make_embedder(
+        args.embedder, args.model, args.base_url, args.concurrency, args.dimensions
+    )
+
+    cache = None if args.no_cache else open_cache(args.cache_path, args.cache_max_mb)
+    try:
+        limits = BatchLimits(
+            max_items=args.batch_size,
+            max_tokens=args.max_batch_tokens,
+            max_bytes=args.max_batch_bytes,
+        )
+        build_collection(
+            args.collection,
+            embedder,
+            limits,
+            chroma_path,
+            incremental=args.incremental,
+            cache=cache,
+            concurrency=args.concurrency,
+            preview_dir=Path(args.preview_dir) if args.preview else None,
+            resume=args.resume,
+            corpus_path=args.corpus or default_corpus_path(args.source),
+            source_path=args.source,
+            blue_green=args.blue_green,
+            keep_versions=args.keep_versions,
+            retention_hours=args.retention_hours,
+            codec=VectorCodec(args.dimensions, args.storage),
+            views=args.views,
+            snapshot=args.snapshot,
+        )
+    finally:
+        embedder.close()
+        if cache is not None:
+            print(cache.format_stats())
+            cache.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,267 @@
+from __future__ import annotations
+
+import base64
+import hashlib
+import os
+from typing import Any, Dict, List, Optional, Protocol, Union
+
+import httpx
+import numpy as np
+import orjson
+
+from batch_planner import BatchLimits, estimate_tokens, plan_batches
+from constants import (
+    DEFAULT_CONCURRENCY,
+    DEFAULT_EMBEDDER,
+    DEFAULT_HASH_DIMENSIONS,
+    DEFAULT_MODEL,
+    OPENAI_BASE_URL,
+)
+from embedding_cache import EmbeddingCache, QueryEmbeddingCache
+from rate_limit import BATCH, INTERACTIVE, make_async_client, make_client
+
+EMBEDDER_CHOICES = ("openai", "hash")
+
+# Embedders return one contiguous float32 matrix of shape (len(texts), dimensions).
+Vectors = np.ndarray
+
+
+class Embedder(Protocol):
+    # Identity used for cache keys and the build manifest; vectors from two embedders
+    # with different names are never mixed.
+    name: str
+    # Whether vectors are worth persisting in the embedding cache.
+    cacheable: bool
+
+    def embed(self, texts: List[str], priority: int = INTERACTIVE) -> Vectors: ...
+
+    async def embed_async(self, texts: List[str], priority: int = BATCH) -> Vectors: ...
+
+    def close(self) -> None: ...
+
+    async def aclose(self) -> None: ...
+
+
+def request_extensions(texts: List[str], priority: int) -> Dict[str, int]:
+    # Read by rate_limit.RetryTransport to charge the shared per-minute quota.
+    return {"embedding_tokens": sum(estimate_tokens(text) for text in texts), "priority": priority}
+
+
+def decode_embeddings(payload: bytes) -> Vectors:
+    """
+    Parse an /embeddings response into a float32 matrix. base64 payloads are decoded
+    into one shared buffer and viewed with np.frombuffer, so no per-float Python
+    objects are created; plain float lists (servers that ignore encoding_format) are
+    still accepted.
+    """
+    items: List[Dict[str, Any]] = orjson.loads(payload)["data"]
+    items.sort(key=lambda item: item.get("index", 0))
+    if not items:
+        return np.empty((0, 0), dtype=np.float32)
+    if not isinstance(items[0]["embedding"], str):
+        return np.asarray([item["embedding"] for item in items], dtype=np.float32)
+    buffer = bytearray()
+    for item in items:
+        buffer += base64.b64decode(item["embedding"])
+    return np.frombuffer(buffer, dtype="<f4").reshape(len(items), -1)
+
+
+class OpenAIEmbedder:
+    """OpenAI /embeddings, or any server exposing the same API under `base_url`."""
+
+    cacheable = True
+
+    def __init__(
+        self,
+        api_key: str,
+        model: str = DEFAULT_MODEL,
+        base_url: str = OPENAI_BASE_URL,
+        concurrency: int = DEFAULT_CONCURRENCY,
+        dimensions: Optional[int] = None,
+    ) -> None:
+        self.api_key = api_key
+        self.model = model
+        self.base_url = base_url.rstrip("/")
+        self.url = f"{self.base_url}/embeddings"
+        self.concurrency = concurrency
+        # Shortened output (text-embedding-3 `dimensions`); None keeps the model's full width.
+        self.dimensions = dimensions
+        self.name = model if self.base_url == OPENAI_BASE_URL else f"{self.base_url}|{model}"
+        if dimensions:
+            self.name += f"@{dimensions}"
+        self._client: Optional[httpx.Client] = None
+        self._async_client: Optional[httpx.AsyncClient] = None
+
+    def _request(self, texts: List[str], priority: int) -> Dict[str, object]:
+        body: Dict[str, object] = {"input": texts, "model": self.model, "encoding_format": "base64"}
+        if self.dimensions:
+            body["dimensions"] = self.dimensions
+        return {
+            "headers": {"Authorization": f"Bearer {self.api_key}"},
+            "json": body,
+            "timeout": 60.0,
+            "extensions": request_extensions(texts, priority),
+        }
+
+    def embed(self, texts: List[str], priority: int = INTERACTIVE) -> Vectors:
+        if self._client is None:
+            self._client = make_client()
+        response = self._client.post(self.url, **self._request(texts, priority))
+        response.raise_for_status()
+        return decode_embeddings(response.content)
+
+    async def embed_async(self, texts: List[str], priority: int = BATCH) -> Vectors:
+        # The async client is bound to the running loop; aclose() it before the loop ends.
+        if self._async_client is None:
+            self._async_client = make_async_client(self.concurrency)
+        response = await self._async_client.post(self.url, **self._request(texts, priority))
+        response.raise_for_status()
+        return decode_embeddings(response.content)
+
+    def close(self) -> None:
+        if self._client is not None:
+            self._client.close()
+            self._client = None
+
+    async def aclose(self) -> None:
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
+
+
+class HashingEmbedder:
+    """
+    Offline, deterministic embedder: signed feature hashing of character n-grams
+    (taken inside word boundaries), L2-normalized. Captures lexical overlap only, but
+    needs no network and returns identical vectors on every machine.
+    """
+
+    cacheable = False
+
+    def __init__(
+        self, dimensions: int = DEFAULT_HASH_DIMENSIONS, ngram_min: int = 3, ngram_max: int = 5
+    ) -> None:
+        self.dimensions = dimensions
+        self.ngram_min = ngram_min
+        self.ngram_max = ngram_max
+        self.name = f"hash-ngram-{ngram_min}-{ngram_max}-{dimensions}"
+
+    def vector(self, text: str, out: np.ndarray) -> None:
+        values = [0.0] * self.dimensions
+        for word in text.lower().split():
+            padded = f" {word} "
+            for size in range(self.ngram_min, self.ngram_max + 1):
+                for start in range(0, max(len(padded) - size, 0) + 1):
+                    digest = hashlib.blake2b(
+                        padded[start : start + size].encode("utf-8"), digest_size=8
+                    ).digest()
+                    bucket = int.from_bytes(digest[:4], "little") % self.dimensions
+                    values[bucket] += 1.0 if digest[4] & 1 else -1.0
+        out[:] = values
+        norm = float(np.linalg.norm(out))
+        if norm:
+            out /= norm
+
+    def embed(self, texts: List[str], priority: int = INTERACTIVE) -> Vectors:
+        out = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        for i, text in enumerate(texts):
+            self.vector(text, out[i])
+        return out
+
+    async def embed_async(self, texts: List[str], priority: int = BATCH) -> Vectors:
+        return self.embed(texts, priority)
+
+    def close(self) -> None:
+        pass
+
+    async def aclose(self) -> None:
+        pass
+
+
+def default_embedder_kind() -> str:
+    return os.getenv("EMBEDDER", DEFAULT_EMBEDDER)
+
+
+def make_embedder(
+    kind: str,
+    model: str = DEFAULT_MODEL,
+    base_url: Optional[str] = None,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    dimensions: Optional[int] = None,
+) -> Embedder:
+    """
+    Build an embedder from CLI/env settings. Call after load_dotenv().
+    `dimensions` asks the API for shortened vectors; the hashing embedder ignores it and
+    leaves truncation to the build's VectorCodec.
+    """
+    if kind == "hash":
+        return HashingEmbedder(int(os.getenv("HASH_EMBEDDER_DIMENSIONS", DEFAULT_HASH_DIMENSIONS)))
+    if kind == "openai":
+        api_key = os.getenv("OPENAI_API_KEY")
+        if not api_key:
+            raise RuntimeError("OPENAI_API_KEY is not set.")
+        return OpenAIEmbedder(
+            api_key,
+            model=model,
+            base_url=base_url or os.getenv("OPENAI_BASE_URL", OPENAI_BASE_URL),
+            concurrency=concurrency,
+            dimensions=dimensions,
+        )
+    raise RuntimeError(f"Unknown embedder {kind!r}; choose one of {', '.join(EMBEDDER_CHOICES)}.")
+
+
+def stack_vectors(rows: List[Optional[np.ndarray]]) -> np.ndarray:
+    if not rows:
+        return np.empty((0, 0), dtype=np.float32)
+    return np.stack(rows).astype(np.float32, copy=False)  # type: ignore[arg-type]
+
+
+def embed_texts(
+    embedder: Embedder,
+    texts: List[str],
+    cache: Optional[Union[EmbeddingCache, QueryEmbeddingCache]] = None,
+    limits: BatchLimits = BatchLimits(),
+) -> np.ndarray:
+    """
+    Embed texts in as few requests as the batch limits allow, serving what it can
+    from the cache first. Returns a (len(texts), dimensions) float32 matrix.
+    """
+    if not embedder.cacheable:
+        cache = None
+    rows: List[Optional[np.ndarray]] = (
+        cache.get_many(embedder.name, None, texts) if cache is not None else [None] * len(texts)
+    )
+    missing = [i for i, row in enumerate(rows) if row is None]
+    missing_texts = [texts[i] for i in missing]
+    for batch in plan_batches(missing_texts, limits):
+        batch_texts = [missing_texts[j] for j in batch]
+        fresh = embedder.embed(batch_texts)
+        if cache is not None:
+            cache.put_many(embedder.name, None, batch_texts, fresh)
+        if len(batch) == len(texts):
+            return fresh
+        for j, row in zip(batch, fresh):
+            rows[missing[j]] = row
+    return stack_vectors(rows)
+
+
+async def embed_texts_async(
+    embedder: Embedder,
+    texts: List[str],
+    cache: Optional[EmbeddingCache] = None,
+) -> np.ndarray:
+    if cache is None or not embedder.cacheable:
+        return await embedder.embed_async(texts)
+
+    rows = cache.get_many(embedder.name, None, texts)
+    missing = [i for i, row in enumerate(rows) if row is None]
+    if not missing:
+        return stack_vectors(rows)
+    missing_texts = [texts[i] for i in missing]
+    fresh = await embedder.embed_async(missing_texts)
+    cache.put_many(embedder.name, None, missing_texts, fresh)
+    if len(missing) == len(texts):
+        return fresh
+    for i, row in zip(missing, fresh):
+        rows[i] = row
+    return stack_vectors(rows)
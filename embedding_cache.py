@@ -0,0 +1,321 @@
+from __future__ import annotations
+
+import argparse
+import hashlib
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from constants import (
+    DEFAULT_CACHE_MAX_BYTES,
+    DEFAULT_CACHE_PATH,
+    DEFAULT_QUERY_CACHE_SIZE,
+    DEFAULT_QUERY_CACHE_TTL,
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS embeddings (
+    key TEXT PRIMARY KEY,
+    model TEXT NOT NULL,
+    dimensions INTEGER NOT NULL,
+    vector BLOB NOT NULL,
+    nbytes INTEGER NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS embeddings_last_access ON embeddings (last_access);
+"""
+
+# SQLite caps the number of bound parameters per statement; stay well below it.
+LOOKUP_CHUNK = 500
+
+
+def normalize_text(text: str) -> str:
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def cache_key(model: str, dimensions: Optional[int], text: str) -> str:
+    payload = f"{model}\x1f{dimensions or 0}\x1f{normalize_text(text)}"
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def encode_vector(vector: Any) -> bytes:
+    return np.ascontiguousarray(vector, dtype="<f4").tobytes()
+
+
+def decode_vector(blob: bytes) -> np.ndarray:
+    # Read-only view over the SQLite blob; no per-float Python objects.
+    return np.frombuffer(blob, dtype="<f4")
+
+
+class EmbeddingCache:
+    """
+    Content-addressed embedding cache in a single SQLite (WAL) file.
+    Vectors are stored as raw float32 blobs keyed by (model, dimensions, normalized text).
+    Several processes may share one file; eviction is least-recently-used by total vector bytes.
+    One instance may be used from several threads (e.g. the retrieval server's worker
+    threads); calls on its connection are serialized by a lock.
+    """
+
+    def __init__(self, path: Path, max_bytes: int = DEFAULT_CACHE_MAX_BYTES) -> None:
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            str(self.path), timeout=30.0, isolation_level=None, check_same_thread=False
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self) -> "EmbeddingCache":
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
+    def get_many(
+        self, model: str, dimensions: Optional[int], texts: Sequence[str]
+    ) -> List[Optional[np.ndarray]]:
+        keys = [cache_key(model, dimensions, text) for text in texts]
+        found: Dict[str, bytes] = {}
+        unique_keys = list(dict.fromkeys(keys))
+        with self._lock:
+            for start in range(0, len(unique_keys), LOOKUP_CHUNK):
+                chunk = unique_keys[start : start + LOOKUP_CHUNK]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", chunk
+                ).fetchall()
+                found.update(rows)
+
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_access = ? WHERE key = ?",
+                    [(now, key) for key in found],
+                )
+
+            results: List[Optional[np.ndarray]] = []
+            for key in keys:
+                blob = found.get(key)
+                if blob is None:
+                    self.misses += 1
+                    results.append(None)
+                else:
+                    self.hits += 1
+                    results.append(decode_vector(blob))
+        return results
+
+    def put_many(
+        self,
+        model: str,
+        dimensions: Optional[int],
+        texts: Sequence[str],
+        vectors: Any,
+    ) -> None:
+        """`vectors` is a (len(texts), dimensions) float32 matrix or any sequence of rows."""
+        now = time.time()
+        rows = []
+        for text, vector in zip(texts, vectors):
+            blob = encode_vector(vector)
+            rows.append(
+                (cache_key(model, dimensions, text), model, dimensions or 0, blob, len(blob), now)
+            )
+        if not rows:
+            return
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO embeddings "
+                    "(key, model, dimensions, vector, nbytes, last_access) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    rows,
+                )
+                self._evict()
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def _evict(self) -> None:
+        total = self._conn.execute("SELECT COALESCE(SUM(nbytes), 0) FROM embeddings").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        excess = total - self.max_bytes
+        victims: List[str] = []
+        for key, nbytes in self._conn.execute(
+            "SELECT key, nbytes FROM embeddings ORDER BY last_access ASC"
+        ):
+            victims.append(key)
+            excess -= nbytes
+            if excess <= 0:
+                break
+        self._conn.executemany("DELETE FROM embeddings WHERE key = ?", [(k,) for k in victims])
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM embeddings")
+            self._conn.execute("VACUUM")
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            entries, total = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(nbytes), 0) FROM embeddings"
+            ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits / lookups) if lookups else 0.0,
+            "entries": entries,
+            "bytes": total,
+        }
+
+    def format_stats(self) -> str:
+        stats = self.stats()
+        return (
+            f"[cache] hits={stats['hits']} misses={stats['misses']} "
+            f"hit_rate={stats['hit_rate']:.2f} entries={stats['entries']} bytes={stats['bytes']}"
+        )
+
+
+class QueryEmbeddingCache:
+    """
+    In-process LRU/TTL tier for query embeddings, keyed like EmbeddingCache (model,
+    dimensions, normalized text) and used through the same get_many/put_many calls.
+    Misses fall through to the persistent `backing` cache when one is configured and its
+    hits are kept in memory, so repeat queries skip both SQLite and the embeddings API.
+    """
+
+    def __init__(
+        self,
+        capacity: int = DEFAULT_QUERY_CACHE_SIZE,
+        ttl_seconds: Optional[float] = DEFAULT_QUERY_CACHE_TTL,
+        backing: Optional[EmbeddingCache] = None,
+    ) -> None:
+        self.capacity = capacity
+        self.ttl_seconds = ttl_seconds
+        self.backing = backing
+        self.entries: "OrderedDict[str, Tuple[float, np.ndarray]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.backing_hits = 0
+        self.expired = 0
+
+    def _remember(self, key: str, vector: Any, now: float) -> None:
+        self.entries[key] = (now, np.array(vector, dtype=np.float32))
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+
+    def get_many(
+        self, model: str, dimensions: Optional[int], texts: Sequence[str]
+    ) -> List[Optional[np.ndarray]]:
+        now = time.monotonic()
+        keys = [cache_key(model, dimensions, text) for text in texts]
+        results: List[Optional[np.ndarray]] = []
+        missing: List[int] = []
+        for n, key in enumerate(keys):
+            entry = self.entries.get(key)
+            ttl = self.ttl_seconds
+            if entry is not None and ttl is not None and now - entry[0] > ttl:
+                del self.entries[key]
+                self.expired += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                missing.append(n)
+                results.append(None)
+            else:
+                self.hits += 1
+                self.entries.move_to_end(key)
+                results.append(entry[1])
+        if missing and self.backing is not None:
+            found = self.backing.get_many(model, dimensions, [texts[n] for n in missing])
+            for n, vector in zip(missing, found):
+                if vector is not None:
+                    self.backing_hits += 1
+                    self._remember(keys[n], vector, now)
+                    results[n] = vector
+        return results
+
+    def put_many(
+        self,
+        model: str,
+        dimensions: Optional[int],
+        texts: Sequence[str],
+        vectors: Any,
+    ) -> None:
+        now = time.monotonic()
+        for text, vector in zip(texts, vectors):
+            self._remember(cache_key(model, dimensions, text), vector, now)
+        if self.backing is not None:
+            self.backing.put_many(model, dimensions, texts, vectors)
+
+    def clear(self) -> None:
+        self.entries.clear()
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits / lookups) if lookups else 0.0,
+            "backing_hits": self.backing_hits,
+            "expired": self.expired,
+            "entries": len(self.entries),
+        }
+
+    def format_stats(self) -> str:
+        stats = self.stats()
+        return (
+            f"[query-cache] hits={stats['hits']} misses={stats['misses']} "
+            f"hit_rate={stats['hit_rate']:.2f} backing_hits={stats['backing_hits']} "
+            f"expired={stats['expired']} entries={stats['entries']}"
+        )
+
+
+def open_query_cache(
+    capacity: int, ttl_seconds: Optional[float], backing: Optional[EmbeddingCache] = None
+) -> Optional[QueryEmbeddingCache]:
+    """The in-memory tier over `backing`, or None when `capacity` disables it."""
+    if capacity <= 0:
+        return None
+    ttl = ttl_seconds if ttl_seconds and ttl_seconds > 0 else None
+    return QueryEmbeddingCache(capacity, ttl, backing)
+
+
+def open_cache(path: Optional[str], max_mb: float) -> Optional[EmbeddingCache]:
+    if not path:
+        return None
+    return EmbeddingCache(Path(path), max_bytes=int(max_mb * 1024 * 1024))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Inspect or clear the embedding cache.")
+    parser.add_argument("--cache-path", default=DEFAULT_CACHE_PATH)
+    parser.add_argument("--clear", action="store_true", help="Delete every cached vector.")
+    args = parser.parse_args()
+
+    with EmbeddingCache(Path(args.cache_path)) as cache:
+        if args.clear:
+            cache.clear()
+        print(cache.format_stats())
+
+
+if __name__ == "__main__":
+    main()
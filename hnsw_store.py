@@ -0,0 +1,64 @@
+from __future__ import annotations
+
+from typing import Any, List, Optional, Tuple
+
+import numpy as np
+
+from numpy_store import NumpyCollection
+
+try:  # optional: pip install "workflow-rag[hnsw]"
+    import hnswlib
+except ImportError:
+    hnswlib = None
+
+HNSW_AVAILABLE = hnswlib is not None
+
+HNSW_M = 16
+HNSW_EF_CONSTRUCTION = 200
+HNSW_EF_SEARCH = 64
+
+
+class HnswCollection(NumpyCollection):
+    """
+    NumpyCollection whose searches go through an hnswlib graph instead of a full matrix
+    product. Metadata filters are the same boolean masks, passed to hnswlib as a label
+    filter. Every write rebuilds the graph, so load it once and query it.
+    """
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        if hnswlib is None:
+            raise RuntimeError("The hnsw backend needs hnswlib: pip install hnswlib")
+        self.index: Optional[Any] = None
+        super().__init__(*args, **kwargs)
+
+    def load(self, *args: Any, **kwargs: Any) -> None:
+        super().load(*args, **kwargs)
+        self.index = self.build_index() if self.ids else None
+
+    def build_index(self) -> Any:
+        index = hnswlib.Index(space=self.space, dim=self.vectors.shape[1])
+        index.init_index(
+            max_elements=max(len(self.ids), 1), ef_construction=HNSW_EF_CONSTRUCTION, M=HNSW_M
+        )
+        index.add_items(self.vectors, np.arange(len(self.ids)))
+        return index
+
+    def search(
+        self, query_embeddings: Any, allowed: np.ndarray, k: int
+    ) -> List[Tuple[np.ndarray, np.ndarray]]:
+        k = min(k, int(allowed.sum()))
+        if self.index is None or k == 0:
+            return super().search(query_embeddings, allowed, k)
+        self.index.set_ef(max(HNSW_EF_SEARCH, k))
+        queries = np.asarray(query_embeddings, dtype=np.float32).reshape(-1, self.vectors.shape[1])
+        label_filter = None if allowed.all() else (lambda label: bool(allowed[label]))
+        try:
+            # The filter is a Python callback, so extra threads would only contend for the GIL.
+            labels, distances = self.index.knn_query(
+                queries, k=k, num_threads=1 if label_filter else -1, filter=label_filter
+            )
+        except RuntimeError:
+            # Very selective filters can leave the graph walk short of k hits; those are
+            # small candidate sets, so answer them exactly.
+            return super().search(queries, allowed, k)
+        return [(row.astype(np.int64), dist) for row, dist in zip(labels, distances)]
@@ -0,0 +1,107 @@
+from __future__ import annotations
+
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Vectors indexed per logical chunk. "summary" is the routing `data` text and is always
+# indexed; "text" is the full body and "examples" one vector per quoted example query.
+VIEW_CHOICES = ("summary", "text", "examples")
+DEFAULT_VIEWS = ("summary",)
+FUSION_CHOICES = ("max", "weighted")
+# Weighted fusion: fused distance is the weighted mean over the views that matched.
+VIEW_WEIGHTS = {"summary": 1.0, "text": 0.7, "example": 0.5}
+
+
+def extract_examples(text: str) -> List[str]:
+    """Quoted example queries, i.e. bullet lines of the form `- "..." → ...`."""
+    examples = []
+    for line in text.splitlines():
+        line = line.strip()
+        if line.startswith('- "'):
+            examples.append(line[2:])
+    return examples
+
+
+def view_records(
+    parent_id: str,
+    data: str,
+    text: str,
+    metadata: Dict[str, Any],
+    views: Sequence[str] = DEFAULT_VIEWS,
+) -> List[Tuple[str, str, Dict[str, Any]]]:
+    """
+    (id, document, metadata) for every vector of one chunk. The summary keeps the parent
+    id so single-vector collections look exactly as before; other views hold their text
+    as the document and never carry a `text` metadata key.
+    """
+    records = [(parent_id, data, {**metadata, "parent": parent_id, "view": "summary"})]
+    slim = {key: value for key, value in metadata.items() if key != "text"}
+    if "text" in views and text:
+        records.append((f"{parent_id}#text", text, {**slim, "parent": parent_id, "view": "text"}))
+    if "examples" in views:
+        for n, example in enumerate(extract_examples(text)):
+            records.append(
+                (f"{parent_id}#ex{n}", example, {**slim, "parent": parent_id, "view": "example"})
+            )
+    return records
+
+
+def parent_of(item: Dict[str, Any]) -> str:
+    return (item.get("meta") or {}).get("parent") or item["id"]
+
+
+def fuse(
+    items: Iterable[Dict[str, Any]],
+    mode: str = "max",
+    weights: Optional[Dict[str, float]] = None,
+) -> Tuple[List[Dict[str, Any]], List[str]]:
+    """
+    Collapse per-view hits into one item per parent chunk, ordered by fused distance.
+    "max" keeps the best-matching view; "weighted" takes the weighted mean distance of
+    the views that were retrieved. Returns the fused items and the parents whose summary
+    record was not among the hits (their data/meta come from another view until hydrated).
+    """
+    weights = weights or VIEW_WEIGHTS
+    grouped: Dict[str, List[Dict[str, Any]]] = {}
+    for item in items:
+        grouped.setdefault(parent_of(item), []).append(item)
+
+    fused = []
+    missing_summary = []
+    for parent, hits in grouped.items():
+        best = min(hits, key=lambda hit: hit["distance"])
+        views = [hit["meta"].get("view", "summary") for hit in hits]
+        if mode == "weighted":
+            hit_weights = [weights.get(view, 1.0) for view in views]
+            weighted = sum(w * hit["distance"] for w, hit in zip(hit_weights, hits))
+            distance = weighted / sum(hit_weights)
+        else:
+            distance = best["distance"]
+        summary = next((hit for hit, view in zip(hits, views) if view == "summary"), None)
+        if summary is None:
+            missing_summary.append(parent)
+        base = summary or best
+        fused.append(
+            {
+                "id": parent,
+                "data": base["data"],
+                "meta": base["meta"],
+                "distance": distance,
+                "views": {view: hit["distance"] for view, hit in zip(views, hits)},
+            }
+        )
+    fused.sort(key=lambda item: item["distance"])
+    return fused, missing_summary
+
+
+def hydrate_summaries(collection: Any, items: List[Dict[str, Any]], parents: List[str]) -> None:
+    """Replace data/meta of fused items that only matched non-summary views."""
+    if not parents:
+        return
+    found = collection.get(ids=parents, include=["documents", "metadatas"])
+    records = {
+        doc_id: (doc, meta)
+        for doc_id, doc, meta in zip(found["ids"], found["documents"], found["metadatas"])
+    }
+    for item in items:
+        if item["id"] in records:
+            item["data"], item["meta"] = records[item["id"]]
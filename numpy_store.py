@@ -0,0 +1,244 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Distance functions matching Chroma's `hnsw:space` settings (l2 is squared L2).
+SPACES = ("l2", "cosine", "ip")
+
+
+@dataclass(slots=True)
+class StoreSnapshot:
+    """Every record of a store as plain arrays; any adapter can be rebuilt from one."""
+
+    name: str
+    ids: List[str]
+    embeddings: np.ndarray
+    documents: List[Optional[str]]
+    metadatas: List[Dict[str, Any]]
+    metadata: Optional[Dict[str, Any]] = None
+
+
+class NumpyCollection:
+    """
+    Exact-search, in-process vector store. All vectors live in one contiguous float32
+    matrix; every scalar metadata key is a column of integer codes, so `$eq`, `$in` and
+    `$and` filters are boolean masks and top-k is an `argpartition`. Writes rebuild the
+    arrays, which is fine at rule-corpus sizes.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        ids: Sequence[str],
+        embeddings: np.ndarray,
+        documents: Sequence[Optional[str]],
+        metadatas: Sequence[Optional[Dict[str, Any]]],
+        metadata: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        self.name = name
+        self.metadata = metadata
+        self.space = (metadata or {}).get("hnsw:space", "l2")
+        if self.space not in SPACES:
+            raise RuntimeError(
+                f"Unsupported distance space {self.space!r}; expected one of {SPACES}."
+            )
+        self.load(ids, embeddings, documents, metadatas)
+
+    def load(
+        self,
+        ids: Sequence[str],
+        embeddings: np.ndarray,
+        documents: Sequence[Optional[str]],
+        metadatas: Sequence[Optional[Dict[str, Any]]],
+    ) -> None:
+        self.ids = list(ids)
+        self.positions = {doc_id: n for n, doc_id in enumerate(self.ids)}
+        vectors = np.ascontiguousarray(embeddings, dtype=np.float32)
+        if vectors.ndim != 2:
+            if vectors.size:
+                vectors = vectors.reshape(len(self.ids), -1)
+            else:
+                vectors = np.zeros((0, 0), np.float32)
+        self.vectors = vectors
+        self.documents = list(documents)
+        self.metadatas = [meta or {} for meta in metadatas]
+        self.norms = np.einsum("ij,ij->i", self.vectors, self.vectors)
+        self.columns: Dict[str, Tuple[np.ndarray, Dict[Any, int]]] = {}
+        keys = {key for meta in self.metadatas for key in meta if key != "text"}
+        for key in sorted(keys):
+            vocabulary: Dict[Any, int] = {}
+            codes = np.full(len(self.ids), -1, dtype=np.int32)
+            for n, meta in enumerate(self.metadatas):
+                if key in meta:
+                    codes[n] = vocabulary.setdefault(meta[key], len(vocabulary))
+            self.columns[key] = (codes, vocabulary)
+
+    @classmethod
+    def from_snapshot(cls, snapshot: StoreSnapshot) -> "NumpyCollection":
+        return cls(
+            snapshot.name,
+            snapshot.ids,
+            snapshot.embeddings,
+            snapshot.documents,
+            snapshot.metadatas,
+            snapshot.metadata,
+        )
+
+    def snapshot(self) -> StoreSnapshot:
+        return StoreSnapshot(
+            self.name,
+            list(self.ids),
+            self.vectors.copy(),
+            list(self.documents),
+            [dict(meta) for meta in self.metadatas],
+            self.metadata,
+        )
+
+    def count(self) -> int:
+        return len(self.ids)
+
+    def texts(self, ids: Sequence[str]) -> Dict[str, str]:
+        bodies = {}
+        for doc_id in ids:
+            position = self.positions.get(doc_id)
+            if position is not None and self.metadatas[position].get("text"):
+                bodies[doc_id] = self.metadatas[position]["text"]
+        return bodies
+
+    def upsert(
+        self,
+        ids: Sequence[str],
+        embeddings: Any,
+        documents: Optional[Sequence[Optional[str]]] = None,
+        metadatas: Optional[Sequence[Optional[Dict[str, Any]]]] = None,
+    ) -> None:
+        vectors = np.asarray(embeddings, dtype=np.float32).reshape(len(ids), -1)
+        if self.ids and vectors.shape[1] != self.vectors.shape[1]:
+            raise RuntimeError(
+                f"{self.name} holds {self.vectors.shape[1]}-d vectors, got {vectors.shape[1]}-d."
+            )
+        all_ids, rows = list(self.ids), list(self.vectors)
+        all_documents, all_metadatas = list(self.documents), list(self.metadatas)
+        for n, doc_id in enumerate(ids):
+            position = self.positions.get(doc_id)
+            if position is None:
+                position = len(all_ids)
+                all_ids.append(doc_id)
+                rows.append(vectors[n])
+                all_documents.append(None)
+                all_metadatas.append({})
+            rows[position] = vectors[n]
+            if documents is not None:
+                all_documents[position] = documents[n]
+            if metadatas is not None:
+                all_metadatas[position] = metadatas[n] or {}
+        self.load(all_ids, np.asarray(rows, dtype=np.float32), all_documents, all_metadatas)
+
+    def delete(self, ids: Sequence[str]) -> None:
+        drop = {self.positions[doc_id] for doc_id in ids if doc_id in self.positions}
+        keep = [n for n in range(len(self.ids)) if n not in drop]
+        self.load(
+            [self.ids[n] for n in keep],
+            self.vectors[keep],
+            [self.documents[n] for n in keep],
+            [self.metadatas[n] for n in keep],
+        )
+
+    def mask(self, where: Optional[Dict[str, Any]]) -> np.ndarray:
+        if not where:
+            return np.ones(len(self.ids), dtype=bool)
+        if "$and" in where:
+            result = np.ones(len(self.ids), dtype=bool)
+            for clause in where["$and"]:
+                result &= self.mask(clause)
+            return result
+        if len(where) != 1:
+            return self.mask({"$and": [{key: value} for key, value in where.items()]})
+        key, condition = next(iter(where.items()))
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+        codes, vocabulary = self.columns.get(key, (np.full(len(self.ids), -1, dtype=np.int32), {}))
+        (operator, value), = condition.items()
+        if operator == "$eq":
+            return codes == vocabulary.get(value, -2)
+        if operator == "$in":
+            return np.isin(codes, [vocabulary[item] for item in value if item in vocabulary])
+        raise RuntimeError(
+            f"{type(self).__name__} supports $eq, $in and $and filters, not {operator}."
+        )
+
+    def dots(self, queries: np.ndarray) -> np.ndarray:
+        return queries @ self.vectors.T
+
+    def distances(self, query_embeddings: np.ndarray) -> np.ndarray:
+        queries = np.asarray(query_embeddings, dtype=np.float32).reshape(-1, self.vectors.shape[1])
+        dots = self.dots(queries)
+        if self.space == "ip":
+            return 1.0 - dots
+        if self.space == "cosine":
+            query_norms = np.linalg.norm(queries, axis=1, keepdims=True)
+            return 1.0 - dots / np.maximum(query_norms * np.sqrt(self.norms), 1e-12)
+        squared = np.einsum("ij,ij->i", queries, queries)[:, None] + self.norms - 2.0 * dots
+        return np.maximum(squared, 0.0)
+
+    def search(
+        self, query_embeddings: Any, allowed: np.ndarray, k: int
+    ) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """(rows, distances) of the k nearest allowed vectors per query, nearest first."""
+        if not self.ids:
+            empty = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32))
+            return [empty] * len(np.atleast_2d(np.asarray(query_embeddings)))
+        candidates = np.flatnonzero(allowed)
+        k = min(k, len(candidates))
+        hits = []
+        for row in self.distances(query_embeddings)[:, candidates]:
+            top = np.argpartition(row, k - 1)[:k] if 0 < k < len(row) else np.arange(k)
+            top = top[np.argsort(row[top], kind="stable")]
+            hits.append((candidates[top], row[top]))
+        return hits
+
+    def records(self, rows: np.ndarray, include: List[str]) -> Dict[str, Any]:
+        return {
+            "ids": [self.ids[n] for n in rows],
+            "documents": [self.documents[n] for n in rows] if "documents" in include else None,
+            "metadatas": [self.metadatas[n] for n in rows] if "metadatas" in include else None,
+            "embeddings": self.vectors[rows] if "embeddings" in include else None,
+        }
+
+    def query(
+        self,
+        query_embeddings: Any,
+        n_results: int = 10,
+        where: Optional[Dict[str, Any]] = None,
+        include: Sequence[str] = ("documents", "metadatas", "distances"),
+    ) -> Dict[str, Any]:
+        include = list(include)
+        out: Dict[str, Any] = {key: [] for key in ("ids", "documents", "metadatas", "distances")}
+        for rows, distances in self.search(query_embeddings, self.mask(where), n_results):
+            found = self.records(rows, include)
+            out["ids"].append(found["ids"])
+            out["documents"].append(found["documents"])
+            out["metadatas"].append(found["metadatas"])
+            out["distances"].append(np.asarray(distances, dtype=np.float64).tolist())
+        for key in ("documents", "metadatas", "distances"):
+            if key not in include:
+                out[key] = None
+        return out
+
+    def get(
+        self,
+        ids: Optional[Sequence[str]] = None,
+        where: Optional[Dict[str, Any]] = None,
+        limit: Optional[int] = None,
+        include: Sequence[str] = ("documents", "metadatas"),
+    ) -> Dict[str, Any]:
+        allowed = self.mask(where)
+        if ids is not None:
+            rows = np.array([self.positions[i] for i in ids if i in self.positions], dtype=np.int64)
+            rows = rows[allowed[rows]]
+        else:
+            rows = np.flatnonzero(allowed)
+        return self.records(rows[:limit], list(include))
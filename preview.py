@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+import hashlib
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import orjson
+
+JSONL_NAME = "embedding_preview.jsonl"
+SUMMARY_NAME = "embedding_preview.json"
+
+
+class PreviewWriter:
+    """
+    Streams build records to embedding_preview.jsonl as they are produced and keeps
+    only per-record offsets and checksums in memory. close() writes
+    embedding_preview.json with counts, the file checksum and the offset index, so a
+    reader can seek straight to any record.
+    """
+
+    def __init__(self, directory: Path, collection_name: str, model: str) -> None:
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.jsonl_path = self.directory / JSONL_NAME
+        self.summary_path = self.directory / SUMMARY_NAME
+        self.collection_name = collection_name
+        self.model = model
+        self.offsets: Dict[str, List[Any]] = {}
+        self.bytes_written = 0
+        self._digest = hashlib.sha256()
+        self._file = self.jsonl_path.open("wb")
+
+    def write(
+        self, ids: List[str], documents: List[str], metadatas: List[Dict[str, Any]]
+    ) -> None:
+        for doc_id, doc, meta in zip(ids, documents, metadatas):
+            line = orjson.dumps({"id": doc_id, "data": doc, "metadata": meta}) + b"\n"
+            self._file.write(line)
+            self._digest.update(line)
+            self.offsets[doc_id] = [
+                self.bytes_written,
+                len(line),
+                hashlib.sha256(line).hexdigest(),
+            ]
+            self.bytes_written += len(line)
+
+    def close(self) -> None:
+        if self._file.closed:
+            return
+        self._file.close()
+        summary = {
+            "count": len(self.offsets),
+            "collection": self.collection_name,
+            "model": self.model,
+            "jsonl": self.jsonl_path.name,
+            "bytes": self.bytes_written,
+            "sha256": self._digest.hexdigest(),
+            # id -> [byte offset, byte length, sha256 of the line]
+            "offsets": self.offsets,
+        }
+        self.summary_path.write_bytes(orjson.dumps(summary, option=orjson.OPT_INDENT_2))
+
+    def __enter__(self) -> "PreviewWriter":
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
+
+def read_preview_record(directory: Path, doc_id: str) -> Optional[Dict[str, Any]]:
+    """Fetch one record by id using the summary's offset index."""
+    directory = Path(directory)
+    summary = orjson.loads((directory / SUMMARY_NAME).read_bytes())
+    location = summary["offsets"].get(doc_id)
+    if location is None:
+        return None
+    offset, length, _ = location
+    with (directory / summary["jsonl"]).open("rb") as handle:
+        handle.seek(offset)
+        return orjson.loads(handle.read(length))
@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+STORAGE_CHOICES = ("float32", "float16", "int8")
+
+
+def l2_normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (vectors / norms).astype(np.float32, copy=False)
+
+
+def truncate(vectors: np.ndarray, dimensions: Optional[int]) -> np.ndarray:
+    """
+    Matryoshka truncation: keep the leading `dimensions` components and renormalize.
+    For text-embedding-3 models this matches what the API returns for `dimensions=`.
+    """
+    if dimensions is None or dimensions >= vectors.shape[-1]:
+        return vectors
+    return l2_normalize(vectors[..., :dimensions])
+
+
+def quantize(vectors: np.ndarray, storage: str) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """Compact codes and, for int8, one float32 scale per vector (max |x| / 127)."""
+    if storage == "float32":
+        return np.ascontiguousarray(vectors, dtype=np.float32), None
+    if storage == "float16":
+        return vectors.astype(np.float16), None
+    if storage == "int8":
+        scales = np.abs(vectors).max(axis=-1, keepdims=True) / 127.0
+        scales[scales == 0] = 1.0
+        codes = np.clip(np.rint(vectors / scales), -127, 127).astype(np.int8)
+        return codes, scales.astype(np.float32).reshape(-1)
+    raise RuntimeError(f"Unknown storage {storage!r}; choose one of {', '.join(STORAGE_CHOICES)}.")
+
+
+def dequantize(codes: np.ndarray, scales: Optional[np.ndarray] = None) -> np.ndarray:
+    values = codes.astype(np.float32)
+    if scales is not None:
+        values *= scales.reshape(-1, 1)
+    return values
+
+
+@dataclass(frozen=True)
+class VectorCodec:
+    """
+    How stored vectors are derived from raw embeddings. Recorded in the collection
+    metadata so queries can apply the same truncation and normalization.
+
+    Chroma only accepts float32, so quantized modes store the dequantized values there: the
+    index sees exactly the precision a float16/int8 store would have but does not shrink.
+    Snapshots (see snapshot.py) keep the compact codes on disk; `bytes_per_vector` is
+    what those occupy.
+    """
+
+    dimensions: Optional[int] = None
+    storage: str = "float32"
+
+    @property
+    def name(self) -> str:
+        return f"{self.dimensions or 'full'}-{self.storage}"
+
+    @property
+    def is_identity(self) -> bool:
+        return self.dimensions is None and self.storage == "float32"
+
+    def bytes_per_vector(self, dimensions: int) -> int:
+        width = min(dimensions, self.dimensions or dimensions)
+        if self.storage == "int8":
+            return width + 4
+        return width * (2 if self.storage == "float16" else 4)
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        if self.is_identity:
+            return vectors
+        vectors = l2_normalize(truncate(vectors, self.dimensions))
+        if self.storage == "float32":
+            return vectors
+        return dequantize(*quantize(vectors, self.storage))
+
+    def prepare_query(self, vectors: np.ndarray) -> np.ndarray:
+        """Queries are truncated and normalized like stored vectors but kept at full precision."""
+        if self.is_identity:
+            return vectors
+        return l2_normalize(truncate(vectors, self.dimensions))
+
+    def metadata(self) -> Optional[Dict[str, Any]]:
+        if self.is_identity:
+            return None
+        return {"codec_dimensions": self.dimensions or 0, "codec_storage": self.storage}
+
+    @classmethod
+    def from_metadata(cls, metadata: Optional[Dict[str, Any]]) -> "VectorCodec":
+        metadata = metadata or {}
+        return cls(
+            dimensions=int(metadata.get("codec_dimensions", 0)) or None,
+            storage=str(metadata.get("codec_storage", "float32")),
+        )
@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+import argparse
+import http.client
+import json
+import socket
+import sys
+
+# Deliberately stdlib-only (constants.py just needs os): the point of the client is to skip
+# chromadb/numpy import time.
+from constants import DEFAULT_SERVER_HOST, DEFAULT_SERVER_PORT
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, socket_path: str, timeout: float = 60.0) -> None:
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self) -> None:
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+
+def request(
+    connection: http.client.HTTPConnection, method: str, path: str, body: dict | None = None
+) -> dict:
+    payload = json.dumps(body).encode("utf-8") if body is not None else None
+    headers = {"Content-Type": "application/json"} if payload else {}
+    connection.request(method, path, body=payload, headers=headers)
+    response = connection.getresponse()
+    data = json.loads(response.read() or b"{}")
+    if response.status != 200:
+        raise RuntimeError(f"retrieval server answered {response.status}: {data.get('error')}")
+    return data
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Query a running retrieval_server.py.")
+    parser.add_argument("query_text", nargs="?", help="Query text (positional).")
+    parser.add_argument("--query", help="Query text to retrieve top-k chunks.")
+    parser.add_argument("--host", default=DEFAULT_SERVER_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_SERVER_PORT)
+    parser.add_argument("--socket", default=None, help="Unix socket the server listens on.")
+    parser.add_argument("--top-k", type=int, default=6)
+    parser.add_argument("--fusion", choices=("max", "weighted"), default="max")
+    parser.add_argument("--mode", choices=("staged", "single"), default="staged")
+    parser.add_argument("--health", action="store_true", help="Print server status and exit.")
+    args = parser.parse_args()
+
+    connection = (
+        UnixHTTPConnection(args.socket)
+        if args.socket
+        else http.client.HTTPConnection(args.host, args.port, timeout=60.0)
+    )
+    try:
+        if args.health:
+            print(json.dumps(request(connection, "GET", "/health")))
+            return
+        query = args.query or args.query_text
+        if not query:
+            query = input("Enter query: ").strip()
+        if not query:
+            raise SystemExit("Provide a query via --query, positional arg, or stdin.")
+        body = {"query": query, "top_k": args.top_k, "fusion": args.fusion, "mode": args.mode}
+        result = request(connection, "POST", "/query", body)
+        sys.stdout.write(result["output"])
+        print(f"[client] collection={result['collection']} server_ms={result['elapsed_ms']:.1f}")
+    finally:
+        connection.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,274 @@
+from __future__ import annotations
+
+import asyncio
+import email.utils
+import random
+import threading
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+import httpx
+
+from constants import (
+    DEFAULT_MAX_RETRIES,
+    DEFAULT_REQUESTS_PER_MINUTE,
+    DEFAULT_TOKENS_PER_MINUTE,
+)
+
+# Request priorities. Interactive (query) traffic always goes before batch (ingestion) traffic.
+INTERACTIVE = 0
+BATCH = 1
+
+RETRY_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """Continuously refilling bucket; not thread-safe on its own (QuotaScheduler locks it)."""
+
+    def __init__(self, per_minute: float, capacity: Optional[float] = None) -> None:
+        self.rate = per_minute / 60.0
+        self.capacity = capacity if capacity is not None else per_minute
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, floor: float = 0.0) -> float:
+        """Seconds until `amount` can be taken while leaving at least `floor` behind."""
+        amount = min(amount, self.capacity - floor)
+        missing = amount + floor - self.level
+        return 0.0 if missing <= 0 else missing / self.rate
+
+    def take(self, amount: float) -> None:
+        self.level -= min(amount, self.capacity)
+
+
+class QuotaScheduler:
+    """
+    Requests-per-minute and tokens-per-minute budget for one process.
+
+    Batch requests may not dip into the last `interactive_reserve` fraction of either
+    bucket and always yield while an interactive request is waiting in the same process.
+    Works from threads and event loops alike. The state is in memory only: a separate
+    ingestion process and query server each get a full budget and cannot see each
+    other's traffic, so give them --rpm/--tpm shares that add up to the account limit.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: float = DEFAULT_REQUESTS_PER_MINUTE,
+        tokens_per_minute: float = DEFAULT_TOKENS_PER_MINUTE,
+        interactive_reserve: float = 0.1,
+    ) -> None:
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.interactive_reserve = interactive_reserve
+        self.paused_until = 0.0
+        self.waiting_interactive = 0
+        self._lock = threading.Lock()
+
+    def configure(self, requests_per_minute: float, tokens_per_minute: float) -> None:
+        with self._lock:
+            self.requests = TokenBucket(requests_per_minute)
+            self.tokens = TokenBucket(tokens_per_minute)
+
+    def pause(self, seconds: float) -> None:
+        """Hold every caller back, e.g. after the server answered 429 with Retry-After."""
+        with self._lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    def _try_acquire(self, tokens: int, priority: int) -> float:
+        with self._lock:
+            now = time.monotonic()
+            if now < self.paused_until:
+                return self.paused_until - now
+            if priority != INTERACTIVE and self.waiting_interactive:
+                return 0.01
+            self.requests.refill(now)
+            self.tokens.refill(now)
+            reserve = 0.0 if priority == INTERACTIVE else self.interactive_reserve
+            wait = max(
+                self.requests.wait_time(1, reserve * self.requests.capacity),
+                self.tokens.wait_time(tokens, reserve * self.tokens.capacity),
+            )
+            if wait > 0:
+                return wait
+            self.requests.take(1)
+            self.tokens.take(tokens)
+            return 0.0
+
+    def _enter(self, priority: int) -> None:
+        if priority == INTERACTIVE:
+            with self._lock:
+                self.waiting_interactive += 1
+
+    def _leave(self, priority: int) -> None:
+        if priority == INTERACTIVE:
+            with self._lock:
+                self.waiting_interactive -= 1
+
+    def acquire(self, tokens: int, priority: int = INTERACTIVE) -> None:
+        self._enter(priority)
+        try:
+            while (wait := self._try_acquire(tokens, priority)) > 0:
+                time.sleep(wait)
+        finally:
+            self._leave(priority)
+
+    async def acquire_async(self, tokens: int, priority: int = BATCH) -> None:
+        self._enter(priority)
+        try:
+            while (wait := self._try_acquire(tokens, priority)) > 0:
+                await asyncio.sleep(wait)
+        finally:
+            self._leave(priority)
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    max_retries: int = DEFAULT_MAX_RETRIES
+    base_delay: float = 0.5
+    max_delay: float = 30.0
+
+    def delay(self, attempt: int, response: Optional[httpx.Response] = None) -> float:
+        """Server-provided Retry-After wins; otherwise full-jitter exponential backoff."""
+        if response is not None:
+            hinted = retry_after_seconds(response)
+            if hinted is not None:
+                return min(hinted, self.max_delay)
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2**attempt)))
+
+
+def retry_after_seconds(response: httpx.Response) -> Optional[float]:
+    value = response.headers.get("retry-after-ms")
+    if value:
+        try:
+            return float(value) / 1000.0
+        except ValueError:
+            pass
+    value = response.headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        parsed = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        # Malformed header: fall back to the policy's own backoff.
+        return None
+    return max(0.0, parsed.timestamp() - time.time())
+
+
+def request_cost(request: httpx.Request) -> tuple[int, int]:
+    """(estimated tokens, priority) attached by the caller via request extensions."""
+    return (
+        int(request.extensions.get("embedding_tokens", 0)),
+        int(request.extensions.get("priority", INTERACTIVE)),
+    )
+
+
+class RetryTransport(httpx.BaseTransport):
+    """httpx transport that waits for quota before each attempt and retries throttling/5xx."""
+
+    def __init__(
+        self,
+        quota: QuotaScheduler,
+        policy: RetryPolicy = RetryPolicy(),
+        inner: Optional[httpx.BaseTransport] = None,
+    ) -> None:
+        self.quota = quota
+        self.policy = policy
+        self.inner = inner or httpx.HTTPTransport()
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        tokens, priority = request_cost(request)
+        attempt = 0
+        while True:
+            self.quota.acquire(tokens, priority)
+            try:
+                response = self.inner.handle_request(request)
+            except httpx.TransportError:
+                if attempt >= self.policy.max_retries:
+                    raise
+                time.sleep(self.policy.delay(attempt))
+                attempt += 1
+                continue
+            if response.status_code not in RETRY_STATUS or attempt >= self.policy.max_retries:
+                return response
+            response.read()
+            response.close()
+            delay = self.policy.delay(attempt, response)
+            if response.status_code == 429:
+                self.quota.pause(delay)
+            time.sleep(delay)
+            attempt += 1
+
+    def close(self) -> None:
+        self.inner.close()
+
+
+class AsyncRetryTransport(httpx.AsyncBaseTransport):
+    """Async twin of RetryTransport."""
+
+    def __init__(
+        self,
+        quota: QuotaScheduler,
+        policy: RetryPolicy = RetryPolicy(),
+        inner: Optional[httpx.AsyncBaseTransport] = None,
+    ) -> None:
+        self.quota = quota
+        self.policy = policy
+        self.inner = inner or httpx.AsyncHTTPTransport()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        tokens, priority = request_cost(request)
+        attempt = 0
+        while True:
+            await self.quota.acquire_async(tokens, priority)
+            try:
+                response = await self.inner.handle_async_request(request)
+            except httpx.TransportError:
+                if attempt >= self.policy.max_retries:
+                    raise
+                await asyncio.sleep(self.policy.delay(attempt))
+                attempt += 1
+                continue
+            if response.status_code not in RETRY_STATUS or attempt >= self.policy.max_retries:
+                return response
+            await response.aread()
+            await response.aclose()
+            delay = self.policy.delay(attempt, response)
+            if response.status_code == 429:
+                self.quota.pause(delay)
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def aclose(self) -> None:
+        await self.inner.aclose()
+
+
+# One budget per process, shared by every embedder client in it (not across processes).
+SHARED_QUOTA = QuotaScheduler()
+
+
+def make_client(
+    quota: QuotaScheduler = SHARED_QUOTA, policy: RetryPolicy = RetryPolicy()
+) -> httpx.Client:
+    return httpx.Client(transport=RetryTransport(quota, policy))
+
+
+def make_async_client(
+    max_connections: int,
+    quota: QuotaScheduler = SHARED_QUOTA,
+    policy: RetryPolicy = RetryPolicy(),
+) -> httpx.AsyncClient:
+    limits = httpx.Limits(
+        max_connections=max_connections, max_keepalive_connections=max_connections
+    )
+    inner = httpx.AsyncHTTPTransport(limits=limits)
+    return httpx.AsyncClient(transport=AsyncRetryTransport(quota, policy, inner))
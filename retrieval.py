@@ -0,0 +1,589 @@
+from __future__ import annotations
+
+import statistics
+import time
+from dataclasses import asdict, dataclass, field
+from functools import cmp_to_key
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from embedders import Embedder, embed_texts
+from embedding_cache import EmbeddingCache, QueryEmbeddingCache
+from multivector import fuse, hydrate_summaries
+from quantization import VectorCodec
+from vector_store import VectorStore, open_store
+
+# Chroma returns "distances" by default. For cosine distance, lower is better.
+DISTANCE_SORT = "asc"
+MIN_GROUP_SIZE = 2
+TOP_ROUTER = 3
+PRIORITY_EPSILON = 0.03
+ROUTER_MAX_ABS_GAP = 0.08    # tune: 0.03–0.10 depending on embedding scale
+ROUTER_MAX_REL_GAP = 0.05    # 3% relative gap
+ROUTER_MIN_GAP_TO_ALLOW_MULTI = 0.05  # if everything is too close, treat as ambiguous and keep 1
+
+
+# NEW: Router topic acceptance window.
+# Keep TOP_ROUTER candidates, but only accept topics whose distance is within this ratio of the
+# best router distance.
+# If best router dist = d0, accept items with dist <= d0 * ROUTER_CUTOFF_RATIO
+ROUTER_CUTOFF_RATIO = 1.06
+
+# "staged" runs one filtered Chroma query per stage; "single" fetches the distance to
+# every vector once and does router, support and planner_policy filtering in memory.
+# Single pass is exact only while the whole corpus fits one candidate set, so larger
+# collections fall back to staged.
+RETRIEVAL_MODES = ("staged", "single")
+SINGLE_PASS_MAX_CANDIDATES = 2000
+
+# Single-pass metadata index: id -> metadata without chunk text, for one physical
+# collection at a time, keyed by name, count and the build fingerprint in the collection
+# metadata so a rebuilt collection (in place included) reloads it.
+_metadata_index: Dict[Tuple[str, int, Optional[str]], Dict[str, Dict[str, Any]]] = {}
+
+
+@dataclass(slots=True)
+class RouterDecision:
+    id: str
+    topic: Optional[str]
+    distance: float
+    accepted: bool
+
+
+@dataclass(slots=True)
+class RetrievedChunk:
+    id: str
+    data: str
+    meta: Dict[str, Any]
+    distance: float
+    # Per-view distances when the hit was fused from a multi-vector collection.
+    views: Optional[Dict[str, float]] = None
+
+    @property
+    def topic(self) -> Optional[str]:
+        return self.meta.get("topic")
+
+    @property
+    def text(self) -> str:
+        return self.meta.get("text", "")
+
+
+@dataclass(slots=True)
+class RetrievalResult:
+    query: str
+    collection: str
+    router: List[RouterDecision] = field(default_factory=list)
+    router_best: Optional[float] = None
+    router_min_gap: Optional[float] = None
+    chosen_topics: List[str] = field(default_factory=list)
+    forced_topics: List[str] = field(default_factory=list)
+    chunks: List[RetrievedChunk] = field(default_factory=list)
+    # Group-selection [debug] lines, in the order select_by_groups produced them.
+    trace: List[str] = field(default_factory=list)
+    timings: Dict[str, float] = field(default_factory=dict)
+
+    @property
+    def router_topics(self) -> List[str]:
+        return [decision.topic for decision in self.router if decision.accepted and decision.topic]
+
+    @property
+    def support_topics(self) -> List[str]:
+        topics: List[str] = []
+        for chunk in self.chunks:
+            if chunk.topic and chunk.topic not in topics:
+                topics.append(chunk.topic)
+        return topics
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+def build_items(results: dict, row: int = 0) -> list[dict]:
+    ids = results.get("ids", [[]])[row]
+    docs = results.get("documents", [[]])[row]
+    metas = results.get("metadatas", [[]])[row]
+    distances = results.get("distances", [[]])[row]
+
+    merged = []
+    for doc_id, doc, meta, distance in zip(ids, docs, metas, distances):
+        merged.append(
+            {
+                "id": doc_id,
+                "data": doc,
+                "meta": meta or {},
+                "distance": distance,
+            }
+        )
+    return merged
+
+
+def select_by_groups(
+    items: list[dict], top_k: int, trace: Optional[List[str]] = None
+) -> list[dict]:
+    """`trace` collects the [debug] lines; without it they are printed."""
+    log = print if trace is None else trace.append
+    if DISTANCE_SORT != "asc":
+        raise RuntimeError("This pipeline assumes cosine distance (lower is better).")
+
+    grouped: dict[tuple[str, str], list[dict]] = {}
+    for item in items:
+        meta = item["meta"]
+        doc_type = meta.get("doc_type") or "UNKNOWN"
+        topic = meta.get("topic") or "UNKNOWN"
+        group_key = (doc_type, topic)
+        grouped.setdefault(group_key, []).append(item)
+
+    def compare_items(left: dict, right: dict) -> int:
+        ld = left["distance"]
+        rd = right["distance"]
+
+        if ld != rd:
+            return -1 if ld < rd else 1
+
+        # Only break ties by priority inside same group (topic/doc_type)
+        lm = left["meta"]
+        rm = right["meta"]
+        lgroup = (lm.get("doc_type") or "UNKNOWN", lm.get("topic") or "UNKNOWN")
+        rgroup = (rm.get("doc_type") or "UNKNOWN", rm.get("topic") or "UNKNOWN")
+        if lgroup == rgroup:
+            lp = lm.get("priority", 0)
+            rp = rm.get("priority", 0)
+            if lp != rp:
+                return -1 if lp > rp else 1
+
+        return 0
+
+    def best_item(items_list: list[dict]) -> dict:
+        best = items_list[0]
+        for item in items_list[1:]:
+            if compare_items(item, best) < 0:
+                best = item
+        return best
+
+    best_per_group = []
+    for group_items in grouped.values():
+        if len(group_items) < MIN_GROUP_SIZE:
+            continue
+        best_per_group.append(best_item(group_items))
+    if not best_per_group:
+        best_per_group = [best_item(group_items) for group_items in grouped.values()]
+    best_per_group.sort(key=cmp_to_key(compare_items))
+
+    selected: list[dict] = []
+    seen_ids = set()
+
+    if best_per_group:
+        dists = [item["distance"] for item in best_per_group]
+        best_score = dists[0]
+        median_score = statistics.median(dists)
+        cutoff = best_score * 1.10
+        allowed = [item for item in best_per_group if item["distance"] <= cutoff]
+        filtered_items = [item for item in items if item["distance"] <= cutoff]
+        log(
+            "[debug] groups="
+            f"{len(best_per_group)} best={best_score:.4f} median={median_score:.4f} "
+            f"ratio=1.10 allowed={len(allowed)}"
+        )
+        if allowed:
+            log("[debug] allowed groups:")
+            for item in allowed:
+                meta = item["meta"]
+                log(
+                    "  - "
+                    f"{(meta.get('doc_type') or 'UNKNOWN', meta.get('topic') or 'UNKNOWN')} "
+                    f"dist={item['distance']:.4f}"
+                )
+    else:
+        allowed = []
+        filtered_items = items
+
+    for item in allowed:
+        if item["id"] in seen_ids:
+            continue
+        selected.append(item)
+        seen_ids.add(item["id"])
+        if len(selected) >= top_k:
+            return selected
+
+    for item in best_per_group:
+        if item["id"] in seen_ids:
+            continue
+        selected.append(item)
+        seen_ids.add(item["id"])
+        if len(selected) >= top_k:
+            return selected
+
+    remaining = [item for item in filtered_items if item["id"] not in seen_ids]
+    remaining.sort(key=cmp_to_key(compare_items))
+    topic_counts: dict[tuple[str, str], int] = {}
+    for item in selected:
+        meta = item["meta"]
+        group_key = (meta.get("doc_type") or "UNKNOWN", meta.get("topic") or "UNKNOWN")
+        topic_counts[group_key] = topic_counts.get(group_key, 0) + 1
+    max_per_group = 2
+    for item in remaining:
+        meta = item["meta"]
+        group_key = (meta.get("doc_type") or "UNKNOWN", meta.get("topic") or "UNKNOWN")
+        if topic_counts.get(group_key, 0) >= max_per_group:
+            continue
+        selected.append(item)
+        topic_counts[group_key] = topic_counts.get(group_key, 0) + 1
+        if len(selected) >= top_k:
+            break
+
+    return selected
+
+
+def structural_topics(query: str) -> list[str]:
+    """
+    Minimal structural detection (not intent keyword lists).
+    If query expresses branching, ensure 'conditions' is included.
+    """
+    q = query.lower()
+    has_if = "if " in q
+    has_else = " else " in q or " otherwise" in q
+    has_then = " then " in q
+    has_unless = " unless " in q
+    has_when_then = (" when " in q) and (" then " in q)
+
+    if (has_if and (has_then or has_else)) or has_unless or has_when_then:
+        return ["conditions"]
+    return []
+
+
+def pick_forced_first(
+    items: list[dict], forced_topics: list[str], top_k: int, trace: Optional[List[str]] = None
+) -> list[dict]:
+    """
+    Guarantee at least one item from forced_topics (if available),
+    but keep overall ranking natural (don’t always put forced first).
+    """
+    if not forced_topics:
+        return select_by_groups(items, top_k, trace)
+
+    forced_set = set(forced_topics)
+
+    # Get best forced item (if any)
+    forced_items = [it for it in items if (it.get("meta") or {}).get("topic") in forced_set]
+    if not forced_items:
+        return select_by_groups(items, top_k, trace)
+
+    best_forced = select_by_groups(forced_items, 1, trace)[0]
+
+    # Now rank remaining normally
+    remaining = [it for it in items if it["id"] != best_forced["id"]]
+    rest = select_by_groups(remaining, max(top_k - 1, 0), trace)
+
+    # Merge and then re-sort by your standard compare logic to preserve global ordering
+    combined = [best_forced] + rest
+    # Re-run select_by_groups on combined to let compare_items decide final order cleanly
+    return select_by_groups(combined, top_k, trace)
+
+
+def open_collection(
+    chroma_path: Path, collection_name: str, backend: str = "chroma"
+) -> VectorStore:
+    return open_store(chroma_path, collection_name, backend)
+
+
+def to_chunk(item: dict) -> RetrievedChunk:
+    return RetrievedChunk(
+        item["id"], item["data"], item["meta"], item["distance"], item.get("views")
+    )
+
+
+def accept_router(result: RetrievalResult, router_items: list[dict]) -> list[str]:
+    """Record the router decisions on `result` and return the accepted topics."""
+    router_items.sort(key=lambda item: item["distance"])
+    chosen_topics: list[str] = []
+    if not router_items:
+        return chosen_topics
+    best = router_items[0]["distance"]
+
+    # Compute gaps
+    gaps = [it["distance"] - best for it in router_items[1:]]
+    min_gap = min(gaps) if gaps else 999.0
+
+    # If the router is "flat" (all topics very similar), keep only best topic
+    if min_gap < ROUTER_MIN_GAP_TO_ALLOW_MULTI:
+        accepted_router = [router_items[0]]
+    else:
+        accepted_router = []
+        for it in router_items:
+            abs_gap = it["distance"] - best
+            rel_gap = abs_gap / max(best, 1e-9)
+            if abs_gap <= ROUTER_MAX_ABS_GAP and rel_gap <= ROUTER_MAX_REL_GAP:
+                accepted_router.append(it)
+
+    accepted_ids = {it["id"] for it in accepted_router}
+    result.router_best = best
+    result.router_min_gap = min_gap
+    result.router = [
+        RouterDecision(it["id"], it["meta"].get("topic"), it["distance"], it["id"] in accepted_ids)
+        for it in router_items
+    ]
+    for it in accepted_router:
+        topic = it["meta"].get("topic")
+        if topic and topic not in chosen_topics:
+            chosen_topics.append(topic)
+    return chosen_topics
+
+
+def where_clause(filters: Dict[str, Any]) -> dict:
+    """Chroma `where` for {key: value} ($eq) / {key: [values]} ($in) stage filters."""
+    conditions = [
+        {key: {"$in": list(value)}} if isinstance(value, (list, tuple)) else {key: {"$eq": value}}
+        for key, value in filters.items()
+    ]
+    return conditions[0] if len(conditions) == 1 else {"$and": conditions}
+
+
+def matches(meta: Dict[str, Any], filters: Dict[str, Any]) -> bool:
+    """In-memory equivalent of `where_clause(filters)`."""
+    for key, value in filters.items():
+        if isinstance(value, (list, tuple)):
+            if meta.get(key) not in value:
+                return False
+        elif meta.get(key) != value:
+            return False
+    return True
+
+
+def metadata_index(
+    collection: Any, count: int, refresh: bool = False
+) -> Dict[str, Dict[str, Any]]:
+    key = (collection.name, count, (collection.metadata or {}).get("fingerprint"))
+    if refresh or key not in _metadata_index:
+        found = collection.get(include=["metadatas"])
+        _metadata_index.clear()
+        _metadata_index[key] = {
+            doc_id: {name: value for name, value in (meta or {}).items() if name != "text"}
+            for doc_id, meta in zip(found["ids"], found["metadatas"])
+        }
+    return _metadata_index[key]
+
+
+def hydrate(collection: Any, items: List[dict]) -> None:
+    """Fill in missing `data` and the `text` metadata of the selected items."""
+    missing = list(dict.fromkeys(item["id"] for item in items if item["data"] is None))
+    records: Dict[str, Tuple[Any, Dict[str, Any]]] = {}
+    if missing:
+        found = collection.get(ids=missing, include=["documents", "metadatas"])
+        records = {
+            doc_id: (document, meta or {})
+            for doc_id, document, meta in zip(found["ids"], found["documents"], found["metadatas"])
+        }
+    for item in items:
+        if item["id"] in records:
+            item["data"], item["meta"] = records[item["id"]]
+    # Chunk text never travels with search results (builds from before the content store
+    # still carry it in metadata); read it for the final selection only.
+    untexted = list(
+        dict.fromkeys(item["id"] for item in items if not (item["meta"] or {}).get("text"))
+    )
+    bodies = collection.texts(untexted) if untexted else {}
+    for item in items:
+        if bodies.get(item["id"]):
+            item["meta"] = {**item["meta"], "text": bodies[item["id"]]}
+
+
+def retrieve(
+    query: str,
+    top_k: int = 6,
+    *,
+    collection: Any,
+    embedder: Embedder,
+    cache: EmbeddingCache | QueryEmbeddingCache | None = None,
+    fusion: str = "max",
+    mode: str = "staged",
+) -> RetrievalResult:
+    """Route, gate and select chunks for `query` without printing anything."""
+    return retrieve_many(
+        [query],
+        top_k,
+        collection=collection,
+        embedder=embedder,
+        cache=cache,
+        fusion=fusion,
+        mode=mode,
+    )[0]
+
+
+def retrieve_many(
+    queries: List[str],
+    top_k: int = 6,
+    *,
+    collection: Any,
+    embedder: Embedder,
+    cache: EmbeddingCache | QueryEmbeddingCache | None = None,
+    fusion: str = "max",
+    mode: str = "staged",
+) -> List[RetrievalResult]:
+    """
+    Retrieve for many queries with one packed embedding pass and one Chroma query per
+    stage (the support stage issues one per distinct topic set, since `where` is shared
+    by every embedding in a call). With mode="single" those stages filter one shared
+    candidate fetch in memory instead. Acceptance and group selection run per query.
+    Stage timings are for the whole batch and are the same on every result.
+    """
+    if mode not in RETRIEVAL_MODES:
+        raise RuntimeError(f"Unknown retrieval mode {mode!r}; expected one of {RETRIEVAL_MODES}.")
+    if not queries:
+        return []
+    started = time.perf_counter()
+    results = [RetrievalResult(query=query, collection=collection.name) for query in queries]
+    all_rows = list(range(len(results)))
+    timings: Dict[str, float] = {}
+
+    def lap(stage: str, since: float) -> float:
+        now = time.perf_counter()
+        timings[stage] = (now - since) * 1000
+        return now
+
+    # Apply the same truncation/normalization the collection was built with.
+    codec = VectorCodec.from_metadata(collection.metadata)
+    query_embeddings = codec.prepare_query(embed_texts(embedder, list(queries), cache=cache))
+    # Multi-vector collections hold text/example vectors next to each summary vector.
+    multi_vector = (collection.metadata or {}).get("views", "summary") != "summary"
+    mark = lap("embed_ms", started)
+
+    # Single pass: distances to every vector in one search, joined with the in-memory
+    # metadata index. Documents are fetched for the final selection only.
+    pools: Optional[List[list[dict]]] = None
+    index: Dict[str, Dict[str, Any]] = {}
+    if mode == "single":
+        total = collection.count()
+        if 0 < total <= SINGLE_PASS_MAX_CANDIDATES:
+            index = metadata_index(collection, total)
+            pooled = collection.query(
+                query_embeddings=query_embeddings, n_results=total, include=["distances"]
+            )
+            if any(doc_id not in index for ids in pooled["ids"] for doc_id in ids):
+                # A handle opened before an in-place rebuild (or a build from before the
+                # fingerprint existed) still shows the old key; reload rather than fail.
+                index = metadata_index(collection, total, refresh=True)
+            pools = [
+                [
+                    {"id": doc_id, "data": None, "meta": index[doc_id], "distance": distance}
+                    for doc_id, distance in zip(pooled["ids"][row], pooled["distances"][row])
+                ]
+                for row in all_rows
+            ]
+        mark = lap("fetch_ms", mark)
+
+    def search(filters: Dict[str, Any], n_results: int, rows: List[int]) -> List[list[dict]]:
+        """Nearest `n_results` hits matching `filters`, for each query row."""
+        if pools is not None:
+            return [
+                [item for item in pools[row] if matches(item["meta"], filters)][:n_results]
+                for row in rows
+            ]
+        found = collection.query(
+            query_embeddings=query_embeddings[rows],
+            n_results=n_results,
+            include=["documents", "metadatas", "distances"],
+            where=where_clause(filters),
+        )
+        return [build_items(found, n) for n in range(len(rows))]
+
+    def fused_items(items: list[dict], row: int) -> list[dict]:
+        if not multi_vector:
+            return items
+        items, missing_summary = fuse(items, fusion)
+        if pools is not None:
+            # The metadata index holds every summary record; documents come at the end.
+            for item in items:
+                if item["id"] in missing_summary:
+                    item["meta"] = index[item["id"]]
+        else:
+            hydrate_summaries(collection, items, missing_summary)
+        return items
+
+    # --- Router stage (summary vectors only) ---
+    router_filters: Dict[str, Any] = {"role": "router"}
+    if multi_vector:
+        router_filters["view"] = "summary"
+    router_hits = search(router_filters, TOP_ROUTER, all_rows)
+    topic_sets: Dict[tuple, List[int]] = {}
+    for row, result in enumerate(results):
+        chosen_topics = accept_router(result, router_hits[row])
+
+        # Structural topics (e.g., branching) are added, not replacing router.
+        forced_topics = structural_topics(result.query)
+        for t in forced_topics:
+            if t not in chosen_topics:
+                chosen_topics.append(t)
+
+        # If router produced nothing (or everything got filtered), fall back to forced topics only.
+        if not chosen_topics:
+            chosen_topics = forced_topics[:] if forced_topics else ["planner_policy"]
+        result.chosen_topics = chosen_topics
+        result.forced_topics = forced_topics
+        topic_sets.setdefault(tuple(sorted(chosen_topics)), []).append(row)
+    mark = lap("router_ms", mark)
+
+    # --- Support stage (topic-gated) ---
+    candidate_k = min(max(top_k * 10, 80), 200)
+    selected_support: Dict[int, list[dict]] = {}
+    for topics, rows in topic_sets.items():
+        support_hits = search({"role": "support", "topic": list(topics)}, candidate_k, rows)
+        for row, hits in zip(rows, support_hits):
+            selected_support[row] = pick_forced_first(
+                fused_items(hits, row),
+                forced_topics=results[row].forced_topics,
+                top_k=max(top_k - 1, 1),
+                trace=results[row].trace,
+            )
+    mark = lap("support_ms", mark)
+
+    # Always append planner_policy at the end (if present).
+    planner_hits = search({"role": "support", "topic": "planner_policy"}, 1, all_rows)
+    final: List[list[dict]] = []
+    for row in all_rows:
+        planner_items = fused_items(planner_hits[row], row)
+        selected: list[dict] = selected_support[row][:]
+        if planner_items:
+            if not any((it.get("meta") or {}).get("topic") == "planner_policy" for it in selected):
+                selected.append(planner_items[0])
+        final.append(selected[:top_k])
+    mark = lap("planner_ms", mark)
+
+    hydrate(collection, [item for items in final for item in items])
+    for result, items in zip(results, final):
+        result.chunks = [to_chunk(item) for item in items]
+    lap("hydrate_ms", mark)
+    lap("total_ms", started)
+    for result in results:
+        result.timings = dict(timings, batch=len(results))
+    return results
+
+
+def format_result(result: RetrievalResult, debug: bool = True) -> str:
+    """Render a result the way query_embeddings.py has always printed it."""
+    lines: List[str] = []
+    if debug and result.router:
+        accepted = [decision for decision in result.router if decision.accepted]
+        lines.append(
+            "[debug] router "
+            f"best={result.router_best:.4f} min_gap={result.router_min_gap:.4f} "
+            f"accepted={len(accepted)}/{len(result.router)}"
+        )
+        if accepted:
+            lines.append("[debug] router accepted topics:")
+            for decision in accepted:
+                lines.append(f"  - topic={decision.topic} dist={decision.distance:.4f}")
+    if debug:
+        lines.extend(result.trace)
+
+    for rank, chunk in enumerate(result.chunks, start=1):
+        meta = chunk.meta
+        lines.append(f"{rank}. id={chunk.id} distance={chunk.distance}")
+        lines.append(f"   data={chunk.data}")
+        lines.append(
+            "   meta.doc_type="
+            f"{meta.get('doc_type')} topic={meta.get('topic')} priority={meta.get('priority')}"
+        )
+        lines.append(f"   meta.role={meta.get('role')}")
+        if chunk.text:
+            lines.append(f"   text={chunk.text}")
+    return "\n".join(lines) + "\n" if lines else ""
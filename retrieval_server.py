@@ -0,0 +1,286 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple, Union
+
+import chromadb
+import orjson
+from dotenv import load_dotenv
+
+from aliases import resolve_alias
+from constants import (
+    DEFAULT_CACHE_MAX_BYTES,
+    DEFAULT_CACHE_PATH,
+    DEFAULT_COLLECTION,
+    DEFAULT_MODEL,
+    DEFAULT_QUERY_CACHE_SIZE,
+    DEFAULT_QUERY_CACHE_TTL,
+    DEFAULT_SERVER_HOST,
+    DEFAULT_SERVER_PORT,
+)
+from content_store import open_content
+from embedders import EMBEDDER_CHOICES, Embedder, default_embedder_kind, make_embedder
+from embedding_cache import EmbeddingCache, QueryEmbeddingCache, open_cache, open_query_cache
+from multivector import FUSION_CHOICES
+from retrieval import RETRIEVAL_MODES, format_result, retrieve
+from vector_store import (
+    BACKEND_CHOICES,
+    ChromaStore,
+    as_backend,
+    build_stamp,
+    open_snapshot_store,
+)
+
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 500: "Internal Server Error"}
+
+
+class RetrievalService:
+    """
+    Process-wide retrieval state: one Chroma client, the open collection (reopened when the
+    alias moves or its build stamp changes, so promotions and in-place rebuilds are picked up
+    on the next request) and the embedder with its pooled HTTP connection.
+    """
+
+    def __init__(
+        self,
+        collection_name: str,
+        embedder: Embedder,
+        chroma_path: Path,
+        cache: Optional[Union[EmbeddingCache, QueryEmbeddingCache]] = None,
+        backend: str = "chroma",
+    ) -> None:
+        self.collection_name = collection_name
+        self.backend = backend
+        self.embedder = embedder
+        self.chroma_path = chroma_path
+        self.cache = cache
+        # The snapshot backend reads its own files and never needs a Chroma client.
+        self.client = (
+            None if backend == "snapshot" else chromadb.PersistentClient(path=str(chroma_path))
+        )
+        # physical name -> (build stamp, store)
+        self.collections: Dict[str, Tuple[Any, Any]] = {}
+        self.served = 0
+
+    def collection(self) -> Tuple[str, Any]:
+        physical = resolve_alias(self.chroma_path, self.collection_name)
+        stamp = build_stamp(self.chroma_path, self.collection_name, physical, self.backend)
+        cached = self.collections.get(physical)
+        if cached is None or cached[0] != stamp:
+            self.close()
+            if self.client is None:
+                store = open_snapshot_store(self.chroma_path, self.collection_name)
+            else:
+                # A fresh handle, so its collection metadata (build fingerprint) is current.
+                store = ChromaStore(
+                    self.client.get_or_create_collection(name=physical),
+                    open_content(self.chroma_path, physical),
+                )
+                if self.backend != "chroma":
+                    copy = as_backend(store, self.backend)
+                    if store.content is not None:
+                        store.content.close()
+                    store = copy
+            self.collections = {physical: (stamp, store)}
+        return physical, self.collections[physical][1]
+
+    def close(self) -> None:
+        for _, store in self.collections.values():
+            if isinstance(store, ChromaStore) and store.content is not None:
+                store.content.close()
+        self.collections = {}
+
+    def warm_up(self) -> None:
+        """Load the HNSW index (first query) and open the embedding connection."""
+        _, collection = self.collection()
+        probe = collection.get(limit=1, include=["embeddings"])
+        if probe["ids"]:
+            collection.query(query_embeddings=probe["embeddings"], n_results=1)
+        self.embedder.embed(["warm up"])
+
+    def query(self, query: str, top_k: int, fusion: str, mode: str = "staged") -> Dict[str, Any]:
+        _, collection = self.collection()
+        start = time.perf_counter()
+        result = retrieve(
+            query,
+            top_k,
+            collection=collection,
+            embedder=self.embedder,
+            cache=self.cache,
+            fusion=fusion,
+            mode=mode,
+        )
+        self.served += 1
+        # Structured result plus the CLI rendering, so thin clients need no formatter.
+        return {
+            **result.to_dict(),
+            "output": format_result(result),
+            "elapsed_ms": (time.perf_counter() - start) * 1000,
+        }
+
+    def health(self) -> Dict[str, Any]:
+        physical, collection = self.collection()
+        health: Dict[str, Any] = {
+            "collection": physical,
+            "count": collection.count(),
+            "served": self.served,
+        }
+        if isinstance(self.cache, QueryEmbeddingCache):
+            health["query_cache"] = self.cache.stats()
+        return health
+
+
+class RetrievalServer:
+    """Minimal HTTP/1.1 front end: POST /query, GET /health."""
+
+    def __init__(self, service: RetrievalService) -> None:
+        self.service = service
+        self.lock = asyncio.Lock()
+
+    async def route(self, method: str, path: str, raw: bytes) -> Tuple[int, Dict[str, Any]]:
+        if method == "GET" and path == "/health":
+            async with self.lock:
+                return 200, await asyncio.to_thread(self.service.health)
+        if method == "POST" and path == "/query":
+            try:
+                body = orjson.loads(raw or b"{}")
+                query = str(body["query"]).strip()
+                top_k = int(body.get("top_k", 6))
+                fusion = str(body.get("fusion", "max"))
+                mode = str(body.get("mode", "staged"))
+            except (KeyError, TypeError, ValueError, orjson.JSONDecodeError) as exc:
+                return 400, {"error": f"bad request body: {exc}"}
+            if (
+                not query
+                or top_k < 1
+                or fusion not in FUSION_CHOICES
+                or mode not in RETRIEVAL_MODES
+            ):
+                return 400, {
+                    "error": "query must be non-empty, top_k at least 1, fusion one of "
+                    "max/weighted, mode staged/single"
+                }
+            async with self.lock:
+                return 200, await asyncio.to_thread(self.service.query, query, top_k, fusion, mode)
+        return 404, {"error": f"no route for {method} {path}"}
+
+    async def respond(
+        self, writer: asyncio.StreamWriter, status: int, payload: Dict[str, Any]
+    ) -> None:
+        body = orjson.dumps(payload)
+        head = [f"HTTP/1.1 {status} {REASONS.get(status, 'Error')}"]
+        head.append("Content-Type: application/json")
+        head.append(f"Content-Length: {len(body)}")
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + body)
+        await writer.drain()
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                headers: Dict[str, str] = {}
+                try:
+                    request_line = await reader.readline()
+                    if not request_line:
+                        break
+                    method, path, _ = request_line.decode("latin-1").split(" ", 2)
+                    while True:
+                        line = await reader.readline()
+                        if line in (b"\r\n", b"\n", b""):
+                            break
+                        name, _, value = line.decode("latin-1").partition(":")
+                        headers[name.strip().lower()] = value.strip()
+                    length = int(headers.get("content-length", "0"))
+                    if length < 0:
+                        raise ValueError(f"negative Content-Length {length}")
+                except ValueError as exc:
+                    # Where the next request starts is unknown, so answer and hang up.
+                    await self.respond(writer, 400, {"error": f"malformed request: {exc}"})
+                    break
+                raw = await reader.readexactly(length) if length else b""
+
+                try:
+                    status, payload = await self.route(method, path, raw)
+                except Exception as exc:  # keep serving; report the failure to this client
+                    status, payload = 500, {"error": f"{type(exc).__name__}: {exc}"}
+
+                await self.respond(writer, status, payload)
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (asyncio.IncompleteReadError, ConnectionResetError):
+            pass
+        finally:
+            writer.close()
+
+
+async def serve(app: RetrievalServer, host: str, port: int, socket_path: Optional[str]) -> None:
+    if socket_path:
+        Path(socket_path).unlink(missing_ok=True)
+        server = await asyncio.start_unix_server(app.handle, path=socket_path)
+        where = f"unix:{socket_path}"
+    else:
+        server = await asyncio.start_server(app.handle, host, port)
+        where = f"http://{host}:{port}"
+    print(f"[server] retrieval listening on {where}", flush=True)
+    async with server:
+        await server.serve_forever()
+
+
+def main() -> None:
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Serve retrieval from a warm, long-lived process.")
+    parser.add_argument("--collection", default=DEFAULT_COLLECTION)
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument(
+        "--embedder",
+        choices=EMBEDDER_CHOICES,
+        default=default_embedder_kind(),
+        help="Embedding backend (env: EMBEDDER). Must match the one used to build.",
+    )
+    parser.add_argument("--base-url", default=None)
+    parser.add_argument("--chroma-path", default="data/chroma")
+    parser.add_argument("--backend", choices=BACKEND_CHOICES, default="chroma")
+    parser.add_argument("--host", default=DEFAULT_SERVER_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_SERVER_PORT)
+    parser.add_argument("--socket", default=None, help="Listen on this Unix socket instead of TCP.")
+    parser.add_argument("--cache-path", default=DEFAULT_CACHE_PATH)
+    parser.add_argument("--no-cache", action="store_true", help="Bypass the embedding cache.")
+    parser.add_argument(
+        "--cache-max-mb", type=float, default=DEFAULT_CACHE_MAX_BYTES / (1024 * 1024)
+    )
+    parser.add_argument(
+        "--query-cache-size",
+        type=int,
+        default=DEFAULT_QUERY_CACHE_SIZE,
+        help="Query embeddings kept in memory in front of the persistent cache (0 disables).",
+    )
+    parser.add_argument(
+        "--query-cache-ttl",
+        type=float,
+        default=DEFAULT_QUERY_CACHE_TTL,
+        help="Seconds an in-memory query embedding stays valid (0 keeps it until evicted).",
+    )
+    args = parser.parse_args()
+
+    embedder = make_embedder(args.embedder, args.model, args.base_url)
+    cache = None if args.no_cache else open_cache(args.cache_path, args.cache_max_mb)
+    query_cache = open_query_cache(args.query_cache_size, args.query_cache_ttl, cache)
+    service = RetrievalService(
+        args.collection, embedder, Path(args.chroma_path), query_cache or cache, args.backend
+    )
+    try:
+        service.warm_up()
+        asyncio.run(serve(RetrievalServer(service), args.host, args.port, args.socket))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.close()
+        embedder.close()
+        if cache is not None:
+            cache.close()
+
+
+if __name__ == "__main__":
+    main()
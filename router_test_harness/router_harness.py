@@ -8,7 +8,9 @@ Runs query_embeddings.py as a subprocess for a list of test cases, then asserts:
 - optional structural expectations (e.g., must include 'conditions' support chunk)
 
 This harness intentionally treats query_embeddings.py as a black box to avoid
-wiring into planner.py while you iterate on retrieval quality.
+wiring into planner.py while you iterate on retrieval quality. With --in-process it
+calls retrieval.retrieve() directly instead (one warm collection/embedder for all
+cases) and reads the topics from the structured result.
 """
 
 from __future__ import annotations
@@ -23,6 +25,8 @@ from dataclasses import dataclass
 from pathlib import Path
 from typing import Any, Dict, List, Optional, Tuple
 
+from dotenv import load_dotenv
+
 
 ROUTER_TOPIC_RE = re.compile(r"^\s*-\s*topic=(?P<topic>[\w\-]+)\s+dist=", re.IGNORECASE)
 CHUNK_META_RE = re.compile(r"^\s*meta\.doc_type=(?P<doc_type>\w+)\s+topic=(?P<topic>[\w\-]+)\s+priority=", re.IGNORECASE)
@@ -36,7 +40,9 @@ class RunResult:
     support_topics: List[str]
 
 
-def run_query_embeddings(script_path: Path, query: str, python_cmd: List[str]) -> RunResult:
+def run_query_embeddings(
+    script_path: Path, query: str, python_cmd: List[str], script_args: Optional[List[str]] = None
+) -> RunResult:
     """
     Executes query_embeddings.py which prompts on stdin with 'Enter query:'.
     We feed the query via stdin and parse stdout.
@@ -45,7 +51,7 @@ def run_query_embeddings(script_path: Path, query: str, python_cmd: List[str]) -
         raise FileNotFoundError(f"query_embeddings.py not found at: {script_path}")
 
     # Build command: (e.g.) uv run python query_embeddings.py
-    cmd = python_cmd + [str(script_path)]
+    cmd = python_cmd + [str(script_path)] + (script_args or [])
 
     proc = subprocess.run(
         cmd,
@@ -55,7 +61,37 @@ def run_query_embeddings(script_path: Path, query: str, python_cmd: List[str]) -
         check=False,
     )
     raw = proc.stdout.decode("utf-8", errors="replace")
+    return parse_output(query, raw)
+
+
+def run_in_process(
+    query: str, collection: Any, embedder: Any, top_k: int = 6, cache: Any = None
+) -> RunResult:
+    """Same checks without a subprocess; `raw` is the rendering query_embeddings.py prints."""
+    return run_many_in_process([query], collection, embedder, top_k, cache)[0]
+
+
+def run_many_in_process(
+    queries: List[str], collection: Any, embedder: Any, top_k: int = 6, cache: Any = None
+) -> List[RunResult]:
+    """All queries through one retrieval.retrieve_many() batch, using `cache` like the CLI."""
+    from retrieval import format_result, retrieve_many
+
+    return [
+        RunResult(
+            query=result.query,
+            raw=format_result(result),
+            router_topics=result.router_topics,
+            support_topics=result.support_topics,
+        )
+        for result in retrieve_many(
+            queries, top_k, collection=collection, embedder=embedder, cache=cache
+        )
+    ]
+
 
+def parse_output(query: str, raw: str) -> RunResult:
+    """Extract router and support topics from query_embeddings.py output."""
     router_topics: List[str] = []
     support_topics: List[str] = []
 
@@ -159,6 +195,7 @@ def assert_case(case: Dict[str, Any], result: RunResult) -> Tuple[bool, List[str
 
 
 def main() -> int:
+    load_dotenv()
     ap = argparse.ArgumentParser(description="Router test harness for query_embeddings.py")
     ap.add_argument("--cases", required=True, help="Path to cases.json")
     ap.add_argument("--script", default="query_embeddings.py", help="Path to query_embeddings.py")
@@ -168,6 +205,19 @@ def main() -> int:
         help="Command prefix used to run python (default: 'uv run python').",
     )
     ap.add_argument("--only", default="", help="Run only cases whose name contains this substring.")
+    ap.add_argument(
+        "--embedder",
+        default=os.getenv("EMBEDDER", ""),
+        help="Embedder passed to query_embeddings.py "
+        "(e.g. 'hash' for offline runs; env: EMBEDDER).",
+    )
+    ap.add_argument(
+        "--in-process",
+        action="store_true",
+        help="Import retrieval from the --script directory and query it directly.",
+    )
+    ap.add_argument("--chroma-path", default="data/chroma", help="Chroma directory (--in-process).")
+    ap.add_argument("--collection", default="", help="Collection or alias (--in-process).")
     args = ap.parse_args()
 
     cases_path = Path(args.cases)
@@ -180,18 +230,49 @@ def main() -> int:
         return 2
 
     python_cmd = args.python_cmd.split()
+    script_args = ["--embedder", args.embedder] if args.embedder else []
+
+    collection = embedder = cache = query_cache = None
+    if args.in_process:
+        sys.path.insert(0, str(script_path.resolve().parent))
+        from constants import (
+            DEFAULT_CACHE_MAX_BYTES,
+            DEFAULT_CACHE_PATH,
+            DEFAULT_COLLECTION,
+            DEFAULT_MODEL,
+            DEFAULT_QUERY_CACHE_SIZE,
+            DEFAULT_QUERY_CACHE_TTL,
+        )
+        from embedders import default_embedder_kind, make_embedder
+        from embedding_cache import open_cache, open_query_cache
+        from retrieval import open_collection
+
+        embedder = make_embedder(args.embedder or default_embedder_kind(), DEFAULT_MODEL, None)
+        collection = open_collection(Path(args.chroma_path), args.collection or DEFAULT_COLLECTION)
+        # Same cache tiers query_embeddings.py uses by default.
+        cache = open_cache(DEFAULT_CACHE_PATH, DEFAULT_CACHE_MAX_BYTES / (1024 * 1024))
+        query_cache = open_query_cache(DEFAULT_QUERY_CACHE_SIZE, DEFAULT_QUERY_CACHE_TTL, cache)
+
+    cases = [case for case in cases if args.only.lower() in case.get("name", "<unnamed>").lower()]
+    batched: List[RunResult] = []
+    if args.in_process:
+        batched = run_many_in_process(
+            [case["query"] for case in cases], collection, embedder, cache=query_cache or cache
+        )
+        if cache is not None:
+            cache.close()
 
     total = 0
     passed = 0
 
-    for case in cases:
+    for n, case in enumerate(cases):
         name = case.get("name", "<unnamed>")
-        if args.only and args.only.lower() not in name.lower():
-            continue
-
         total += 1
         query = case["query"]
-        res = run_query_embeddings(script_path, query, python_cmd)
+        if args.in_process:
+            res = batched[n]
+        else:
+            res = run_query_embeddings(script_path, query, python_cmd, script_args)
         ok, msgs = assert_case(case, res)
 
         status = "PASS" if ok else "FAIL"
@@ -0,0 +1,282 @@
+from __future__ import annotations
+
+import argparse
+import json
+import mmap
+import os
+import shutil
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from numpy_store import NumpyCollection, StoreSnapshot
+from quantization import VectorCodec, dequantize, quantize
+
+# Read-only, memory-mapped copy of a built collection, one directory per corpus
+# fingerprint under <chroma_path>/snapshots/<alias>/:
+#   vectors.npy / norms.npy  vector block in the collection's storage (float32, float16 or
+#                            int8 codes) and float32 squared norms (np.load mmap_mode="r")
+#   scales.npy               int8 only: float32 scale per vector, value = code * scale
+#   codes.npy                int32 (count, columns) metadata codes, -1 = key absent
+#   blob.bin / offsets.npy   documents and chunk text, record n's document is
+#                            blob[offsets[2n]:offsets[2n+1]] and its text runs to offsets[2n+2]
+#   snapshot.json            ids, column vocabularies, collection name/metadata, fingerprint
+# `current.json` next to the version directories names the one queries should use.
+SNAPSHOT_VERSION = 2
+# Version 1 snapshots always hold float32 vectors and read the same way.
+READABLE_VERSIONS = (1, SNAPSHOT_VERSION)
+SNAPSHOTS_DIR = "snapshots"
+CURRENT_NAME = "current.json"
+
+
+def snapshot_root(chroma_path: Path, alias: str) -> Path:
+    return chroma_path / SNAPSHOTS_DIR / alias
+
+
+def current_snapshot(chroma_path: Path, alias: str) -> Optional[Path]:
+    pointer = snapshot_root(chroma_path, alias) / CURRENT_NAME
+    try:
+        name = json.loads(pointer.read_text(encoding="utf-8"))["snapshot"]
+    except (OSError, ValueError, KeyError):
+        return None
+    return pointer.parent / name
+
+
+class SnapshotCollection(NumpyCollection):
+    """
+    NumpyCollection served straight from a snapshot directory. Vectors, norms and codes
+    are memory-mapped, so processes opening the same snapshot share the page cache;
+    documents are read from the blob only for the records a call returns, and chunk text
+    only through `texts`. Quantized collections keep their compact codes on disk and are
+    dequantized per search.
+    """
+
+    def __init__(self, directory: Path) -> None:
+        header = json.loads((directory / "snapshot.json").read_text(encoding="utf-8"))
+        if header.get("version") not in READABLE_VERSIONS:
+            raise RuntimeError(
+                f"{directory} is snapshot format {header.get('version')}, "
+                f"expected {SNAPSHOT_VERSION}."
+            )
+        self.directory = directory
+        self.name = header["collection"]
+        self.metadata = header["metadata"]
+        self.fingerprint = header["fingerprint"]
+        self.space = (self.metadata or {}).get("hnsw:space", "l2")
+        self.ids = header["ids"]
+        self.positions = {doc_id: n for n, doc_id in enumerate(self.ids)}
+        self.vectors = np.load(directory / "vectors.npy", mmap_mode="r")
+        self.norms = np.load(directory / "norms.npy", mmap_mode="r")
+        scales_path = directory / "scales.npy"
+        self.scales = np.load(scales_path, mmap_mode="r") if scales_path.exists() else None
+        self.offsets = np.load(directory / "offsets.npy", mmap_mode="r")
+        codes = np.load(directory / "codes.npy", mmap_mode="r")
+        self.vocabularies: Dict[str, List[Any]] = header["columns"]
+        self.columns = {
+            key: (codes[:, n], {value: code for code, value in enumerate(values)})
+            for n, (key, values) in enumerate(self.vocabularies.items())
+        }
+        self.blob: Optional[mmap.mmap] = None
+
+    def read(self, start: int, end: int) -> str:
+        if start == end:
+            return ""
+        if self.blob is None:
+            with open(self.directory / "blob.bin", "rb") as handle:
+                self.blob = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        return self.blob[start:end].decode("utf-8")
+
+    def document(self, row: int) -> str:
+        return self.read(int(self.offsets[2 * row]), int(self.offsets[2 * row + 1]))
+
+    def embeddings(self, rows: Any) -> np.ndarray:
+        codes = np.asarray(self.vectors[rows])
+        return dequantize(codes, None if self.scales is None else np.asarray(self.scales[rows]))
+
+    def dots(self, queries: np.ndarray) -> np.ndarray:
+        dots = queries @ self.vectors.T
+        return dots if self.scales is None else dots * self.scales
+
+    def meta(self, row: int, text: bool = True) -> Dict[str, Any]:
+        meta = {
+            key: self.vocabularies[key][code]
+            for key, (codes, _) in self.columns.items()
+            if (code := int(codes[row])) >= 0
+        }
+        if text:
+            body = self.read(int(self.offsets[2 * row + 1]), int(self.offsets[2 * row + 2]))
+            if body:
+                meta["text"] = body
+        return meta
+
+    def records(self, rows: np.ndarray, include: List[str]) -> Dict[str, Any]:
+        return {
+            "ids": [self.ids[n] for n in rows],
+            "documents": [self.document(n) for n in rows] if "documents" in include else None,
+            "metadatas": (
+                [self.meta(n, text=False) for n in rows] if "metadatas" in include else None
+            ),
+            "embeddings": self.embeddings(rows) if "embeddings" in include else None,
+        }
+
+    def texts(self, ids: Sequence[str]) -> Dict[str, str]:
+        bodies = {}
+        for doc_id in ids:
+            row = self.positions.get(doc_id)
+            if row is not None:
+                body = self.read(int(self.offsets[2 * row + 1]), int(self.offsets[2 * row + 2]))
+                if body:
+                    bodies[doc_id] = body
+        return bodies
+
+    def snapshot(self) -> StoreSnapshot:
+        rows = range(len(self.ids))
+        return StoreSnapshot(
+            self.name,
+            list(self.ids),
+            self.embeddings(slice(None)),
+            [self.document(n) for n in rows],
+            [self.meta(n) for n in rows],
+            self.metadata,
+        )
+
+    def load(self, *args: Any, **kwargs: Any) -> None:
+        raise RuntimeError(f"{self.directory} is a read-only snapshot; rebuild and export instead.")
+
+    def upsert(self, *args: Any, **kwargs: Any) -> None:
+        self.load()
+
+    def delete(self, *args: Any, **kwargs: Any) -> None:
+        self.load()
+
+
+def write_snapshot(snapshot: StoreSnapshot, directory: Path, fingerprint: str) -> Path:
+    """
+    Write `snapshot` to `directory` atomically (built in a temp dir, then renamed). Vectors
+    are stored in the collection's codec storage; quantizing the already-dequantized
+    values Chroma holds gives back the same codes.
+    """
+    table = NumpyCollection.from_snapshot(snapshot)
+    tmp = directory.with_name(directory.name + ".tmp")
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+
+    storage = VectorCodec.from_metadata(snapshot.metadata).storage if table.ids else "float32"
+    vectors, scales = quantize(table.vectors, storage)
+    np.save(tmp / "vectors.npy", vectors)
+    if scales is not None:
+        np.save(tmp / "scales.npy", scales)
+    np.save(tmp / "norms.npy", table.norms.astype(np.float32))
+    keys = list(table.columns)
+    codes = np.zeros((len(table.ids), len(keys)), dtype=np.int32)
+    for n, key in enumerate(keys):
+        codes[:, n] = table.columns[key][0]
+    np.save(tmp / "codes.npy", codes)
+
+    offsets = [0]
+    with open(tmp / "blob.bin", "wb") as blob:
+        for document, meta in zip(table.documents, table.metadatas):
+            for value in (document or "", meta.get("text") or ""):
+                encoded = value.encode("utf-8")
+                blob.write(encoded)
+                offsets.append(offsets[-1] + len(encoded))
+    np.save(tmp / "offsets.npy", np.asarray(offsets, dtype=np.int64))
+
+    columns = {}
+    for key in keys:
+        vocabulary = table.columns[key][1]
+        columns[key] = sorted(vocabulary, key=vocabulary.__getitem__)
+    header = {
+        "version": SNAPSHOT_VERSION,
+        "fingerprint": fingerprint,
+        "collection": snapshot.name,
+        "metadata": snapshot.metadata,
+        "count": len(table.ids),
+        "dimensions": int(table.vectors.shape[1]) if table.ids else 0,
+        "storage": storage,
+        "columns": columns,
+        "ids": table.ids,
+    }
+    (tmp / "snapshot.json").write_text(json.dumps(header, ensure_ascii=True), encoding="utf-8")
+    shutil.rmtree(directory, ignore_errors=True)
+    os.replace(tmp, directory)
+    return directory
+
+
+def publish_snapshot(
+    store: Any, chroma_path: Path, alias: str, fingerprint: str, keep: int = 2
+) -> Path:
+    """Export `store` unless this fingerprint already exists, point `current` at it, prune."""
+    root = snapshot_root(chroma_path, alias)
+    directory = root / fingerprint[:16]
+    try:
+        exported = json.loads((directory / "snapshot.json").read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        exported = {}
+    # An unchanged rebuild still gets a new collection version, and the header must name it.
+    if exported.get("fingerprint") != fingerprint or exported.get("collection") != store.name:
+        write_snapshot(store.snapshot(), directory, fingerprint)
+    pointer = root / CURRENT_NAME
+    tmp_pointer = pointer.with_suffix(".json.tmp")
+    tmp_pointer.write_text(
+        json.dumps({"snapshot": directory.name, "collection": store.name}), encoding="utf-8"
+    )
+    os.replace(tmp_pointer, pointer)
+    # Processes with an older snapshot mapped keep their pages until they reopen.
+    versions = sorted(
+        (path for path in root.iterdir() if path.is_dir() and path != directory),
+        key=lambda path: path.stat().st_mtime,
+        reverse=True,
+    )
+    for stale in versions[max(keep - 1, 0):]:
+        shutil.rmtree(stale, ignore_errors=True)
+    return directory
+
+
+def open_snapshot(chroma_path: Path, alias: str) -> SnapshotCollection:
+    directory = current_snapshot(chroma_path, alias)
+    if directory is None or not directory.exists():
+        raise RuntimeError(
+            f"No snapshot for {alias} under {chroma_path}; "
+            "build with --snapshot or run snapshot.py."
+        )
+    return SnapshotCollection(directory)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    from constants import DEFAULT_COLLECTION, DEFAULT_KEEP_VERSIONS
+    from create_embeddings import corpus_fingerprint, load_manifest
+    from vector_store import manifest_path, open_store
+
+    parser = argparse.ArgumentParser(description="Export or inspect a memory-mapped snapshot.")
+    parser.add_argument("--collection", default=DEFAULT_COLLECTION)
+    parser.add_argument("--chroma-path", default="data/chroma")
+    parser.add_argument("--keep", type=int, default=DEFAULT_KEEP_VERSIONS)
+    parser.add_argument(
+        "--info", action="store_true", help="Describe the current snapshot and exit."
+    )
+    args = parser.parse_args(argv)
+    chroma_path = Path(args.chroma_path)
+
+    if args.info:
+        current = open_snapshot(chroma_path, args.collection)
+        print(
+            f"[snapshot] {current.directory} collection={current.name} count={current.count()} "
+            f"fingerprint={current.fingerprint[:16]}"
+        )
+        return
+    store = open_store(chroma_path, args.collection)
+    entries = load_manifest(manifest_path(chroma_path, store.name))
+    if not entries:
+        raise RuntimeError(
+            f"No manifest for {store.name}; build it with create_embeddings.py first."
+        )
+    directory = publish_snapshot(
+        store, chroma_path, args.collection, corpus_fingerprint(store.metadata, entries), args.keep
+    )
+    print(f"[snapshot] exported {store.name} -> {directory}")
+
+
+if __name__ == "__main__":
+    main()
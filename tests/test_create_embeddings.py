@@ -0,0 +1,52 @@
+from __future__ import annotations
+
+import contextlib
+import io
+from pathlib import Path
+from typing import Any, List
+
+import chromadb
+import pytest
+
+from batch_planner import BatchLimits
+from create_embeddings import build_collection
+from embedders import Embedder, HashingEmbedder
+
+
+class FailingEmbedder(HashingEmbedder):
+    def embed(self, texts: List[str], *args: Any, **kwargs: Any) -> Any:
+        raise RuntimeError("embedding service unavailable")
+
+
+def build(root: Path, embedder: Embedder) -> None:
+    with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+        build_collection(
+            "rules",
+            embedder,
+            BatchLimits(),
+            root / "chroma",
+            preview_dir=None,
+            corpus_path=str(root / "rules.corpus.jsonl"),
+            keep_versions=1,
+            retention_hours=0,
+        )
+
+
+def collection_names(chroma_path: Path) -> List[str]:
+    client = chromadb.PersistentClient(path=str(chroma_path))
+    return sorted(collection.name for collection in client.list_collections())
+
+
+def content_files(chroma_path: Path) -> List[str]:
+    return sorted(path.name for path in chroma_path.glob("*.content.sqlite3"))
+
+
+def test_rerun_drops_abandoned_version(tmp_path: Path) -> None:
+    with pytest.raises(RuntimeError):
+        build(tmp_path, FailingEmbedder())
+    (abandoned,) = collection_names(tmp_path / "chroma")
+
+    build(tmp_path, HashingEmbedder())
+    names = collection_names(tmp_path / "chroma")
+    assert abandoned not in names and len(names) == 1
+    assert content_files(tmp_path / "chroma") == [f"{names[0]}.content.sqlite3"]
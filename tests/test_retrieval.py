@@ -0,0 +1,59 @@
+from __future__ import annotations
+
+import contextlib
+import io
+from pathlib import Path
+from typing import Any, Dict, List
+
+from batch_planner import BatchLimits
+from constants import DATA_PATH
+from corpus import import_chunk_data
+from create_embeddings import build_collection
+from embedders import HashingEmbedder
+from retrieval import metadata_index, open_collection, retrieve
+
+
+def write_source(path: Path, chunks: List[Dict[str, Any]]) -> str:
+    path.write_text(f"chunk_data = {chunks!r}\n", encoding="utf-8")
+    return str(path)
+
+
+def build_in_place(root: Path, chunks: List[Dict[str, Any]]) -> None:
+    with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+        build_collection(
+            "rules",
+            HashingEmbedder(),
+            BatchLimits(),
+            root / "chroma",
+            preview_dir=None,
+            source_path=write_source(root / "rag_chunks_data.py", chunks),
+            corpus_path=str(root / "rules.corpus.jsonl"),
+            blue_green=False,
+        )
+
+
+def test_single_pass_after_in_place_rebuild(tmp_path: Path) -> None:
+    chunks = import_chunk_data(DATA_PATH)
+    query = chunks[0]["data"]
+    build_in_place(tmp_path, chunks)
+    collection = open_collection(tmp_path / "chroma", "rules")
+    retrieve(query, 6, collection=collection, embedder=HashingEmbedder(), mode="single")
+
+    # Editing a chunk's data replaces its id without changing the count.
+    chunks[0] = {**chunks[0], "data": chunks[0]["data"] + "\nEdited."}
+    build_in_place(tmp_path, chunks)
+    edited = retrieve(query, 6, collection=collection, embedder=HashingEmbedder(), mode="single")
+    assert edited.chunks
+
+    # A metadata-only update of a support chunk is picked up by a handle opened after the
+    # rebuild.
+    support = next(n for n, chunk in enumerate(chunks) if chunk["role"] == "support")
+    chunks[support] = {**chunks[support], "priority": chunks[support]["priority"] + 1}
+    build_in_place(tmp_path, chunks)
+    reopened = open_collection(tmp_path / "chroma", "rules")
+    retrieve(query, 6, collection=reopened, embedder=HashingEmbedder(), mode="single")
+    stored = reopened.get(include=["metadatas"])
+    index = metadata_index(reopened, reopened.count())
+    assert {doc_id: index[doc_id] for doc_id in stored["ids"]} == dict(
+        zip(stored["ids"], stored["metadatas"])
+    )
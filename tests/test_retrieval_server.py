@@ -0,0 +1,162 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import io
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+import orjson
+import pytest
+
+from batch_planner import BatchLimits
+from constants import DATA_PATH
+from corpus import import_chunk_data
+from create_embeddings import build_collection
+from embedders import HashingEmbedder
+from embedding_cache import EmbeddingCache, open_query_cache
+from hnsw_store import HNSW_AVAILABLE
+from retrieval_server import RetrievalServer, RetrievalService
+from vector_store import BACKEND_CHOICES
+
+
+class CachedHashingEmbedder(HashingEmbedder):
+    # Offline, but goes through the embedding caches like a remote model would.
+    cacheable = True
+
+
+@pytest.fixture(scope="module")
+def chroma_path(tmp_path_factory: pytest.TempPathFactory) -> Path:
+    root = tmp_path_factory.mktemp("server")
+    with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+        build_collection(
+            "rules",
+            CachedHashingEmbedder(),
+            BatchLimits(),
+            root / "chroma",
+            preview_dir=None,
+            corpus_path=str(root / "rules.corpus.jsonl"),
+        )
+    return root / "chroma"
+
+
+async def post_query(port: int, query: str) -> Tuple[int, Dict[str, Any]]:
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    body = orjson.dumps({"query": query, "top_k": 3})
+    writer.write(
+        b"POST /query HTTP/1.1\r\nHost: test\r\nConnection: close\r\n"
+        + f"Content-Length: {len(body)}\r\n\r\n".encode("latin-1")
+        + body
+    )
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    head, _, payload = response.partition(b"\r\n\r\n")
+    return int(head.split(b" ", 2)[1]), orjson.loads(payload)
+
+
+async def send_raw(port: int, request: bytes) -> Tuple[int, Dict[str, Any]]:
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(request)
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    head, _, payload = response.partition(b"\r\n\r\n")
+    return int(head.split(b" ", 2)[1]), orjson.loads(payload)
+
+
+async def exchange(service: RetrievalService, queries: list[str]) -> list[Tuple[int, Any]]:
+    # Each request runs on a worker thread, as in production, so the cache is used off
+    # the thread that opened it.
+    server = await asyncio.start_server(RetrievalServer(service).handle, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    async with server:
+        return [await post_query(port, query) for query in queries]
+
+
+@pytest.mark.parametrize("query_cache_size", [0, 64])
+def test_query_through_server_uses_cache(
+    chroma_path: Path, tmp_path: Path, query_cache_size: int
+) -> None:
+    cache = EmbeddingCache(tmp_path / "embeddings.sqlite3")
+    query_cache = open_query_cache(query_cache_size, None, cache)
+    service = RetrievalService("rules", CachedHashingEmbedder(), chroma_path, query_cache or cache)
+    try:
+        responses = asyncio.run(exchange(service, ["approval workflow", "approval workflow"]))
+    finally:
+        cache.close()
+
+    for status, payload in responses:
+        assert status == 200, payload
+        assert payload["output"]
+    assert responses[0][1]["output"] == responses[1][1]["output"]
+    # The second request is answered from a cache tier instead of the embedder.
+    assert (query_cache or cache).hits == 1
+
+
+def build_in_place(root: Path, chunks: List[Dict[str, Any]]) -> None:
+    source = root / "rag_chunks_data.py"
+    source.write_text(f"chunk_data = {chunks!r}\n", encoding="utf-8")
+    with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+        build_collection(
+            "rules",
+            HashingEmbedder(),
+            BatchLimits(),
+            root / "chroma",
+            preview_dir=None,
+            source_path=str(source),
+            corpus_path=str(root / "rules.corpus.jsonl"),
+            blue_green=False,
+            snapshot=True,
+        )
+
+
+@pytest.mark.parametrize("backend", BACKEND_CHOICES)
+def test_server_serves_in_place_rebuild(backend: str, tmp_path: Path) -> None:
+    if backend == "hnsw" and not HNSW_AVAILABLE:
+        pytest.skip("hnswlib not installed")
+    chunks = import_chunk_data(DATA_PATH)
+    support = next(n for n, chunk in enumerate(chunks) if chunk["role"] == "support")
+    query = chunks[support]["data"]
+    marker = "Rebuilt in place."
+    build_in_place(tmp_path, chunks)
+    service = RetrievalService("rules", HashingEmbedder(), tmp_path / "chroma", backend=backend)
+    try:
+        assert marker not in service.query(query, 3, "max")["output"]
+
+        # Same physical collection, new text: the alias never moves.
+        chunks[support] = {**chunks[support], "text": f"{chunks[support]['text']}\n{marker}"}
+        build_in_place(tmp_path, chunks)
+        assert marker in service.query(query, 3, "max")["output"]
+    finally:
+        service.close()
+
+
+def query_request(body: bytes) -> bytes:
+    return (
+        b"POST /query HTTP/1.1\r\nConnection: close\r\n"
+        + f"Content-Length: {len(body)}\r\n\r\n".encode("latin-1")
+        + body
+    )
+
+
+@pytest.mark.parametrize(
+    "request_bytes",
+    [
+        b"GARBAGE\r\n\r\n",
+        b"POST /query HTTP/1.1\r\nContent-Length: abc\r\n\r\n",
+        b"POST /query HTTP/1.1\r\nContent-Length: -1\r\n\r\n",
+        query_request(orjson.dumps({"query": "approval workflow", "top_k": 0})),
+        query_request(orjson.dumps({"query": "approval workflow", "top_k": -3})),
+    ],
+    ids=["request-line", "length-text", "length-negative", "top-k-zero", "top-k-negative"],
+)
+def test_malformed_requests_get_400(chroma_path: Path, request_bytes: bytes) -> None:
+    async def run() -> Tuple[int, Dict[str, Any]]:
+        service = RetrievalService("rules", CachedHashingEmbedder(), chroma_path)
+        server = await asyncio.start_server(RetrievalServer(service).handle, "127.0.0.1", 0)
+        async with server:
+            return await send_raw(server.sockets[0].getsockname()[1], request_bytes)
+
+    status, payload = asyncio.run(run())
+    assert status == 400, payload
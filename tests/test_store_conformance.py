@@ -0,0 +1,25 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import pytest
+
+from benchmarks.store_conformance import (
+    empty_store,
+    reopen_as_snapshot,
+    run_checks,
+    synthetic_records,
+)
+from hnsw_store import HNSW_AVAILABLE
+from vector_store import BACKEND_CHOICES
+
+
+@pytest.mark.parametrize("backend", BACKEND_CHOICES)
+def test_store_conformance(backend: str, tmp_path: Path) -> None:
+    if backend == "hnsw" and not HNSW_AVAILABLE:
+        pytest.skip("hnswlib not installed")
+    records = synthetic_records(size=300, dimensions=32, seed=0)
+    reopen = reopen_as_snapshot(tmp_path) if backend == "snapshot" else None
+    checks = run_checks(empty_store(backend, tmp_path), records, k=10, reopen=reopen)
+    failures = [f"{name}: {detail}" for name, ok, detail in checks if not ok]
+    assert not failures, "\n".join(failures)
@@ -0,0 +1,222 @@
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Any, Dict, Optional, Protocol, Sequence, Tuple
+
+import numpy as np
+
+from aliases import resolve_alias
+from content_store import ContentStore, open_content
+from hnsw_store import HnswCollection
+from numpy_store import NumpyCollection, StoreSnapshot
+from snapshot import CURRENT_NAME, open_snapshot, snapshot_root
+
+# "chroma" is the persistent system of record; "numpy" and "hnsw" are in-process copies
+# of a built collection (see numpy_store.py / hnsw_store.py); "snapshot" memory-maps an
+# exported copy without opening Chroma at all (see snapshot.py).
+BACKEND_CHOICES = ("chroma", "numpy", "hnsw", "snapshot")
+IN_MEMORY_STORES = {"numpy": NumpyCollection, "hnsw": HnswCollection}
+
+
+class VectorStore(Protocol):
+    """
+    The collection surface the pipeline relies on, in Chroma's call shapes: `where`
+    filters use `$eq`, `$in` and `$and`; `query`/`get` return Chroma-style dicts. Chunk
+    text is not part of search results; `texts` reads it for a final selection.
+    """
+
+    name: str
+    metadata: Optional[Dict[str, Any]]
+
+    def count(self) -> int: ...
+
+    def upsert(
+        self,
+        ids: Sequence[str],
+        embeddings: Any,
+        documents: Optional[Sequence[Optional[str]]] = None,
+        metadatas: Optional[Sequence[Optional[Dict[str, Any]]]] = None,
+    ) -> None: ...
+
+    def delete(self, ids: Sequence[str]) -> None: ...
+
+    def get(
+        self,
+        ids: Optional[Sequence[str]] = None,
+        where: Optional[Dict[str, Any]] = None,
+        limit: Optional[int] = None,
+        include: Sequence[str] = ("documents", "metadatas"),
+    ) -> Dict[str, Any]: ...
+
+    def query(
+        self,
+        query_embeddings: Any,
+        n_results: int = 10,
+        where: Optional[Dict[str, Any]] = None,
+        include: Sequence[str] = ("documents", "metadatas", "distances"),
+    ) -> Dict[str, Any]: ...
+
+    def texts(self, ids: Sequence[str]) -> Dict[str, str]: ...
+
+    def snapshot(self) -> StoreSnapshot: ...
+
+
+class ChromaStore:
+    """
+    VectorStore over a Chroma collection; Chroma-only calls (update, modify) pass through.
+    Chunk text lives in `content` (see content_store.py) and is merged back into snapshots.
+    """
+
+    def __init__(self, collection: Any, content: Optional[ContentStore] = None) -> None:
+        self.collection = collection
+        self.content = content
+
+    @property
+    def name(self) -> str:
+        return self.collection.name
+
+    @property
+    def metadata(self) -> Optional[Dict[str, Any]]:
+        return self.collection.metadata
+
+    def count(self) -> int:
+        return self.collection.count()
+
+    def upsert(
+        self,
+        ids: Sequence[str],
+        embeddings: Any,
+        documents: Optional[Sequence[Optional[str]]] = None,
+        metadatas: Optional[Sequence[Optional[Dict[str, Any]]]] = None,
+    ) -> None:
+        self.collection.upsert(
+            ids=list(ids), embeddings=embeddings, documents=documents, metadatas=metadatas
+        )
+
+    def delete(self, ids: Sequence[str]) -> None:
+        if ids:
+            self.collection.delete(ids=list(ids))
+
+    def get(
+        self,
+        ids: Optional[Sequence[str]] = None,
+        where: Optional[Dict[str, Any]] = None,
+        limit: Optional[int] = None,
+        include: Sequence[str] = ("documents", "metadatas"),
+    ) -> Dict[str, Any]:
+        return self.collection.get(
+            ids=list(ids) if ids is not None else None,
+            where=where,
+            limit=limit,
+            include=list(include),
+        )
+
+    def query(
+        self,
+        query_embeddings: Any,
+        n_results: int = 10,
+        where: Optional[Dict[str, Any]] = None,
+        include: Sequence[str] = ("documents", "metadatas", "distances"),
+    ) -> Dict[str, Any]:
+        return self.collection.query(
+            query_embeddings=query_embeddings,
+            n_results=n_results,
+            where=where,
+            include=list(include),
+        )
+
+    def texts(self, ids: Sequence[str]) -> Dict[str, str]:
+        if self.content is not None:
+            return self.content.get_many(ids)
+        # Builds from before the content store keep the body in metadata.
+        found = self.collection.get(ids=list(ids), include=["metadatas"])
+        return {
+            doc_id: meta["text"]
+            for doc_id, meta in zip(found["ids"], found["metadatas"])
+            if meta and meta.get("text")
+        }
+
+    def snapshot(self) -> StoreSnapshot:
+        found = self.collection.get(include=["embeddings", "documents", "metadatas"])
+        metadatas = [meta or {} for meta in found["metadatas"]]
+        if self.content is not None:
+            bodies = self.content.get_many(found["ids"])
+            metadatas = [
+                {**meta, "text": bodies[doc_id]} if doc_id in bodies else meta
+                for doc_id, meta in zip(found["ids"], metadatas)
+            ]
+        return StoreSnapshot(
+            self.name,
+            list(found["ids"]),
+            np.asarray(found["embeddings"], dtype=np.float32),
+            list(found["documents"]),
+            metadatas,
+            self.metadata,
+        )
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.collection, name)
+
+
+def manifest_path(chroma_path: Path, collection_name: str) -> Path:
+    return chroma_path / f"{collection_name}.manifest.json"
+
+
+def build_stamp(
+    chroma_path: Path, alias: str, physical: str, backend: str
+) -> Optional[Tuple[int, int]]:
+    """
+    Identity of the last finished build behind `physical`: the file a build replaces last
+    for this backend (the snapshot pointer, else the manifest). Long-lived readers reopen
+    when it changes, so in-place rebuilds are picked up as well as alias moves.
+    """
+    if backend == "snapshot":
+        path = snapshot_root(chroma_path, alias) / CURRENT_NAME
+    else:
+        path = manifest_path(chroma_path, physical)
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        return None
+    # Both files are written then renamed into place, so each build gets a new inode.
+    return stat.st_ino, stat.st_mtime_ns
+
+
+def as_backend(store: VectorStore, backend: str) -> VectorStore:
+    """`store` itself for "chroma", otherwise an in-memory copy of its snapshot."""
+    if backend == "chroma":
+        return store
+    if backend == "snapshot":
+        raise RuntimeError(
+            "The snapshot backend is opened from disk with open_store(), not copied."
+        )
+    if backend not in IN_MEMORY_STORES:
+        raise RuntimeError(
+            f"Unknown vector store backend {backend!r}; expected one of {BACKEND_CHOICES}."
+        )
+    return IN_MEMORY_STORES[backend].from_snapshot(store.snapshot())
+
+
+def open_snapshot_store(chroma_path: Path, collection_name: str) -> VectorStore:
+    store = open_snapshot(chroma_path, collection_name)
+    name = resolve_alias(chroma_path, collection_name)
+    if store.name != name:
+        # e.g. after --rollback: never serve a different version than Chroma would.
+        raise RuntimeError(
+            f"Snapshot {store.directory} holds {store.name} but {collection_name} points at "
+            f"{name}; re-export it with snapshot.py."
+        )
+    return store
+
+
+def open_store(chroma_path: Path, collection_name: str, backend: str = "chroma") -> VectorStore:
+    if backend == "snapshot":
+        return open_snapshot_store(chroma_path, collection_name)
+    # Imported here so snapshot-only processes never pay for loading Chroma.
+    import chromadb
+
+    client = chromadb.PersistentClient(path=str(chroma_path))
+    # `collection_name` may be an alias for the promoted blue/green version.
+    name = resolve_alias(chroma_path, collection_name)
+    store = ChromaStore(client.get_or_create_collection(name=name), open_content(chroma_path, name))
+    return as_backend(store, backend)